@@ -1,8 +1,13 @@
+import os
+import sys
 import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
 from matplotlib import rcParams
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'helper_scripts'))
+from timing import GTDB_PROFILE_LOG, read_stage_profiles
+
 
 # Set font to Times New Roman
 rcParams['font.family'] = 'serif'
@@ -17,9 +22,14 @@ rcParams.update({
     'legend.title_fontsize': fs-2
 })
 
+# Stage profiles appended by the pipeline driver (reproduce_gtdb_fmh_dnds_estimations/run_fmh_omega.sh,
+# via helper_scripts/timing.py): the logs given on the command line, else the configs' profile_log.
+# The hand-maintained spreadsheet is read only when none of them exists.
+# Runs derived from a lower threshold only time the filter as "omega" (see reproduce_gtdb_fmh_dnds_estimations/README.md).
+profile_paths = sys.argv[1:] or [GTDB_PROFILE_LOG]
+
 # Load the Excel file
 file_path = "../data/log_analysis.xlsx"
-xls = pd.ExcelFile(file_path)
 
 # Function to convert time format (hh:mm:ss) to total seconds
 def convert_time(value):
@@ -33,30 +43,34 @@ def convert_time(value):
 # Prepare data storage
 cleaned_data = []
 
-for sheet in xls.sheet_names:
-    ksize = int(sheet.split(",")[0].split("=")[1])  # Extract ksize
-    t_threshold = float(sheet.split(",")[1].split("=")[1])  # Extract threshold
-    
-    # Read and clean sheet data
-    df = xls.parse(sheet)
-    df.columns = ["Step", "Disk Usage (MB)", "Time"]
-    
-    # Convert time column properly
-    df["Time (s)"] = df["Time"].apply(convert_time)
-    
-    # Store cleaned data
-    for _, row in df.iterrows():
-        if row["Step"] not in ["Total"]:  # Exclude total row
-            cleaned_data.append({
-                "Step": row["Step"],
-                "Disk Usage (MB)": row["Disk Usage (MB)"],
-                "Time (s)": row["Time (s)"],
-                "ksize": ksize,
-                "t_threshold": t_threshold
-            })
-
-# Convert to DataFrame
-df_cleaned = pd.DataFrame(cleaned_data)
+if any(os.path.exists(path) for path in profile_paths):
+    df_cleaned = read_stage_profiles(profile_paths)
+else:
+    xls = pd.ExcelFile(file_path)
+    for sheet in xls.sheet_names:
+        ksize = int(sheet.split(",")[0].split("=")[1])  # Extract ksize
+        t_threshold = float(sheet.split(",")[1].split("=")[1])  # Extract threshold
+
+        # Read and clean sheet data
+        df = xls.parse(sheet)
+        df.columns = ["Step", "Disk Usage (MB)", "Time"]
+
+        # Convert time column properly
+        df["Time (s)"] = df["Time"].apply(convert_time)
+
+        # Store cleaned data
+        for _, row in df.iterrows():
+            if row["Step"] not in ["Total"]:  # Exclude total row
+                cleaned_data.append({
+                    "Step": row["Step"],
+                    "Disk Usage (MB)": row["Disk Usage (MB)"],
+                    "Time (s)": row["Time (s)"],
+                    "ksize": ksize,
+                    "t_threshold": t_threshold
+                })
+
+    # Convert to DataFrame
+    df_cleaned = pd.DataFrame(cleaned_data)
 
 # Unique steps and settings
 step_mapping = {"Sketching":"DNA & Protein Sketches","dN/dS Estimation": "FracMinHash dN/dS", "Pairwise Comparison (DNA)":"DNA Containment","Pairwise Comparison (Protein)":"Protein Containment"}
@@ -3,30 +3,17 @@
 import subprocess
 import tempfile
 import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'helper_scripts'))
+from fasta_io import read_fasta, record_id
 
 def load_fasta(file_path):
     """
     Reads a FASTA file and returns a dictionary mapping sequence IDs to their sequences.
     The sequence ID is assumed to be the first token (after '>') in each header.
     """
-    sequences = {}
-    with open(file_path, 'r') as f:
-        seq_id = None
-        seq_lines = []
-        for line in f:
-            line = line.rstrip()
-            if line.startswith('>'):
-                if seq_id is not None:
-                    sequences[seq_id] = ''.join(seq_lines)
-                # Extract the sequence ID from the header (first word after '>')
-                seq_id = line[1:].split()[0]
-                seq_lines = []
-            else:
-                seq_lines.append(line)
-        # Save the last sequence in the file.
-        if seq_id is not None:
-            sequences[seq_id] = ''.join(seq_lines)
-    return sequences
+    return {record_id(header): seq for header, seq in read_fasta(file_path)}
 
 def main():
     # File paths for input files
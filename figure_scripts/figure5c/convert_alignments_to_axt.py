@@ -2,28 +2,17 @@
 
 import os
 import subprocess
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'helper_scripts'))
+from fasta_io import read_fasta
 
 def fasta_to_sequences(fasta_file):
     """
     Reads a FASTA file and returns a list of tuples: (header, sequence).
     The sequence is concatenated into one continuous line.
     """
-    sequences = []
-    current_id = None
-    current_seq = []
-    with open(fasta_file, 'r') as f:
-        for line in f:
-            line = line.rstrip()
-            if line.startswith(">"):
-                if current_id is not None:
-                    sequences.append((current_id, "".join(current_seq)))
-                current_id = line[1:].strip()
-                current_seq = []
-            else:
-                current_seq.append(line.strip())
-        if current_id is not None:
-            sequences.append((current_id, "".join(current_seq)))
-    return sequences
+    return [(header.strip(), seq) for header, seq in read_fasta(fasta_file)]
 
 def main():
     # Directory where the FASTA alignment files are stored.
@@ -1,9 +1,14 @@
+import os
+import sys
 import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
 from matplotlib import rcParams
 import matplotlib.patches as mpatches
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'helper_scripts'))
+from timing import GTDB_PROFILE_LOG, read_stage_profiles
+
 # Set font style
 rcParams['font.family'] = 'serif'
 
@@ -17,9 +22,14 @@ rcParams.update({
     'legend.title_fontsize': fs-2
 })
 
+# Stage profiles appended by the pipeline driver (reproduce_gtdb_fmh_dnds_estimations/run_fmh_omega.sh,
+# via helper_scripts/timing.py): the logs given on the command line, else the configs' profile_log.
+# The hand-maintained spreadsheet is read only when none of them exists.
+# Runs derived from a lower threshold only time the filter as "omega" (see reproduce_gtdb_fmh_dnds_estimations/README.md).
+profile_paths = sys.argv[1:] or [GTDB_PROFILE_LOG]
+
 # Load the Excel file
 file_path = "../data/log_analysis.xlsx"
-xls = pd.ExcelFile(file_path)
 
 # Function to convert hh:mm:ss to seconds
 def convert_time(value):
@@ -32,23 +42,27 @@ def convert_time(value):
 
 # Read and clean the data
 cleaned_data = []
-for sheet in xls.sheet_names:
-    ksize = int(sheet.split(",")[0].split("=")[1])
-    t_threshold = float(sheet.split(",")[1].split("=")[1])
-    df = xls.parse(sheet)
-    df.columns = ["Step", "Disk Usage (MB)", "Time"]
-    df["Time (s)"] = df["Time"].apply(convert_time)
-    for _, row in df.iterrows():
-        if row["Step"] != "Total":
-            cleaned_data.append({
-                "Step": row["Step"],
-                "Disk Usage (MB)": row["Disk Usage (MB)"],
-                "Time (s)": row["Time (s)"],
-                "ksize": ksize,
-                "t_threshold": t_threshold
-            })
-
-df_cleaned = pd.DataFrame(cleaned_data)
+if any(os.path.exists(path) for path in profile_paths):
+    df_cleaned = read_stage_profiles(profile_paths)
+else:
+    xls = pd.ExcelFile(file_path)
+    for sheet in xls.sheet_names:
+        ksize = int(sheet.split(",")[0].split("=")[1])
+        t_threshold = float(sheet.split(",")[1].split("=")[1])
+        df = xls.parse(sheet)
+        df.columns = ["Step", "Disk Usage (MB)", "Time"]
+        df["Time (s)"] = df["Time"].apply(convert_time)
+        for _, row in df.iterrows():
+            if row["Step"] != "Total":
+                cleaned_data.append({
+                    "Step": row["Step"],
+                    "Disk Usage (MB)": row["Disk Usage (MB)"],
+                    "Time (s)": row["Time (s)"],
+                    "ksize": ksize,
+                    "t_threshold": t_threshold
+                })
+
+    df_cleaned = pd.DataFrame(cleaned_data)
 
 # Rename steps and set order
 step_mapping = {
@@ -68,7 +82,7 @@ pivot_df = df_cleaned.pivot_table(
     values="Time (s)",
     aggfunc="sum",
     fill_value=0
-).sort_index()
+).reindex(columns=step_order, fill_value=0).sort_index()  # profiles may not cover every step
 
 # Get unique k-sizes and thresholds
 ksizes = sorted(df_cleaned["ksize"].unique())
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+All-vs-all FracMinHash containment through a hash -> genome postings index.
+
+`sourmash compare --containment` fills a dense N x N matrix and the readers in
+simulate.py then drop most of it at the analysis threshold. Here the sorted
+uint64 sketches are concatenated and sorted by hash once; every run of equal
+hashes is the postings list of that hash. Expanding each genome's hashes against
+their postings lists counts |A & B| for exactly the pairs that share a hash, in
+blocks of genomes, so memory follows the number of shared hashes rather than N**2.
+Only pairs whose value is >= threshold are emitted, as the same long-form
+(A, B, containment) rows simulate.containments() builds from the matrix, row-major
+like the matrix. The value of row A, column B is |A & B| / |B|, the share of B's
+hashes found in A, which is what sourmash compare puts there.
+
+    names, sketches = load_signatures(sig_paths, ksize=21, molecule="dna")
+    for chunk in containment_pairs(names, sketches, threshold=0.02):
+        ...
+
+or, from the shell,
+
+    python3 containment_index.py --sigs sigs/*.sig.gzip --ksize 21 --molecule dna --threshold 0.02 --out pairs.csv
+
+A pair without a shared hash has containment 0, so threshold=None (keep every
+entry, as the matrix readers do) still emits all N**2 rows, one block at a time.
+
+Given a sketch store (sketch_store.py) the postings index is saved in the store
+directory on first use, and with workers > 1 the blocks are counted in worker
+processes that memory-map the store rather than each holding its own copy:
+
+    python3 containment_index.py --store /data/store_k21 --threshold 0.02 --workers 16 --out pairs.csv
+"""
+
+import argparse
+import gzip
+import json
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from sketch_store import SketchStore
+
+# pair-hash incidences expanded per block; a block always holds whole genomes
+BLOCK_INCIDENCES = 1 << 22
+GZIP_MAGIC = b"\x1f\x8b"
+
+def _read_json(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[:2] == GZIP_MAGIC:
+        data = gzip.decompress(data)
+    return json.loads(data)
+
+def load_signatures(paths: Sequence[str], ksize: Optional[int] = None,
+                    molecule: Optional[str] = None) -> Tuple[List[str], List[np.ndarray]]:
+    """
+    (labels, sorted uint64 hash arrays) of every sketch in the given .sig files (plain or gzip),
+    in file order. ksize counts bases for DNA and residues for protein; labels are what
+    sourmash compare prints (name, else filename, else md5sum[:8]).
+    Sketches of different scaled values are downsampled to the coarsest one, as compare does.
+    """
+    names, sketches, max_hashes = [], [], []
+    for path in paths:
+        for sig in _read_json(path):
+            for mh in sig["signatures"]:
+                mol = mh["molecule"].lower()
+                stored_k = ksize * 3 if ksize is not None and mol == "protein" else ksize
+                if (molecule is not None and mol != molecule.lower()) or (stored_k is not None and mh["ksize"] != stored_k):
+                    continue
+                names.append(sig.get("name") or sig.get("filename") or mh["md5sum"][:8])
+                sketches.append(np.asarray(mh["mins"], dtype=np.uint64))
+                max_hashes.append(mh["max_hash"] or 2**64 - 1)
+    if max_hashes and len(set(max_hashes)) > 1:
+        cutoff = np.uint64(min(max_hashes))
+        sketches = [s[s <= cutoff] for s in sketches]
+    return names, sketches
+
+def read_compare_labels(npy_path) -> List[str]:
+    """Labels of a `sourmash compare -o <matrix>.npy` output, which it writes to <matrix>.npy.labels.txt."""
+    with open(f"{npy_path}.labels.txt") as f:
+        return [line.rstrip("\n") for line in f]
+
+POSTINGS = ("postings_genome", "postings_start", "postings_len", "postings_owner")
+
+def _postings(store: SketchStore):
+    """
+    Genome id of every hash entry in hash order, and for every entry the start and length
+    of its hash's postings run, with the entries regrouped by genome.
+    """
+    n = len(store)
+    id_type = np.int32 if n < 2**31 else np.int64
+    order = np.argsort(store.hashes, kind="stable")
+    hashes = store.hashes[order]
+    genome = np.repeat(np.arange(n, dtype=id_type), store.sizes())[order]
+    run_start = np.flatnonzero(np.concatenate(([True], hashes[1:] != hashes[:-1]))) if len(hashes) else np.zeros(0, dtype=np.int64)
+    del hashes
+    run_len = np.diff(np.append(run_start, len(genome)))
+    # regrouped by genome, each genome's entries stay in hash order
+    by_genome = np.argsort(genome, kind="stable")
+    run_of = np.repeat(np.arange(len(run_start)), run_len)[by_genome]
+    return dict(zip(POSTINGS, (genome, run_start[run_of], run_len[run_of], genome[by_genome])))
+
+def index_store(store: SketchStore):
+    """Add the postings index to store (kept on disk next to the hashes of an opened store) unless it has one."""
+    if not all(name in store.arrays for name in POSTINGS):
+        store.add_arrays(**_postings(store))
+
+def _blocks(store: SketchStore, block_incidences: int) -> List[Tuple[int, int]]:
+    """Consecutive genome ranges [a0, a1) whose expansion stays within block_incidences (at least one genome each)."""
+    n = len(store)
+    # expansion work done before each genome
+    work = np.concatenate(([0], np.cumsum(store.arrays["postings_len"])))[store.offsets]
+    blocks, a0 = [], 0
+    while a0 < n:
+        a1 = int(np.searchsorted(work, work[a0] + block_incidences, side="right")) - 1
+        a1 = min(max(a1, a0 + 1), n)
+        blocks.append((a0, a1))
+        a0 = a1
+    return blocks
+
+def _block_counts(store: SketchStore, a0: int, a1: int):
+    n = len(store)
+    genome, start, run_len, owner = (store.arrays[name] for name in POSTINGS)
+    lo, hi = store.offsets[a0], store.offsets[a1]
+    lengths = run_len[lo:hi]
+    total = int(lengths.sum())
+    # ragged expansion: every entry paired with every member of its postings run
+    offsets = np.repeat(np.cumsum(lengths) - lengths, lengths)
+    partner = genome[np.repeat(start[lo:hi], lengths) + np.arange(total) - offsets]
+    keys = np.repeat(owner[lo:hi].astype(np.int64), lengths) * n + partner
+    keys, counts = np.unique(keys, return_counts=True)
+    return keys // n, keys % n, counts
+
+_worker_store = None
+
+def _init_worker(store):
+    global _worker_store
+    _worker_store = store
+
+def _worker_block(block):
+    return _block_counts(_worker_store, *block)
+
+def shared_counts(sketches, block_incidences: int = BLOCK_INCIDENCES, workers: int = 1
+                  ) -> Iterator[Tuple[int, int, np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    Yields (a0, a1, a, b, |A & B|): every ordered pair sharing at least one hash (a == b included)
+    for the genomes a0 <= a < a1, sorted by (a, b); the blocks cover all genomes in order.
+    sketches: sorted uint64 arrays, or a SketchStore
+    workers: processes counting blocks in parallel; they map the store (or share it through
+    shared memory when it has no directory) instead of receiving copies of the hashes
+    """
+    store = sketches if isinstance(sketches, SketchStore) else SketchStore.from_sketches(range(len(sketches)), sketches)
+    index_store(store)
+    blocks = _blocks(store, block_incidences)
+    if workers <= 1 or len(blocks) <= 1:
+        for a0, a1 in blocks:
+            yield (a0, a1) + _block_counts(store, a0, a1)
+        return
+    shared = store.to_shared_memory() if store.path is None else None
+    try:
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(shared or store,)) as pool:
+            for (a0, a1), result in zip(blocks, pool.map(_worker_block, blocks)):
+                yield (a0, a1) + result
+    finally:
+        if shared is not None:
+            shared.close()
+
+def containment_pairs(names: Sequence[str], sketches, threshold: Optional[float] = None,
+                      ksize: Optional[int] = None, block_incidences: int = BLOCK_INCIDENCES,
+                      value_name: str = "containment", workers: int = 1) -> Iterator[pd.DataFrame]:
+    """
+    Long-form (A, B, value_name[, ksize]) tables of |A & B| / |B|, a block of A at a time.
+    sketches: sorted uint64 arrays, or a SketchStore (see shared_counts for workers)
+    threshold: only pairs with C >= threshold (None: every pair, zeros included, like the matrix readers)
+    The diagonal is 1.0 even for an empty sketch, as in sourmash compare.
+    """
+    names = np.asarray(names, dtype=object)
+    n = len(sketches)
+    if isinstance(sketches, SketchStore):
+        sizes = sketches.sizes().astype(np.float64)
+    else:
+        sizes = np.array([len(s) for s in sketches], dtype=np.float64)
+    dense = threshold is None or threshold <= 0
+    for a0, a1, a, b, counts in shared_counts(sketches, block_incidences, workers):
+        values = counts / sizes[b]
+        empty = a0 + np.flatnonzero(sizes[a0:a1] == 0)
+        if dense:
+            grid = np.zeros((a1 - a0, n))
+            grid[a - a0, b] = values
+            grid[empty - a0, empty] = 1.0
+            a, b = np.divmod(np.arange(grid.size), n)
+            a += a0
+            values = grid.ravel()
+        else:
+            if len(empty):
+                order = np.argsort(np.concatenate((a * n + b, empty * n + empty)), kind="stable")
+                a, b = np.concatenate((a, empty))[order], np.concatenate((b, empty))[order]
+                values = np.concatenate((values, np.ones(len(empty))))[order]
+            keep = values >= threshold
+            a, b, values = a[keep], b[keep], values[keep]
+        yield _frame(names, a, b, values, ksize, value_name)
+
+def _frame(names, a, b, values, ksize, value_name):
+    df = pd.DataFrame({"A": names[a], "B": names[b], value_name: values})
+    if ksize is not None:
+        df["ksize"] = ksize
+    return df
+
+def containment_table(names: Sequence[str], sketches, threshold: Optional[float] = None,
+                      ksize: Optional[int] = None, value_name: str = "containment", workers: int = 1) -> pd.DataFrame:
+    """containment_pairs() concatenated into one table."""
+    tables = list(containment_pairs(names, sketches, threshold, ksize, value_name=value_name, workers=workers))
+    if not tables:
+        return _frame(np.zeros(0, dtype=object), np.zeros(0, dtype=int), np.zeros(0, dtype=int), np.zeros(0), ksize, value_name)
+    return pd.concat(tables, ignore_index=True)
+
+def main():
+    ap = argparse.ArgumentParser(description="All-vs-all containment from signatures, writing only pairs at or above a threshold.")
+    src = ap.add_mutually_exclusive_group(required=True)
+    src.add_argument("--sigs", nargs="+", help="Signature files (.sig, .sig.gz, .sig.gzip)")
+    src.add_argument("--store", help="Sketch store directory (sketch_store.py); its postings index is kept there for later runs")
+    ap.add_argument("--ksize", type=int, default=None, help="k-mer size of the sketches to use, in bases (DNA) or residues (protein)")
+    ap.add_argument("--molecule", default=None, help="dna or protein (default: any)")
+    ap.add_argument("--threshold", type=float, default=None, help="Minimum containment to write (default: every pair)")
+    ap.add_argument("--out", required=True, help="Output CSV with columns A,B,containment[,ksize]")
+    ap.add_argument("--label_ksize", type=int, default=None, help="Value of the ksize column (default: no column)")
+    ap.add_argument("--workers", type=int, default=1, help="Processes counting blocks of genomes (default: 1)")
+    args = ap.parse_args()
+
+    if args.store:
+        sketches = SketchStore.open(args.store)
+        names = sketches.labels
+    else:
+        names, sketches = load_signatures(args.sigs, args.ksize, args.molecule)
+    rows = 0
+    with open(args.out, "w", newline="") as out:
+        header = True
+        for chunk in containment_pairs(names, sketches, args.threshold, args.label_ksize, workers=args.workers):
+            chunk.to_csv(out, index=False, header=header)
+            header, rows = False, rows + len(chunk)
+        if header:
+            out.write("A,B,containment" + (",ksize" if args.label_ksize is not None else "") + "\n")
+    print(f"{len(names)} sketches, {rows} pairs -> {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Streaming FASTA reader/writer shared by the helper scripts.
+
+Input may be plain, gzip or bgzip (bgzip is multi-member gzip, which the gzip
+module reads transparently); compression is detected from the magic bytes, not
+the file name. Records are parsed from large binary blocks: the buffer is split
+on record starts and line breaks are removed with bytes.translate, so memory
+stays bounded by the largest record rather than the file.
+
+Scripts outside helper_scripts/ import this module after putting the
+helper_scripts directory on sys.path.
+"""
+
+import gzip
+import mmap
+import os
+import tempfile
+from pathlib import Path
+from typing import Iterable, Iterator, List, Tuple, Union
+
+BLOCK_SIZE = 1 << 22  # 4 MiB per read
+GZIP_MAGIC = b"\x1f\x8b"
+_LINE_BREAKS = b"\r\n\t "
+INDEX_SUFFIX = ".fxi"
+
+# (header, offset, byte_length, sequence_length) of one record; offset points at its '>'
+IndexEntry = Tuple[str, int, int, int]
+
+def open_fasta(path, mode: str = "rb"):
+    """Open a FASTA file for reading ('rb') or writing ('wb'/'wt'); gzip is sniffed on read and chosen by a .gz suffix on write."""
+    path = Path(path)
+    if "r" in mode:
+        with open(path, "rb") as f:
+            compressed = f.read(2) == GZIP_MAGIC
+    else:
+        compressed = path.suffix in (".gz", ".bgz")
+    if not compressed:
+        return open(path, mode)
+    return gzip.open(path, mode) if "r" in mode else gzip.open(path, mode, compresslevel=1)
+
+def is_gzipped(path) -> bool:
+    with open(path, "rb") as f:
+        return f.read(2) == GZIP_MAGIC
+
+def _parse_record(chunk: bytes) -> Tuple[bytes, bytes]:
+    """chunk is one record without its leading '>'; returns (header, sequence)."""
+    nl = chunk.find(b"\n")
+    if nl < 0:
+        return chunk.rstrip(), b""
+    return chunk[:nl].rstrip(), chunk[nl + 1:].translate(None, _LINE_BREAKS)
+
+def read_fasta_bytes(path, block_size: int = BLOCK_SIZE) -> Iterator[Tuple[bytes, bytes]]:
+    """Yield (header, sequence) as bytes; the header excludes '>'. Text before the first record is ignored."""
+    with open_fasta(path, "rb") as f:
+        # the leading newline makes every record start, including one at offset 0, a b"\n>" boundary
+        buf, preamble = b"\n", True
+        while True:
+            block = f.read(block_size)
+            buf += block
+            records = buf.split(b"\n>")
+            buf = records.pop() if block else b""
+            if preamble and records:
+                records, preamble = records[1:], False
+            for chunk in records:
+                yield _parse_record(chunk)
+            if not block:
+                return
+
+def read_fasta(path, block_size: int = BLOCK_SIZE) -> Iterator[Tuple[str, str]]:
+    """Yield (header, sequence) as str; the header is the full header line without '>'."""
+    for header, seq in read_fasta_bytes(path, block_size):
+        yield header.decode(), seq.decode()
+
+def record_id(header: str) -> str:
+    """First whitespace-delimited token of a header, as Biopython's record.id."""
+    return header.split(None, 1)[0] if header.strip() else ""
+
+def format_fasta(records: Iterable[Tuple[str, str]], width: Union[int, None] = None) -> str:
+    """Render (header, sequence) records; headers may or may not carry '>'. width=None writes one line per sequence."""
+    out = []
+    for header, seq in records:
+        out.append(header if header.startswith(">") else ">" + header)
+        if width:
+            out.extend(seq[i:i + width] for i in range(0, len(seq), width))
+        else:
+            out.append(seq)
+    return "\n".join(out) + "\n" if out else ""
+
+def write_fasta(path_or_handle, records: Iterable[Tuple[str, str]], width: Union[int, None] = None,
+                batch: int = 10000) -> int:
+    """Write records in bulk (batch records per write) to a path or an open text handle; returns the record count."""
+    if isinstance(path_or_handle, (str, Path)):
+        with open_fasta(path_or_handle, "wt") as handle:
+            return write_fasta(handle, records, width, batch)
+    n, pending = 0, []
+    for rec in records:
+        pending.append(rec)
+        if len(pending) >= batch:
+            path_or_handle.write(format_fasta(pending, width))
+            n += len(pending); pending = []
+    if pending:
+        path_or_handle.write(format_fasta(pending, width))
+        n += len(pending)
+    return n
+
+# ---------- Random access (faidx-style) ----------
+
+def build_fasta_index(path) -> List[IndexEntry]:
+    """Scan an uncompressed FASTA once and return an IndexEntry per record."""
+    entries: List[IndexEntry] = []
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return entries
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            # text before the first record is skipped, as in read_fasta_bytes
+            start = 0 if mm[:1] == b">" else mm.find(b"\n>") + 1
+            if start == 0 and mm[:1] != b">":
+                return entries
+            while True:
+                nxt = mm.find(b"\n>", start)
+                end = len(mm) if nxt < 0 else nxt + 1
+                header, seq = _parse_record(mm[start + 1:end])
+                entries.append((header.decode(), start, end - start, len(seq)))
+                if nxt < 0:
+                    break
+                start = end
+    return entries
+
+def _index_stamp(path) -> str:
+    st = os.stat(path)
+    return f"#fxi\t{st.st_size}\t{st.st_mtime_ns}"
+
+def load_fasta_index(path, persist: bool = True) -> List[IndexEntry]:
+    """
+    Return the record index of a FASTA, reading <path>.fxi when it matches the file's
+    size and mtime and (re)building it otherwise. The index is written next to the
+    FASTA when persist is set and the directory is writable; it is written under a
+    temporary name and renamed, so concurrent readers never see a partial index.
+    Compressed input cannot be seeked: it is indexed by streaming, with the record
+    number in place of the offset and nothing persisted, and fetch_records streams it again.
+    """
+    if is_gzipped(path):
+        return [(header.decode(), number, 0, len(seq)) for number, (header, seq) in enumerate(read_fasta_bytes(path))]
+    index_path = Path(f"{path}{INDEX_SUFFIX}")
+    stamp = _index_stamp(path)
+    if index_path.exists():
+        with open(index_path) as f:
+            if f.readline().rstrip("\n") == stamp:
+                entries = []
+                for line in f:
+                    offset, nbytes, seqlen, header = line.rstrip("\n").split("\t", 3)
+                    entries.append((header, int(offset), int(nbytes), int(seqlen)))
+                return entries
+    entries = build_fasta_index(path)
+    if persist:
+        tmp = None
+        try:
+            with tempfile.NamedTemporaryFile("w", dir=index_path.parent, prefix=f".{index_path.name}.", delete=False) as tmp:
+                tmp.write(stamp + "\n")
+                tmp.writelines(f"{o}\t{n}\t{l}\t{h}\n" for h, o, n, l in entries)
+            os.replace(tmp.name, index_path)
+        except OSError:
+            if tmp is not None and os.path.exists(tmp.name):
+                os.unlink(tmp.name)
+    return entries
+
+def fetch_records(path, entries: Iterable[IndexEntry]) -> List[Tuple[str, str]]:
+    """Seek-read the given records, in the order given; returns [(header, sequence)] with headers without '>'."""
+    entries = list(entries)
+    records: List[Tuple[str, str]] = [("", "")] * len(entries)
+    if is_gzipped(path):
+        # entries of compressed input carry record numbers (see load_fasta_index): one streaming pass
+        wanted = {}
+        for k, entry in enumerate(entries):
+            wanted.setdefault(entry[1], []).append(k)
+        for number, (header, seq) in enumerate(read_fasta_bytes(path)):
+            for k in wanted.get(number, ()):
+                records[k] = (header.decode(), seq.decode())
+        return records
+    with open(path, "rb") as f:
+        # visit records in file order so reads stay sequential
+        for k in sorted(range(len(entries)), key=lambda k: entries[k][1]):
+            _, offset, nbytes, _ = entries[k]
+            f.seek(offset)
+            header, seq = _parse_record(f.read(nbytes)[1:])
+            records[k] = (header.decode(), seq.decode())
+    return records
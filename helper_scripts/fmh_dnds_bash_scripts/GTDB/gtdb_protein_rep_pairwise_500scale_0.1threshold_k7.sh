@@ -4,15 +4,11 @@ set -eoux pipefail
 #Parameters
 wd=/data/jzr5814/sourmash_dnds_estimation/tests/results/genomic_dnds/gtdb_protein_rep_pairwise_500scale_0.1threshold_k7
 k='7'
-scaled=500
-translate_cds='no' #indicate with yes or no
-m="bwpair" #branchwater mode, single fasta file use sourmash sketch, multiple fasta files to use sourmash sketch
-c=100
 t=0.1
 
-#Note that if using branchwater mode, makesure working directory is at the beginning of filename. THIS IS NOT REQUIERED FOR OTHER MODES
-cds_input_list=${wd}/dataset.csv
-out=demo_branchwater
+#Derive from the 0.02 threshold run of the same k (run that script first): its pairs with DNA and protein
+#max containment >= ${t} are exactly this threshold's, so the omega table is filtered instead of recomputed
+base_t=0.02
+base_wd=/data/jzr5814/sourmash_dnds_estimation/tests/results/genomic_dnds/gtdb_protein_rep_pairwise_500scale_0.02threshold_k7
 
-#Run FMH Omega
-python3 /data/jzr5814/repositories/dnds-using-fmh/src/script_fmh_omega.py --fasta_input_list ${cds_input_list} --scaled_input ${scaled} --ksize ${k} --mode ${m} --translate ${translate_cds} --outname ${out} --directory ${wd} --cores ${c} --threshold ${t} 
+python3 "$(dirname "$0")/../../threshold_sweep.py" --input ${base_wd}/fmh_omega_${k}.csv --base_threshold ${base_t} --thresholds ${t} --output ${wd}/fmh_omega_${k}.csv
@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+In-process FracMinHash dN/dS (omega) from a DNA and a protein sourmash compare matrix.
+
+Mirrors the estimator of script_fmh_omega.py (dnds-using-fmh) so the pipelines can
+compute omega without one interpreter launch per input:
+
+    AAI_approx = AA_max_Cfrac ** (1/k)          ANI_approx = DNA_max_Cfrac ** (1/(3k))
+    PdN = 1 - AAI_approx                        PdS = AAI_approx - ANI_approx ** 3
+    dN/dS = PdN/PdS * 77/223
+
+k is the protein k-mer size (DNA k-mers are 3k long). The output has one row per
+unordered pair of distinct signatures with the fmh_omega_<k>.csv columns.
+
+The labels are walked in the row order of the output, a block at a time: the
+pairs a block of labels heads get their DNA and protein max containment from the
+two sources, are masked at the threshold and go through omega as array
+expressions, so memory follows the block (BLOCK_PAIRS candidates) rather than the
+number of pairs, and names are only turned into strings for the rows being
+written. A source is a compare matrix, read as needed, or a sketch store
+(sketch_store.py), whose pairs sharing a hash are counted once through
+containment_index.py and held as one key and value each:
+
+    python3 fmh_omega.py --dna_sample dna_store --protein_sample protein_store --ksize 7 \
+        --threshold 0.02 --out fmh_omega_7.csv
+"""
+
+import argparse
+import csv
+import os
+
+import numpy as np
+import pandas as pd
+
+# synonymous / non-synonymous site ratio used by FracMinHash dN/dS
+SITE_RATIO = 77 / 223
+
+# candidate pairs expanded per block of the kernel; a block always holds whole lo labels
+BLOCK_PAIRS = 1 << 22
+
+OMEGA_COLUMNS = ["A,B", "A", "B", "DNA_max_Cfrac", "AA_max_Cfrac", "ksize",
+                 "PdN", "PdS", "PdN/PdS", "dN/dS", "ANI_approx", "AAI_approx"]
+
+def read_compare_matrix(path):
+    """
+    Return (labels, matrix) for a sourmash compare output: the --csv table or the
+    binary .npy written by -o (labels from <name>.npy.labels.txt). As everywhere else
+    in this repo only the top-left block is kept, since compare is run as `ref ref`;
+    from a CSV only that block is parsed.
+    """
+    from containment_index import read_compare_labels
+
+    path = str(path)
+    if path.endswith(".npy"):
+        labels = read_compare_labels(path)
+        n = len(labels) // 2
+        matrix = np.load(path, mmap_mode="r")[:n, :n]
+    else:
+        with open(path, newline="") as f:
+            labels = next(csv.reader([f.readline()]))
+            n = len(labels) // 2
+            matrix = np.loadtxt(f, delimiter=",", usecols=range(n), max_rows=n, ndmin=2) if n else np.zeros((0, 0))
+    return labels[:n], np.asarray(matrix, dtype=np.float64)
+
+def max_containment(matrix):
+    """max(C(A,B), C(B,A)) for every pair of a compare --containment matrix."""
+    return np.maximum(matrix, matrix.T)
+
+def above_threshold(dna_cfrac, aa_cfrac, threshold):
+    """Pairs kept at a containment threshold: DNA and protein max containment both >= threshold."""
+    return (dna_cfrac >= threshold) & (aa_cfrac >= threshold)
+
+def _ragged(starts, lengths):
+    """Concatenation of arange(s, s + l) for every start s and length l."""
+    offsets = np.cumsum(lengths) - lengths
+    return np.repeat(starts - offsets, lengths) + np.arange(int(lengths.sum()))
+
+def _lookup(keys, table_keys, table_values):
+    """table_values at keys (table_keys sorted), 0 where a pair is not in the table."""
+    pos = np.searchsorted(table_keys, keys)
+    pos[pos == len(table_keys)] = 0
+    hit = table_keys[pos] == keys if len(table_keys) else np.zeros(len(keys), dtype=bool)
+    return np.where(hit, table_values[pos] if len(table_keys) else 0.0, 0.0)
+
+class MatrixPairs:
+    """Max containment of the pairs of a square compare matrix, max(M[a, b], M[b, a]) read as needed."""
+
+    def __init__(self, labels, matrix):
+        self.labels = list(labels)
+        self.matrix = matrix
+
+    def index(self, place):
+        """Nothing to count: every pair is read from the matrix."""
+
+    def values(self, a, b):
+        return np.maximum(self.matrix[a, b], self.matrix[b, a])
+
+class StorePairs:
+    """
+    Max containment of the pairs of a sketch store that share a hash (containment_index.shared_counts).
+    A pair shares |A & B| hashes both ways, so its max containment is |A & B| / min(|A|, |B|), and a pair
+    sharing none has 0. Only the pairs sharing a hash (and >= threshold, if given) are held, as
+    int64 key a * n + b and value, under the label a of the pair placed first.
+    """
+
+    def __init__(self, store, threshold=None, workers=1):
+        self.labels = list(store.labels)
+        self.store, self.threshold, self.workers = store, threshold, workers
+
+    def index(self, place):
+        """Count the shared hashes, keeping each pair as (a, b) with place[a] < place[b]."""
+        from containment_index import shared_counts
+
+        n = len(self.labels)
+        sizes = self.store.sizes()
+        keys, values = [], []
+        # blocks come in order of a, sorted by (a, b), so the keys are sorted as they are appended
+        for _, _, a, b, counts in shared_counts(self.store, workers=self.workers):
+            first = place[a] < place[b]
+            a, b, counts = a[first], b[first], counts[first]
+            cfrac = counts / np.minimum(sizes[a], sizes[b])
+            if self.threshold is not None:
+                keep = cfrac >= self.threshold
+                a, b, cfrac = a[keep], b[keep], cfrac[keep]
+            keys.append(a * n + b)
+            values.append(cfrac)
+        self.keys = np.concatenate(keys) if keys else np.zeros(0, dtype=np.int64)
+        self.cfrac = np.concatenate(values) if values else np.zeros(0)
+        self.starts = np.searchsorted(self.keys, np.arange(n + 1, dtype=np.int64) * n)
+
+    def row_sizes(self):
+        return np.diff(self.starts)
+
+    def rows(self, lo):
+        """(a, b, value) of the pairs held under each label of lo."""
+        at = _ragged(self.starts[lo], self.starts[lo + 1] - self.starts[lo])
+        a, b = np.divmod(self.keys[at], len(self.labels))
+        return a, b, self.cfrac[at]
+
+    def values(self, a, b):
+        return _lookup(a * len(self.labels) + b, self.keys, self.cfrac)
+
+def open_pairs(source, threshold=0.0, workers=1):
+    """MatrixPairs of a compare matrix (.csv/.npy), or StorePairs of a sketch store directory holding the pairs >= threshold."""
+    if os.path.isdir(source):
+        from sketch_store import SketchStore
+
+        return StorePairs(SketchStore.open(source), threshold if threshold > 0 else None, workers)
+    return MatrixPairs(*read_compare_matrix(source))
+
+def _ranks(values):
+    """Rank of every value in sorted order, equal values sharing a rank."""
+    _, inverse = np.unique(values.astype(str), return_inverse=True)
+    return inverse.astype(np.int64)
+
+def omega_blocks(dna, protein, threshold=0.0, block_pairs=None):
+    """
+    Yields (lo, hi, DNA max containment, protein max containment) of the pairs kept at threshold, a block
+    of lo labels at a time, in the row order of the omega table; lo and hi index dna.labels and lo is the
+    label of the pair that sorts first by name. dna and protein are MatrixPairs or StorePairs of the same
+    labels. With threshold <= 0 every pair is a candidate (a pair missing from a store counting 0),
+    otherwise only the DNA pairs >= threshold are; either way a block expands about block_pairs of them
+    (None: BLOCK_PAIRS).
+    """
+    labels = dna.labels
+    n = len(labels)
+    block_pairs = block_pairs or BLOCK_PAIRS
+    # "A,B" is str(tuple(sorted((A, B)))) = "(" + repr(lo) + ", " + repr(hi) + ")"; no repr is a prefix of
+    # another (each ends in its unescaped quote), so sorting it is sorting by (repr rank of lo, of hi)
+    repr_rank = _ranks(np.array([repr(name) for name in labels], dtype=object))
+    # labels placed by name, ties in label order: a pair's lo is the label placed first
+    by_name = np.argsort(_ranks(np.asarray(labels, dtype=object)), kind="stable")
+    place = np.empty(n, dtype=np.int64)
+    place[by_name] = np.arange(n)
+    if list(protein.labels) == list(labels):
+        to_aa = np.arange(n)
+    else:
+        index = {name: k for k, name in enumerate(protein.labels)}
+        to_aa = np.array([index[name] for name in labels], dtype=np.int64)
+    aa_place = np.full(len(protein.labels), n, dtype=np.int64)
+    aa_place[to_aa] = place
+    dna.index(place)
+    protein.index(aa_place)
+
+    dense = threshold <= 0 or not isinstance(dna, StorePairs)
+    sizes = n - 1 - place if dense else dna.row_sizes()
+    # lo labels in output order, cut into blocks between labels of different repr
+    los = np.lexsort((place, repr_rank))
+    distinct = len(np.unique(repr_rank)) == n
+    work = np.concatenate(([0], np.cumsum(sizes[los])))
+    cuts = np.append(np.flatnonzero(np.diff(repr_rank[los])) + 1, n)
+    s = 0
+    while s < n:
+        e = int(np.searchsorted(work, work[s] + block_pairs, side="right")) - 1
+        e = int(cuts[np.searchsorted(cuts, max(e, s + 1))])
+        lo = los[s:e]
+        s = e
+        if dense:
+            length = n - 1 - place[lo]
+            lo, hi = np.repeat(lo, length), by_name[_ragged(place[lo] + 1, length)]
+            dna_cfrac = dna.values(lo, hi)
+        else:
+            lo, hi, dna_cfrac = dna.rows(lo)
+        aa_cfrac = protein.values(to_aa[lo], to_aa[hi])
+        keep = above_threshold(dna_cfrac, aa_cfrac, threshold)
+        lo, hi, dna_cfrac, aa_cfrac = lo[keep], hi[keep], dna_cfrac[keep], aa_cfrac[keep]
+        key = repr_rank[lo] * n + repr_rank[hi]
+        if not distinct:
+            # equal reprs (repeated labels) keep the order of the pairs by (i, j), i < j
+            order = np.lexsort((np.maximum(lo, hi), np.minimum(lo, hi), key))
+        elif np.any(key[1:] < key[:-1]):
+            order = np.argsort(key)
+        else:
+            # dense rows come out sorted whenever repr order follows name order, as for accessions
+            yield lo, hi, dna_cfrac, aa_cfrac
+            continue
+        yield lo[order], hi[order], dna_cfrac[order], aa_cfrac[order]
+
+def omega_rates(dna_cfrac, aa_cfrac, ksize):
+    """The mutation-rate columns of the omega table for arrays of DNA and protein max containments."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        aai = aa_cfrac ** (1.0 / ksize)
+        ani = dna_cfrac ** (1.0 / (3 * ksize))
+        pdn = 1.0 - aai
+        pds = aai - ani ** 3
+        ratio = pdn / pds
+    return {"PdN": pdn, "PdS": pds, "PdN/PdS": ratio, "dN/dS": ratio * SITE_RATIO,
+            "ANI_approx": ani, "AAI_approx": aai}
+
+def omega_frames(dna, protein, ksize, threshold=0.0, chunksize=None):
+    """
+    The omega table of omega_blocks() in frames of at most chunksize rows (None: one per block), at
+    least one frame. Strings are only built for the rows of a frame.
+    """
+    names = np.asarray(dna.labels, dtype=object)
+    reprs = np.array([repr(name) for name in dna.labels], dtype=object)
+    left, right = "(" + reprs + ", ", reprs + ")"
+
+    def frame(lo, hi, dna_cfrac, aa_cfrac):
+        return pd.DataFrame({
+            "A,B": left[lo] + right[hi],
+            "A": names[np.minimum(lo, hi)],
+            "B": names[np.maximum(lo, hi)],
+            "DNA_max_Cfrac": dna_cfrac,
+            "AA_max_Cfrac": aa_cfrac,
+            "ksize": ksize,
+            **omega_rates(dna_cfrac, aa_cfrac, ksize),
+        }, columns=OMEGA_COLUMNS)
+
+    empty = True
+    for lo, hi, dna_cfrac, aa_cfrac in omega_blocks(dna, protein, threshold):
+        step = chunksize or max(1, len(lo))
+        for c in range(0, len(lo), step):
+            yield frame(lo[c:c + step], hi[c:c + step], dna_cfrac[c:c + step], aa_cfrac[c:c + step])
+            empty = False
+    if empty:
+        none = np.zeros(0, dtype=np.int64)
+        yield frame(none, none, np.zeros(0), np.zeros(0))
+
+def _table(frames):
+    frames = list(frames)
+    return frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+
+def omega_table(labels, dna_cfrac, aa_cfrac, ksize, threshold=0.0):
+    """
+    dN/dS for every unordered pair (i < j) of labels.
+    dna_cfrac/aa_cfrac: square max-containment matrices in the order of labels
+    threshold: pairs whose DNA or protein containment is below it are dropped
+    """
+    return _table(omega_frames(MatrixPairs(labels, dna_cfrac), MatrixPairs(labels, aa_cfrac), ksize, threshold))
+
+def fmh_omega(dna_compare, protein_compare, ksize, threshold=0.0):
+    """Omega table for one pair of compare outputs (same signatures sketched as DNA and as protein)."""
+    dna, protein = open_pairs(dna_compare, threshold), open_pairs(protein_compare, threshold)
+    return _table(omega_frames(dna, protein, ksize, threshold))
+
+def write_omega(path, dna, protein, ksize, threshold=0.0, chunksize=1_000_000):
+    """Write the omega table of two pair sources to path (fmh_omega_<k>.csv), chunk by chunk; returns the rows written."""
+    rows = 0
+    with open(path, "w", newline="") as out:
+        for frame in omega_frames(dna, protein, ksize, threshold, chunksize):
+            frame.to_csv(out, index=False, header=rows == 0)
+            rows += len(frame)
+    return rows
+
+def main():
+    ap = argparse.ArgumentParser(description="FracMinHash dN/dS of every pair of a DNA and a protein containment source.")
+    ap.add_argument("--dna_sample", required=True, help="DNA compare matrix (--csv or .npy) or sketch store directory")
+    ap.add_argument("--protein_sample", required=True, help="Protein compare matrix (--csv or .npy) or sketch store directory")
+    ap.add_argument("--ksize", type=int, required=True, help="Protein k-mer size (DNA k-mers are 3k long)")
+    ap.add_argument("--threshold", type=float, default=0.0, help="Minimum DNA and protein max containment (default: 0, every pair)")
+    ap.add_argument("--workers", type=int, default=1, help="Processes counting shared hashes of sketch stores (default: 1)")
+    ap.add_argument("--out", required=True, help="Output fmh_omega_<k>.csv")
+    args = ap.parse_args()
+
+    dna = open_pairs(args.dna_sample, args.threshold, args.workers)
+    protein = open_pairs(args.protein_sample, args.threshold, args.workers)
+    rows = write_omega(args.out, dna, protein, args.ksize, args.threshold)
+    print(f"{len(dna.labels)} labels, {rows} pairs -> {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -10,57 +10,81 @@
 import argparse
 import subprocess
 import os
+import sys
 from Bio.SeqUtils.CheckSum import seguid
 from Bio import SeqIO
 from collections import defaultdict
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from ng86 import ng86_file
+
+def read_grouped(input_file):
+    """
+    Records as (description, sequence, seguid) grouped by identical sequence, groups in order
+    of first appearance (the order both former code paths wrote pairs in).
+    """
+    groups = defaultdict(list)
+    for record in SeqIO.parse(input_file, "fasta"):
+        groups[seguid(record.seq)].append((record.description, str(record.seq)))
+    return [(name, seq, key) for key, records in groups.items() for name, seq in records]
+
+def write_pairs(records, axt_path, refs=None, dedup=False):
+    """
+    Stream the AXT blocks for every (ref, other) pair, other running over all records.
+    refs: names used as the first element (default: every record, i.e. all ordered pairs incl. self)
+    dedup: a pair whose two sequences were already written under another name is not written again
+    Returns [(pair, scored_as)] for every requested pair, in order.
+    """
+    written, order = {}, []
+    with open(axt_path, 'w') as axt_file:
+        for ref, ref_seq, ref_key in records:
+            if refs is not None and ref not in refs:
+                continue
+            for other, other_seq, other_key in records:
+                pair = f'{ref}_vs_{other}'
+                if dedup and (ref_key, other_key) in written:
+                    order.append((pair, written[(ref_key, other_key)]))
+                    continue
+                written[(ref_key, other_key)] = pair
+                order.append((pair, pair))
+                axt_file.write(f'{pair}\n{ref_seq}\n{other_seq}\n\n')
+    return order
+
+def expand_duplicates(kaks_path, order):
+    """Rewrite a .kaks so every requested pair has a row, copying the row its sequences were scored under."""
+    with open(kaks_path) as f:
+        header = f.readline()
+        rows = {line.split('\t', 1)[0]: line.split('\t', 1)[1] for line in f if line.strip()}
+    with open(kaks_path, 'w') as f:
+        f.write(header)
+        for pair, scored_as in order:
+            if scored_as in rows:
+                f.write(f'{pair}\t{rows[scored_as]}')
+
 def main(args):
 
     input_file = args.input
     input_filename = os.path.basename(args.input)
     wd=args.wd.rstrip('/')
-    axt_file = open(f'{wd}/{input_filename}.axt','w')
+    axt_path = f'{wd}/{input_filename}.axt'
+    kaks_path = f'{axt_path}.kaks'
 
-    seq_dict = defaultdict(list)
-    for record in SeqIO.parse(input_file, "fasta"):
-        key = seguid(record.seq)
-        seq_dict[key].append(record)
-
-    if args.short:
-        # Shorter sequences create duplicate keys when running SeqIO.to_dict, Assuming seq_dict contains lists of SeqRecord objects
-        for key, records in seq_dict.items():  # Iterate through each key and list of SeqRecord objects
-            for ref_record in records:  # Loop over each SeqRecord in the list of the current key
-                ref = ref_record.description  # Access the description of the current reference record
-                ref_seq = str(ref_record.seq)  # Access the sequence of the current reference record
-                
-                # Now compare this reference record with every other SeqRecord in seq_dict
-                for other_key, other_records in seq_dict.items():  # Compare with every key in the dictionary
-                    for other_record in other_records:  # Loop through the list of SeqRecord objects for the other key
-                        key_name = str(other_record.description)  # Get the description of the other SeqRecord
-                        
-                        # Print and write comparison information
-                        axt_file.write(f'{ref}_vs_{key_name}\n')  # Write the comparison to the file
-                        axt_file.write(ref_seq + '\n')  # Write the reference sequence to the file
-                        axt_file.write(str(other_record.seq) + '\n')  # Write the other sequence to the file
-                        axt_file.write('\n')  # Write an empty line to separate comparison
+    records = read_grouped(input_file)
+    refs = None
+    if args.ref_vs_queries:
+        # the figures only keep rows whose first sequence is the reference
+        refs = {args.ref or records[0][0]}
+    order = write_pairs(records, axt_path, refs=refs, dedup=args.dedup)
+    print(f'{len(order)} pairs requested, {sum(p == s for p, s in order)} written to {axt_path}')
 
+    if args.native and args.method == 'NG':
+        ng86_file(axt_path, kaks_path)
     else:
-        seguid_dict = SeqIO.to_dict(SeqIO.parse(input_file, "fasta"), lambda rec: seguid(rec.seq))
-        for key in seguid_dict:
-            ref = seguid_dict[key].description
-            ref_seq = str(seguid_dict[key].seq)
-            for key in seguid_dict:
-                key_name = str(seguid_dict[key].description)
-                axt_file.write(f'{ref}_vs_{key_name}')
-                axt_file.write('\n')
-                axt_file.write(ref_seq)
-                axt_file.write('\n')
-                axt_file.write(str(seguid_dict[key].seq))
-                axt_file.write('\n')
-                axt_file.write('\n')
-
-    cmd=f'KaKs_Calculator -i {wd}/{input_filename}.axt -o {wd}/{input_filename}.axt.kaks -m {args.method}'
-    subprocess.run(cmd, shell=True, check=True)
+        cmd=f'KaKs_Calculator -i {axt_path} -o {kaks_path} -m {args.method}'
+        subprocess.run(cmd, shell=True, check=True)
+
+    if args.dedup:
+        expand_duplicates(kaks_path, order)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
@@ -88,7 +112,32 @@ if __name__ == "__main__":
     parser.add_argument(
         '--short',
         action='store_true',  # This makes the argument a boolean flag
-        help='When applying on shorter sequences, less than 1000 nucleotides long (default: False)'
+        help='When applying on shorter sequences, less than 1000 nucleotides long (default: False). Identical sequences are always handled now; kept for older command lines.'
+    )
+
+    parser.add_argument(
+        '--ref_vs_queries',
+        action='store_true',
+        help='Only pair the reference (first entry, or --ref) with every sequence instead of all ordered pairs (default: False)'
+    )
+
+    parser.add_argument(
+        '--ref',
+        type=str,
+        default=None,
+        help='Reference description for --ref_vs_queries (default: the first entry)'
+    )
+
+    parser.add_argument(
+        '--dedup',
+        action='store_true',
+        help='Score each pair of identical sequences once and copy its row to the other pair names (default: False)'
+    )
+
+    parser.add_argument(
+        '--native',
+        action='store_true',
+        help='Compute NG in-process (helper_scripts/ng86.py) instead of launching KaKs_Calculator; other methods are unaffected (default: False)'
     )
     
     args = parser.parse_args()
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+In-process Nei-Gojobori (1986) Ka/Ks, an alternative to one KaKs_Calculator -m NG
+process per AXT file.
+
+Everything that depends only on codons is computed once into 64x64 tables:
+synonymous sites of each sense codon, and the synonymous/non-synonymous
+differences of each codon pair averaged over the mutational pathways between
+them (pathways through a stop codon are skipped, as in KaKs_Calculator). Scoring
+any number of aligned pairs is then a table lookup per codon and one bincount
+per column.
+
+Codon pairs with a gap, an ambiguous base or a stop codon in either sequence are
+left out, so Length counts compared sites. Rates use the Jukes-Cantor correction
+and, as KaKs_Calculator does, are NA when there are no substitutions of that
+kind or p >= 3/4.
+
+The .kaks output keeps the KaKs_Calculator header; columns NG86 does not produce
+here are NA.
+
+Biopython's cal_dn_ds(method="NG86") averages over every pathway, stops included,
+so its Ka and Ks differ from these whenever a diverged codon pair has a pathway
+through a stop (Ks by up to ~15% on random 100-codon pairs). Where no pathway
+meets a stop the two agree; test_ng86.py pins the tables and checks that.
+
+    python3 ng86.py -i sequences.axt -o sequences_NG.axt.kaks
+"""
+
+import argparse
+import functools
+import itertools
+from typing import Iterable, Iterator, List, Tuple
+
+import numpy as np
+from Bio.Data.CodonTable import standard_dna_table
+
+BASES = "ACGT"
+INVALID = 64  # codon index of anything that is not a sense codon made of ACGT
+
+KAKS_COLUMNS = ["Sequence", "Method", "Ka", "Ks", "Ka/Ks", "P-Value(Fisher)", "Length", "S-Sites", "N-Sites",
+                "Fold-Sites(0:2:4)", "Substitutions", "S-Substitutions", "N-Substitutions",
+                "Fold-S-Substitutions(0:2:4)", "Fold-N-Substitutions(0:2:4)", "Divergence-Time",
+                "Substitution-Rate-Ratio(rTC:rAG:rTA:rCG:rTG:rCA/rCA)", "GC(1:2:3)", "ML-Score", "AICc",
+                "Akaike-Weight", "Model"]
+
+_BASE_CODE = np.full(256, 4, dtype=np.int64)
+for _k, _b in enumerate(BASES):
+    _BASE_CODE[ord(_b)] = _BASE_CODE[ord(_b.lower())] = _k
+_BASE_CODE[ord("U")] = _BASE_CODE[ord("u")] = BASES.index("T")
+
+def _amino_acid(codon: str) -> str:
+    return standard_dna_table.forward_table.get(codon, "*")
+
+def _pathway_differences(c1: str, c2: str) -> Tuple[float, float]:
+    """(synonymous, non-synonymous) differences between two sense codons, averaged over pathways."""
+    diff = [p for p in range(3) if c1[p] != c2[p]]
+    totals, n_paths = [0.0, 0.0], 0
+    for allow_stops in (False, True):
+        for order in itertools.permutations(diff):
+            steps, codon = [], c1
+            for p in order:
+                nxt = codon[:p] + c2[p] + codon[p + 1:]
+                steps.append(_amino_acid(codon) == _amino_acid(nxt))
+                codon = nxt
+                if not allow_stops and _amino_acid(codon) == "*":
+                    break
+            else:
+                totals[0] += sum(steps)
+                totals[1] += len(steps) - sum(steps)
+                n_paths += 1
+        if n_paths:
+            break
+    return totals[0] / n_paths, totals[1] / n_paths
+
+@functools.lru_cache(maxsize=None)
+def codon_tables():
+    """
+    (sense, s_sites, sd, nd) indexed by codon index 16*b1 + 4*b2 + b3 (A,C,G,T = 0..3), with
+    entry INVALID for stops and non-ACGT codons:
+    sense[c]: c is a sense codon
+    s_sites[c]: synonymous sites of codon c (its non-synonymous sites are 3 - s_sites[c])
+    sd[c1, c2], nd[c1, c2]: synonymous / non-synonymous differences between c1 and c2
+    """
+    codons = ["".join(c) for c in itertools.product(BASES, repeat=3)]
+    sense = np.array([_amino_acid(c) != "*" for c in codons] + [False])
+    s_sites = np.zeros(65)
+    sd, nd = np.zeros((65, 65)), np.zeros((65, 65))
+    for i, c in enumerate(codons):
+        if not sense[i]:
+            continue
+        # a change to a stop codon counts as non-synonymous
+        s_sites[i] = sum(_amino_acid(c[:p] + b + c[p + 1:]) == _amino_acid(c)
+                         for p in range(3) for b in BASES if b != c[p]) / 3
+        for j, c2 in enumerate(codons):
+            if sense[j] and i != j:
+                sd[i, j], nd[i, j] = _pathway_differences(c, c2)
+    return sense, s_sites, sd, nd
+
+def codon_indices(seq: str) -> np.ndarray:
+    """Codon index of every whole codon of seq; INVALID for stops and codons with gaps or ambiguous bases."""
+    codes = _BASE_CODE[np.frombuffer(seq[:len(seq) - len(seq) % 3].encode("ascii", "replace"), dtype=np.uint8)]
+    codes = codes.reshape(-1, 3)
+    idx = codes[:, 0] * 16 + codes[:, 1] * 4 + codes[:, 2]
+    idx[(codes == 4).any(axis=1)] = INVALID
+    sense = codon_tables()[0]
+    idx[~sense[idx]] = INVALID
+    return idx
+
+def _jukes_cantor(p: np.ndarray, count: np.ndarray) -> np.ndarray:
+    """Distance -3/4 ln(1 - 4p/3); NaN (written as NA) without substitutions or when p >= 3/4."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        d = -0.75 * np.log(1 - 4.0 * p / 3)
+    d[(count <= 0) | (p >= 0.75) | ~np.isfinite(d)] = np.nan
+    return d
+
+def ng86_batch(pairs: Iterable[Tuple[str, str, str]]) -> List[dict]:
+    """NG86 for many aligned pairs (name, seqA, seqB); returns one dict per pair keyed by the .kaks columns used."""
+    names, first, second = [], [], []
+    for name, seq_a, seq_b in pairs:
+        n = min(len(seq_a), len(seq_b))
+        names.append(name)
+        first.append(codon_indices(seq_a[:n]))
+        second.append(codon_indices(seq_b[:n]))
+    if not names:
+        return []
+
+    _, s_sites, sd, nd = codon_tables()
+    ca, cb = np.concatenate(first), np.concatenate(second)
+    pair_id = np.repeat(np.arange(len(names)), [len(c) for c in first])
+    keep = (ca != INVALID) & (cb != INVALID)
+    ca, cb, pair_id = ca[keep], cb[keep], pair_id[keep]
+
+    def per_pair(weights):
+        return np.bincount(pair_id, weights=weights, minlength=len(names))
+
+    length = 3 * np.bincount(pair_id, minlength=len(names))
+    S = per_pair((s_sites[ca] + s_sites[cb]) / 2)
+    N = length - S
+    Sd, Nd = per_pair(sd[ca, cb]), per_pair(nd[ca, cb])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ks = _jukes_cantor(Sd / S, Sd)
+        ka = _jukes_cantor(Nd / N, Nd)
+        divergence = (S * ks + N * ka) / length
+
+    return [{"Sequence": name, "Method": "NG", "Ka": ka[k], "Ks": ks[k], "Ka/Ks": ka[k] / ks[k],
+             "Length": int(length[k]), "S-Sites": S[k], "N-Sites": N[k], "Substitutions": Sd[k] + Nd[k],
+             "S-Substitutions": Sd[k] if Sd[k] > 0 else np.nan, "N-Substitutions": Nd[k] if Nd[k] > 0 else np.nan,
+             "Divergence-Time": divergence[k], "Substitution-Rate-Ratio(rTC:rAG:rTA:rCG:rTG:rCA/rCA)": "1:1:1:1:1:1"}
+            for k, name in enumerate(names)]
+
+def read_axt(path) -> Iterator[Tuple[str, str, str]]:
+    """Yield (name, seqA, seqB) from an AXT file of 'name / seqA / seqB / blank' blocks."""
+    block = []
+    with open(path) as f:
+        for line in itertools.chain(f, [""]):
+            line = line.strip()
+            if line:
+                block.append(line)
+            elif block:
+                if len(block) >= 3:
+                    yield block[0], block[1], block[2]
+                block = []
+
+def _fmt(value) -> str:
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (int, np.integer)):
+        return str(value)
+    return "NA" if not np.isfinite(value) else f"{value:.6g}"
+
+def format_kaks(rows: Iterable[dict], header: bool = True) -> str:
+    lines = ["\t".join(KAKS_COLUMNS)] if header else []
+    lines += ["\t".join(_fmt(row.get(col, "NA")) for col in KAKS_COLUMNS) for row in rows]
+    return "\n".join(lines) + "\n" if lines else ""
+
+def ng86_file(axt_in, kaks_out, batch: int = 10000) -> int:
+    """Score every pair of an AXT file, batch pairs at a time, into a .kaks file; returns the pair count."""
+    n = 0
+    with open(kaks_out, "w") as out:
+        out.write("\t".join(KAKS_COLUMNS) + "\n")
+        pairs = read_axt(axt_in)
+        while True:
+            chunk = list(itertools.islice(pairs, batch))
+            if not chunk:
+                return n
+            out.write(format_kaks(ng86_batch(chunk), header=False))
+            n += len(chunk)
+
+def main():
+    ap = argparse.ArgumentParser(description="NG86 Ka/Ks for every pair of an AXT file (KaKs_Calculator -m NG compatible output).")
+    ap.add_argument("-i", "--input", required=True, help="AXT file")
+    ap.add_argument("-o", "--output", required=True, help=".kaks output file")
+    args = ap.parse_args()
+    n = ng86_file(args.input, args.output)
+    print(f"{n} pairs -> {args.output}")
+
+if __name__ == "__main__":
+    main()
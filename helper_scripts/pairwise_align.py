@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+In-process global pairwise alignment (Needleman-Wunsch with Gotoh affine gaps),
+an alternative to one ClustalW process per pair.
+
+Every cell on anti-diagonal d = i + j depends only on diagonals d-1 and d-2, so
+the three DP matrices (match M, gap-in-B X, gap-in-A Y) are filled one diagonal
+at a time with a handful of NumPy vector operations. Only the last two diagonals
+of scores are kept; the traceback costs one uint8 per cell.
+
+Coding sequences are aligned codon-aware: both are translated, the proteins are
+aligned with BLOSUM62 and each residue/gap is expanded back to its codon/'---',
+so gaps never break the reading frame (as KaKs_Calculator expects). Sequences
+that are not whole codons, or do not translate, are aligned as nucleotides.
+
+Scores follow EMBOSS needle: +5/-4 for nucleotides, BLOSUM62 for proteins and a
+gap of length L costs gap_open + (L-1) * gap_extend (10 and 0.5).
+
+Scripts outside helper_scripts/ import this module after putting the
+helper_scripts directory on sys.path.
+"""
+
+import functools
+from typing import List, Tuple
+
+import numpy as np
+
+from simulate.translation import translate
+
+GAP_OPEN = 10.0
+GAP_EXTEND = 0.5
+NUCLEOTIDES = "ACGT"
+DNA_MATCH, DNA_MISMATCH = 5.0, -4.0
+
+# traceback states; bits 2*state..2*state+1 of a trace cell hold that state's predecessor
+_M, _X, _Y = 0, 1, 2
+
+@functools.lru_cache(maxsize=None)
+def _scoring(protein: bool):
+    """(byte -> alphabet index table, substitution matrix) for protein or nucleotide input."""
+    if protein:
+        from Bio.Align import substitution_matrices
+        blosum = substitution_matrices.load("BLOSUM62")
+        alphabet = blosum.alphabet
+        matrix = np.asarray(blosum, dtype=np.float64)
+        unknown = alphabet.index("X")
+    else:
+        alphabet = NUCLEOTIDES + "N"
+        matrix = np.full((5, 5), DNA_MISMATCH)
+        np.fill_diagonal(matrix, DNA_MATCH)
+        matrix[4, :] = matrix[:, 4] = -2.0  # ambiguous bases score between match and mismatch
+        unknown = 4
+    code = np.full(256, unknown, dtype=np.intp)
+    for k, letter in enumerate(alphabet):
+        code[ord(letter)] = code[ord(letter.lower())] = k
+    return code, matrix
+
+def _encode(seq: str, code) -> np.ndarray:
+    return code[np.frombuffer(seq.encode("ascii", "replace"), dtype=np.uint8)]
+
+def _traceback_path(a, b, matrix, gap_open, gap_extend) -> List[int]:
+    """Gotoh DP over anti-diagonals; returns the alignment as states (_M, _X, _Y) from start to end."""
+    n, m = len(a), len(b)
+    neg = -np.inf
+    # three rotating diagonals, each a (state, i) array with rows _M, _X, _Y; j = d - i
+    diags = np.full((3, 3, n + 1), neg)
+    diags[0, _M, 0] = 0.0  # d = 0 is the single cell (0, 0)
+    # penalty for entering X (from M, X, Y) and Y (from M, X, Y)
+    x_pen = np.array([gap_open, gap_extend, gap_open])[:, None]
+    y_pen = np.array([gap_open, gap_open, gap_extend])[:, None]
+    trace = np.zeros((n + m + 1, n + 1), dtype=np.uint8)
+
+    for d in range(1, n + m + 1):
+        cur, prev1, prev2 = diags[d % 3], diags[(d - 1) % 3], diags[(d - 2) % 3]
+        lo, hi = max(1, d - m), min(n, d - 1)  # interior cells: i >= 1 and j >= 1
+        if lo <= hi:
+            rows = slice(lo, hi + 1)
+            shifted = slice(lo - 1, hi)
+            sub = matrix[a[lo - 1:hi], b[d - hi - 1:d - lo][::-1]]
+
+            diag = prev2[:, shifted]
+            m_from = diag.argmax(axis=0)
+            cur[_M, rows] = sub + diag.max(axis=0)
+
+            up = prev1[:, shifted] - x_pen
+            x_from = up.argmax(axis=0)
+            cur[_X, rows] = up.max(axis=0)
+
+            left = prev1[:, rows] - y_pen
+            y_from = left.argmax(axis=0)
+            cur[_Y, rows] = left.max(axis=0)
+
+            trace[d, rows] = m_from | (x_from << 2) | (y_from << 4)
+        # first column (j = 0) and first row (i = 0) are leading gaps
+        if d <= n:
+            cur[:, d] = (neg, -(gap_open + (d - 1) * gap_extend), neg)
+        if d <= m:
+            cur[:, 0] = (neg, neg, -(gap_open + (d - 1) * gap_extend))
+
+    M1, X1, Y1 = diags[(n + m) % 3]
+    i, j = n, m
+    state = int(np.argmax((M1[n], X1[n], Y1[n]))) if n + m else _M
+    path = []
+    while i > 0 or j > 0:
+        if i == 0:
+            state = _Y
+        elif j == 0:
+            state = _X
+        path.append(state)
+        nxt = (int(trace[i + j, i]) >> (2 * state)) & 3
+        if state == _M:
+            i, j = i - 1, j - 1
+        elif state == _X:
+            i -= 1
+        else:
+            j -= 1
+        state = nxt
+    return path[::-1]
+
+def _render(seq_a: str, seq_b: str, path: List[int], unit: int = 1) -> Tuple[str, str]:
+    """Gapped strings for a path; unit=3 expands every step to a codon."""
+    out_a, out_b, i, j = [], [], 0, 0
+    gap = "-" * unit
+    for state in path:
+        if state != _Y:
+            out_a.append(seq_a[i:i + unit]); i += unit
+        else:
+            out_a.append(gap)
+        if state != _X:
+            out_b.append(seq_b[j:j + unit]); j += unit
+        else:
+            out_b.append(gap)
+    return "".join(out_a), "".join(out_b)
+
+def global_align(seq_a: str, seq_b: str, protein: bool = False, codon: bool = True,
+                 gap_open: float = GAP_OPEN, gap_extend: float = GAP_EXTEND) -> Tuple[str, str]:
+    """
+    Globally align two sequences and return them gapped to equal length.
+    protein: the inputs are amino-acid sequences
+    codon: align nucleotide coding sequences on their translations (see module docstring)
+    """
+    if not protein and codon and len(seq_a) % 3 == 0 and len(seq_b) % 3 == 0:
+        try:
+            prot_a, prot_b = translate(seq_a), translate(seq_b)
+        except Exception:
+            pass
+        else:
+            code, matrix = _scoring(True)
+            path = _traceback_path(_encode(prot_a, code), _encode(prot_b, code), matrix, gap_open, gap_extend)
+            return _render(seq_a, seq_b, path, unit=3)
+    code, matrix = _scoring(protein)
+    path = _traceback_path(_encode(seq_a, code), _encode(seq_b, code), matrix, gap_open, gap_extend)
+    return _render(seq_a, seq_b, path)
+
+def format_clustal(rows: List[Tuple[str, str]], width: int = 60) -> str:
+    """Render aligned rows [(name, aligned_seq)] as CLUSTAL text, with the '*' conservation line."""
+    pad = max(len(name) for name, _ in rows) + 6
+    length = max(len(seq) for _, seq in rows)
+    out = ["CLUSTAL 2.1 multiple sequence alignment\n\n\n"]
+    for start in range(0, length, width):
+        block = [seq[start:start + width] for _, seq in rows]
+        out.extend(f"{name:<{pad}}{chunk}\n" for (name, _), chunk in zip(rows, block))
+        cons = "".join("*" if c[0] != "-" and len(set(c)) == 1 else " " for c in zip(*block))
+        out.append(" " * pad + cons + "\n\n")
+    return "".join(out)
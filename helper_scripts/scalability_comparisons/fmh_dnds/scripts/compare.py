@@ -3,19 +3,26 @@ import os
 import subprocess
 import argparse
 import pandas as pd
-import time
+import sys
+from pathlib import Path
 
-def run_command(cmd):
-    start_time = time.time()
-    subprocess.run(cmd, shell=True, check=True)
-    return time.time() - start_time
+sys.path.insert(0, str(Path(__file__).resolve().parents[3]))
+from timing import EventLog, span
+
+def run_command(cmd, events=None, **fields):
+    """Run a shell command and return its execution time in seconds; events also gets a "compare" span tagged with fields."""
+    with span("compare", events, **fields) as ev:
+        subprocess.run(cmd, shell=True, check=True)
+    return ev["wall_sec"]
 
 def main():
     parser = argparse.ArgumentParser(description="Compare DNA and protein signatures with sourmash.")
     parser.add_argument("--base", required=True, help="Base directory with sample_X/rep_Y folders.")
     parser.add_argument("--ksize", type=int, default=7, help="K-mer size (default: 7)")
     parser.add_argument("--outcsv", required=True, help="Output CSV for all timing records")
+    parser.add_argument("--events", default=None, help="Also append one JSONL timing event per comparison to this file (see helper_scripts/timing.py)")
     args = parser.parse_args()
+    events = EventLog(args.events)
 
     samples = [5, 10]
     replicates = range(1, 11)
@@ -34,7 +41,7 @@ def main():
                 os.makedirs(os.path.dirname(out_csv), exist_ok=True)
 
                 cmd = f"sourmash compare {ref} {ref} --containment --{molecule} --ksize {args.ksize} --csv {out_csv}"
-                duration = run_command(cmd)
+                duration = run_command(cmd, events, sample=s, replicate=r, molecule=molecule, ksize=args.ksize, path=out_csv)
 
                 all_records.append({
                     "sample": s,
@@ -44,6 +51,7 @@ def main():
                     "duration_sec": round(duration, 2)
                 })
 
+    events.close()
     df = pd.DataFrame(all_records)
     df.to_csv(args.outcsv, index=False)
     print(f"✅ All comparison timings saved to {args.outcsv}")
@@ -1,7 +1,35 @@
 #!/usr/bin/env python3
 import os
 import argparse
+import sys
 import pandas as pd
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[3]))
+from timing import read_events
+
+def tables_from_events(path):
+    """
+    Sketch, containment and FMH timing tables rebuilt from a JSONL event stream
+    (wall seconds of the spans that succeeded), with the columns of the CSVs.
+    A stage without events is left out, so its CSV is read instead.
+    """
+    events = pd.DataFrame(read_events(path))
+    tables = {}
+    if events.empty:
+        return tables
+    events = events[events["status"] == "ok"]
+    stage = {name: df for name, df in events.groupby("stage")}
+    if "sketch" in stage:
+        sig = stage["sketch"].pivot_table(index="sample", columns="molecule", values="wall_sec", aggfunc="sum")
+        tables["sig"] = sig.rename(columns={"dna": "dna_runtime_sec", "protein": "protein_runtime_sec"}).reset_index()
+    if "compare" in stage:
+        cont = stage["compare"].rename(columns={"wall_sec": "duration_sec"})
+        tables["cont"] = cont[["sample", "replicate", "molecule", "duration_sec"]].astype({"sample": int})
+    if "fmh_omega" in stage:
+        fmh = stage["fmh_omega"].rename(columns={"wall_sec": "duration_sec"})
+        tables["fmh"] = fmh[["sample", "replicate", "duration_sec"]].astype({"sample": int})
+    return tables
 
 def normalize_sample(df, sample_col):
     # Rename original column to preserve full identifier
@@ -29,6 +57,7 @@ def normalize_sample(df, sample_col):
 def main():
     parser = argparse.ArgumentParser(description="Merge all timing logs into one dataset.")
     parser.add_argument("--base", required=True, help="Base directory containing timing logs.")
+    parser.add_argument("--events", default=None, help="JSONL event stream of sketch.py/compare.py/fmh.py --events; read in place of the CSVs it covers")
     args = parser.parse_args()
 
     base = args.base
@@ -40,9 +69,10 @@ def main():
     out_path = os.path.join(base, "all_timings_merged.csv")
 
     # --- Load ---
-    sig_df = pd.read_csv(sig_path)
-    cont_df = pd.read_csv(cont_path)
-    fmh_df = pd.read_csv(fmh_path)
+    tables = tables_from_events(args.events) if args.events else {}
+    sig_df = tables["sig"] if "sig" in tables else pd.read_csv(sig_path)
+    cont_df = tables["cont"] if "cont" in tables else pd.read_csv(cont_path)
+    fmh_df = tables["fmh"] if "fmh" in tables else pd.read_csv(fmh_path)
 
     #debugging normalize sample
 #    print("DEBUG sample column dtype:", sig_df["sample"].dtype)
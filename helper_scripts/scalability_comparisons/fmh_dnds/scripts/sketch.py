@@ -4,8 +4,15 @@ import subprocess
 import argparse
 import pandas as pd
 import sys
-import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[3]))
+from fmh_sketch import sketch_file
+from task_table import to_table
+from timing import EventLog, span
 
 
 def run_command(cmd):
@@ -17,12 +24,46 @@ def run_command(cmd):
         print(f"❌ Error running command: {cmd}")
         sys.exit(e.returncode)
 
+def sketch_in_process(fasta, sigfile, moltype, ksize, scaled):
+    """Equivalent of `sourmash sketch <moltype> -p k=..,scaled=.. -o sigfile fasta --singleton`
+    through the sourmash API."""
+    import screed
+    from sourmash import sourmash_args
+    from sourmash.command_sketch import _signatures_for_sketch_factory, add_seq, set_sig_name
+
+    factory = _signatures_for_sketch_factory([f"k={ksize},scaled={scaled}"], moltype)
+    with sourmash_args.SaveSignaturesToLocation(sigfile) as save_sigs, screed.open(fasta) as records:
+        for record in records:
+            sigs = factory()
+            add_seq(sigs, record.sequence, moltype == "protein", False)
+            set_sig_name(sigs, fasta, name=record.name)
+            for sig in sigs:
+                save_sigs.add(sig)
+
+def sketch_task(task, native=False):
+    """Worker: sketches one dataset row (DNA and protein); returns the "sketch" span of each molecule
+    for the parent to log. native: use helper_scripts/fmh_sketch.py instead of the sourmash API."""
+    name, dna_fasta, protein_fasta, dna_sigfile, protein_sigfile, ksize, scaled = task
+    sketch = sketch_file if native else sketch_in_process
+    if not native:
+        # imported before the spans so they time sketching only
+        import screed, sourmash.command_sketch  # noqa: F401
+    with span("sketch", sample=name, molecule="dna", path=dna_sigfile) as dna_event:
+        sketch(dna_fasta, dna_sigfile, "dna", int(ksize), int(scaled))
+    with span("sketch", sample=name, molecule="protein", path=protein_sigfile) as protein_event:
+        sketch(protein_fasta, protein_sigfile, "protein", int(ksize), int(scaled))
+    return name, dna_event, protein_event
+
 def main():
     parser = argparse.ArgumentParser(description="Sketch DNA and protein FASTA sequences using sourmash.")
     parser.add_argument("--dataset", required=True, help="CSV file with columns: name,dna_fasta,protein_fasta")
     parser.add_argument("--outdir", required=True, help="Base directory for sketches")
     parser.add_argument("--ksize", type=int, default=7, help="K-mer size (default: 7)")
     parser.add_argument("--scaled", type=int, default=1, help="Scaling factor (default: 1)")
+    parser.add_argument("--in_process", action="store_true", help="Sketch through the sourmash Python API on a worker pool instead of two sourmash CLI calls per row")
+    parser.add_argument("--native", action="store_true", help="With --in_process, sketch with the NumPy sketcher (helper_scripts/fmh_sketch.py, same .sig bytes) instead of the sourmash API")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes for --in_process (default: 1)")
+    parser.add_argument("--events", default=None, help="Also append one JSONL timing event per sketch to this file (see helper_scripts/timing.py)")
     args = parser.parse_args()
 
     df = pd.read_csv(args.dataset)
@@ -30,28 +71,33 @@ def main():
 
     # Prepare timing log
     timing_log = []
-
-    for idx, row in df.iterrows():
-        name, dna_fasta, protein_fasta = row[0], row[1], row[2]
-
-        sample_dir = os.path.dirname(dna_fasta)
-        sig_dir = os.path.join(sample_dir, "signatures")
+    events = EventLog(args.events)
+
+    # The whole plan is built column-wise, one signature directory created per sample
+    plan = pd.DataFrame({"name": df.iloc[:, 0].astype(str), "dna_fasta": df.iloc[:, 1].astype(str),
+                         "protein_fasta": df.iloc[:, 2].astype(str)})
+    # signatures go next to each sample's FASTA
+    fasta_dir = plan["dna_fasta"].map(os.path.dirname)
+    plan["sig_dir"] = fasta_dir.map({d: os.path.join(d, "signatures") for d in fasta_dir.unique()})
+    for sig_dir in plan["sig_dir"].unique():
         os.makedirs(sig_dir, exist_ok=True)
+    plan["dna_sigfile"] = plan["sig_dir"] + "/" + plan["name"] + "_dna.sig"
+    plan["protein_sigfile"] = plan["sig_dir"] + "/" + plan["name"] + "_protein.sig"
+    plan["ksize"], plan["scaled"] = args.ksize, args.scaled
+    tasks = to_table(plan[["name", "dna_fasta", "protein_fasta", "dna_sigfile", "protein_sigfile", "ksize", "scaled"]])
 
-        dna_sigfile = os.path.join(sig_dir, f"{name}_dna.sig")
-        protein_sigfile = os.path.join(sig_dir, f"{name}_protein.sig")
-
+    for name, dna_fasta, protein_fasta, dna_sigfile, protein_sigfile, *_ in ([] if args.in_process else tasks):
         dna_cmd = f"sourmash sketch dna -p k={args.ksize},scaled={args.scaled} -o {dna_sigfile} {dna_fasta} --singleton"
         protein_cmd = f"sourmash sketch protein -p k={args.ksize},scaled={args.scaled} -o {protein_sigfile} {protein_fasta} --singleton"
 
-        start_time = time.time()
-        run_command(dna_cmd)
-        dna_elapsed = time.time() - start_time
+        with span("sketch", events, sample=name, molecule="dna", path=dna_sigfile) as ev:
+            run_command(dna_cmd)
+        dna_elapsed = ev["wall_sec"]
 
 
-        start_time = time.time()
-        run_command(protein_cmd)
-        protein_elapsed = time.time() - start_time
+        with span("sketch", events, sample=name, molecule="protein", path=protein_sigfile) as ev:
+            run_command(protein_cmd)
+        protein_elapsed = ev["wall_sec"]
 
 
         # Save timing info
@@ -64,6 +110,25 @@ def main():
             "protein_runtime_sec": round(protein_elapsed, 2)
         })
 
+    if args.in_process and len(tasks):
+        # one pool for all rows; timings are measured inside the workers
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            for (name, dna_fasta, protein_fasta, *_), (_, dna_event, protein_event) in zip(tasks, pool.map(partial(sketch_task, native=args.native), tasks)):
+                events.write(dna_event)
+                events.write(protein_event)
+                dna_elapsed, protein_elapsed = dna_event["wall_sec"], protein_event["wall_sec"]
+                print(f"✓ Sketched {name} (dna {dna_elapsed:.3f}s, protein {protein_elapsed:.3f}s)")
+                timing_log.append({
+                    "timestamp": datetime.now().isoformat(timespec="seconds"),
+                    "sample": name,
+                    "dna_fasta": dna_fasta,
+                    "protein_fasta": protein_fasta,
+                    "dna_runtime_sec": round(dna_elapsed, 2),
+                    "protein_runtime_sec": round(protein_elapsed, 2)
+                })
+
+    events.close()
+
     # Write timing results to CSV
     timing_df = pd.DataFrame(timing_log)
     timing_csv = os.path.join(args.outdir, "signature_generation_times.csv")
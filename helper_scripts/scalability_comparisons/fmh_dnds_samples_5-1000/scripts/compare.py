@@ -3,21 +3,27 @@ import os
 import subprocess
 import argparse
 import pandas as pd
-import time
-import glob
+import sys
+from pathlib import Path
 
-def run_command(cmd):
-    """Run a shell command and return its execution time in seconds."""
-    start_time = time.time()
-    subprocess.run(cmd, shell=True, check=True)
-    return time.time() - start_time
+sys.path.insert(0, str(Path(__file__).resolve().parents[3]))
+from task_table import existing, list_dirs, parse_names, to_table
+from timing import EventLog, span
+
+def run_command(cmd, events=None, **fields):
+    """Run a shell command and return its execution time in seconds; events also gets a "compare" span tagged with fields."""
+    with span("compare", events, **fields) as ev:
+        subprocess.run(cmd, shell=True, check=True)
+    return ev["wall_sec"]
 
 def main():
     parser = argparse.ArgumentParser(description="Compare DNA and protein signatures with sourmash.")
     parser.add_argument("--base", required=True, help="Base directory with sample_X folders.")
     parser.add_argument("--ksize", type=int, default=7, help="K-mer size (default: 7)")
     parser.add_argument("--outcsv", required=True, help="Output CSV for all timing records")
+    parser.add_argument("--events", default=None, help="Also append one JSONL timing event per comparison to this file (see helper_scripts/timing.py)")
     args = parser.parse_args()
+    events = EventLog(args.events)
 
     samples = [5, 10, 100, 1000]  # sample numbers
     all_records = []
@@ -29,22 +35,22 @@ def main():
             print(f"[WARNING] Signatures directory not found for sample{s}, skipping.")
             continue
 
-        # Find all DNA signature files for this sample
-        dna_files = sorted(glob.glob(os.path.join(sig_dir, f"sample{s}_cds_*_dna.sig")))
-        if not dna_files:
+        # One listing of the signatures directory answers both the DNA file search and the protein check
+        listing = list_dirs([sig_dir])
+        names = pd.Series(sorted(name for _, name in listing), dtype=object)
+        pairs = parse_names(names, rf"^sample{s}_cds_(?P<wp_id>.*)_dna\.sig$").dropna()
+        if pairs.empty:
             print(f"[WARNING] No DNA signature files found for sample{s}, skipping.")
             continue
+        pairs["dna_ref"] = sig_dir + "/" + names[pairs.index]
+        pairs["prot_ref"] = pairs["dna_ref"].str.replace("_dna.sig", "_protein.sig", regex=False)
+        has_prot = existing(pairs["prot_ref"], listing)
+        for dna_ref in pairs.loc[~has_prot, "dna_ref"]:
+            print(f"[WARNING] Matching protein signature not found for {dna_ref}, skipping this pair.")
+        os.makedirs(os.path.join(base_dir, "containments"), exist_ok=True)
 
-        for dna_ref in dna_files:
-            # Automatically find the corresponding protein file
-            prot_ref = dna_ref.replace("_dna.sig", "_protein.sig")
-            if not os.path.exists(prot_ref):
-                print(f"[WARNING] Matching protein signature not found for {dna_ref}, skipping this pair.")
-                continue
-
-            # Extract WP_ID from filename
+        for wp_id, dna_ref, prot_ref in to_table(pairs[has_prot]):
             # e.g., 'sample5_cds_WP_000040453.1_dna.sig' -> 'WP_000040453.1'
-            wp_id = os.path.basename(dna_ref).split("_cds_")[1].split("_dna")[0]
             print(dna_ref)
             print(wp_id)
 
@@ -55,11 +61,10 @@ def main():
                     "containments",
                     f"compare_{wp_id}.{molecule}.{args.ksize}.csv"
                 )
-                os.makedirs(os.path.dirname(out_csv), exist_ok=True)
 
                 cmd = f"sourmash compare {ref} {ref} --containment --{molecule} --ksize {args.ksize} --csv {out_csv}"
                 print(f"Running: {cmd}")
-                duration = run_command(cmd)
+                duration = run_command(cmd, events, sample=s, wp_id=wp_id, molecule=molecule, ksize=args.ksize, path=out_csv)
 
                 all_records.append({
                     "sample": s,
@@ -70,6 +75,7 @@ def main():
                 })
 
     # Save all timing records to the consolidated CSV
+    events.close()
     df = pd.DataFrame(all_records)
     print(df)
     df.to_csv(args.outcsv, index=False)
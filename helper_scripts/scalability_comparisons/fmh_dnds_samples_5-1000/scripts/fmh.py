@@ -1,28 +1,70 @@
 #!/usr/bin/env python3
 import os
 import subprocess
-import time
+import sys
 import pandas as pd
 import argparse
 import shutil
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[3]))
+from fmh_omega import fmh_omega
+from task_table import existing, list_dirs, parse_names, to_table
+from timing import EventLog, span
 
 
-def run_command(cmd):
-    """Run a command and return elapsed time in seconds."""
+def run_command(cmd, events=None, **fields):
+    """Run a command and return elapsed time in seconds; events also gets a "fmh_omega" span tagged with fields."""
     print(f"→ Running: {cmd}")
-    start = time.time()
     try:
-        subprocess.run(cmd, shell=True, check=True)
+        with span("fmh_omega", events, **fields) as ev:
+            subprocess.run(cmd, shell=True, check=True)
         status = "success"
     except subprocess.CalledProcessError as e:
         print(f"❌ Command failed: {e}")
         status = "failed"
-    duration = round(time.time() - start, 5)
+    duration = round(ev["wall_sec"], 5)
     print(f"✓ Completed in {duration} seconds ({status})")
     return duration, status
 
 
+def omega_task(task):
+    """Worker: computes the omega table of one gene in-process; returns its "fmh_omega" span for the parent to log."""
+    try:
+        with span("fmh_omega", sample=task["sample"], wp_id=task["wp_id"], ksize=task["ksize"]) as ev:
+            omega = fmh_omega(task["dna_cmp"], task["prot_cmp"], task["ksize"], threshold=0)
+            omega.insert(0, "wp_id", task["wp_id"])
+            omega.insert(0, "sample", task["sample"])
+        status = "success"
+    except Exception as e:
+        print(f"❌ {task['wp_id']} failed: {e}")
+        omega, status = None, "failed"
+    return omega, ev, status
+
+
+def run_external(task, omega_script, events=None):
+    """Previous behaviour: one script_fmh_omega.py launch per gene."""
+    wp_workdir = os.path.join(task["omega_base"], task["wp_id"])
+    os.makedirs(wp_workdir, exist_ok=True)
+    cmd = (
+        f"python3 {omega_script} "
+        f"--dna_sample {task['dna_cmp']} --protein_sample {task['prot_cmp']} "
+        f"--scaled_input 1 --ksize {task['ksize']} --mode test "
+        f"--directory {wp_workdir} --cores 10 --threshold 0"
+    )
+    duration, status = run_command(cmd, events, sample=task["sample"], wp_id=task["wp_id"], ksize=task["ksize"])
+
+    # Normalize output filename
+    omega_src = os.path.join(wp_workdir, "fmh_omega.csv")
+    omega_dst = os.path.join(task["omega_base"], f"fmh_omega_{task['wp_id']}.csv")
+    if status == "success" and os.path.exists(omega_src):
+        shutil.move(omega_src, omega_dst)
+    else:
+        print(f"⚠️ Expected output not found for {task['wp_id']}")
+    return duration, status, omega_dst if os.path.exists(omega_dst) else None
+
+
 def main():
     parser = argparse.ArgumentParser(description="Run dN/dS scalability comparison workflow.")
     parser.add_argument("--base",required=True,help="Base directory for the scalability comparison (e.g. /path/to/base)")
@@ -31,80 +73,66 @@ def main():
     parser.add_argument("--dataset_csv",required=True,help="Path to dataset.csv file")
     parser.add_argument("--ksize",type=int,default=15,help="K-mer size (default: 15)")
     parser.add_argument("--out_log",required=True,help="Output CSV file for logging results")
+    parser.add_argument("--workers",type=int,default=1,help="Worker processes shared by all genes (default: 1)")
+    parser.add_argument("--omega_out",default=None,help="Consolidated omega CSV (default: <base>/<results_dir>/fmh_omega_<ksize>.csv)")
+    parser.add_argument("--omega_script",default=None,help="Run this script_fmh_omega.py once per gene instead of the in-process batch runner")
+    parser.add_argument("--events",default=None,help="Also append one JSONL timing event per gene to this file (see helper_scripts/timing.py)")
     args = parser.parse_args()
 
 
     df = pd.read_csv(args.dataset_csv)
-    results = []
 
-    # dataframe contains column: name = sample5_cds_WP_000551270.1
-    for _, row in df.iterrows():
-        full_name = row["name"]
-
-        # example full_name → "sample5_cds_WP_000551270.1"
-        try:
-            wp_id = full_name.split("_cds_")[1]
-            sample_part = full_name.split("_cds_")[0]  # sample10
-            s = sample_part.replace("sample", "")      # 10
-        except:
-            print(f"⚠️ Could not parse WP id from: {full_name}")
-            continue
-
-        # deduce sample number
-        #sample_part = full_name.split("_cds_")[0]   # "sample5"
-        #s = sample_part.replace("sample", "")       # "5"
-
-        sample_dir = os.path.join(args.base, args.results_dir, f"sample_{s}")
-        cont_dir = os.path.join(sample_dir, "containments")
-
-        dna_cmp = os.path.join(cont_dir, f"compare_{wp_id}.dna.{args.ksize}.csv")
-        prot_cmp = os.path.join(cont_dir, f"compare_{wp_id}.protein.{args.ksize}.csv")
-        
-        #fmh_dir = os.path.join(args.base, args.results_dir, f"sample_{s}")
-
-        if not os.path.exists(dna_cmp):
-            print(f"❌ Missing DNA compare file: {dna_cmp}")
-            continue
-        if not os.path.exists(prot_cmp):
-            print(f"❌ Missing protein compare file: {prot_cmp}")
-            continue
-
-        # Output organization
-        omega_base = os.path.join(sample_dir, "fmh_omega_results")
-        wp_workdir = os.path.join(omega_base, wp_id)
-        os.makedirs(wp_workdir, exist_ok=True)
-
-        cmd = (
-            f"python3 /data/jzr5814/repositories/dnds-using-fmh/src/script_fmh_omega.py "
-            f"--dna_sample {dna_cmp} --protein_sample {prot_cmp} "
-            f"--scaled_input 1 --ksize {args.ksize} --mode test "
-            f"--directory {wp_workdir} --cores 10 --threshold 0"
-        )
-
-        print(f"\n=== Running {full_name}")
-        duration, status = run_command(cmd)
-
-        # Normalize output filename
-        omega_src = os.path.join(wp_workdir, "fmh_omega.csv")
-        omega_dst = os.path.join(
-            omega_base, f"fmh_omega_{wp_id}.csv"
-        )
-
-        if status == "success" and os.path.exists(omega_src):
-            shutil.move(omega_src, omega_dst)
-        else:
-            print(f"⚠️ Expected output not found for {wp_id}")
-
-        results.append({
-            "sample": s,
-            "wp_id": wp_id,
-            "fmh_duration_sec": duration,
-            "status": status,
-            "omega_file": omega_dst if os.path.exists(omega_dst) else None,
-
-        })
-
-    pd.DataFrame(results).to_csv(args.out_log, index=False)
+    # dataframe contains column: name = sample5_cds_WP_000551270.1 → sample 5, wp_id WP_000551270.1
+    plan = parse_names(df["name"], r"^sample(?P<sample>\d+)_cds_(?P<wp_id>.+)$")
+    parsed = plan.notna().all(axis=1)
+    for full_name in df.loc[~parsed, "name"]:
+        print(f"⚠️ Could not parse WP id from: {full_name}")
+    plan = plan[parsed]
+
+    sample_dir = plan["sample"].map({s: os.path.join(args.base, args.results_dir, f"sample_{s}") for s in plan["sample"].unique()})
+    cont_dir = sample_dir + "/containments/compare_"
+    plan["dna_cmp"] = cont_dir + plan["wp_id"] + f".dna.{args.ksize}.csv"
+    plan["prot_cmp"] = cont_dir + plan["wp_id"] + f".protein.{args.ksize}.csv"
+    plan["ksize"] = args.ksize
+    plan["omega_base"] = sample_dir + "/fmh_omega_results"
+
+    # one directory listing per sample instead of two stats per gene
+    listing = list_dirs(sample_dir.unique() + "/containments")
+    has_dna, has_prot = existing(plan["dna_cmp"], listing), existing(plan["prot_cmp"], listing)
+    for dna_cmp in plan.loc[~has_dna, "dna_cmp"]:
+        print(f"❌ Missing DNA compare file: {dna_cmp}")
+    for prot_cmp in plan.loc[has_dna & ~has_prot, "prot_cmp"]:
+        print(f"❌ Missing protein compare file: {prot_cmp}")
+    tasks = to_table(plan[has_dna & has_prot])
+
+    results = []
+    events = EventLog(args.events)
+    if args.omega_script:
+        for task in tasks:
+            print(f"\n=== Running sample{task['sample']}_cds_{task['wp_id']}")
+            duration, status, omega_file = run_external(task, args.omega_script, events)
+            results.append({"sample": task["sample"], "wp_id": task["wp_id"], "fmh_duration_sec": duration,
+                            "status": status, "omega_file": omega_file})
+    else:
+        omega_out = args.omega_out or os.path.join(args.base, args.results_dir, f"fmh_omega_{args.ksize}.csv")
+        tables = []
+        # one pool for every gene; results come back in dataset order
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            outcomes = pool.map(omega_task, tasks, chunksize=max(1, len(tasks) // (4 * args.workers)))
+            for task, (omega, event, status) in zip(tasks, outcomes):
+                events.write(event)
+                duration = round(event["wall_sec"], 5)
+                print(f"✓ sample{task['sample']}_cds_{task['wp_id']}: {duration} seconds ({status})")
+                if omega is not None:
+                    tables.append(omega)
+                results.append({"sample": task["sample"], "wp_id": task["wp_id"], "fmh_duration_sec": duration,
+                                "status": status, "omega_file": omega_out if omega is not None else None})
+        if tables:
+            pd.concat(tables, ignore_index=True).to_csv(omega_out, index=False)
+            print(f"\n📄 Omega estimates for {len(tables)} genes saved to {omega_out}")
+
+    events.close()
+    pd.DataFrame(results, columns=["sample", "wp_id", "fmh_duration_sec", "status", "omega_file"]).to_csv(args.out_log, index=False)
     print(f"\n🕒 Timing results saved to {args.out_log}")
 
 
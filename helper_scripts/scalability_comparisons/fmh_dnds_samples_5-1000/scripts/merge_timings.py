@@ -1,7 +1,35 @@
 #!/usr/bin/env python3
 import os
 import argparse
+import sys
 import pandas as pd
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[3]))
+from timing import read_events
+
+def tables_from_events(path):
+    """
+    Sketch, containment and FMH timing tables rebuilt from a JSONL event stream
+    (wall seconds of the spans that succeeded), with the columns of the CSVs.
+    A stage without events is left out, so its CSV is read instead.
+    """
+    events = pd.DataFrame(read_events(path))
+    tables = {}
+    if events.empty:
+        return tables
+    events = events[events["status"] == "ok"]
+    stage = {name: df for name, df in events.groupby("stage")}
+    if "sketch" in stage:
+        sig = stage["sketch"].pivot_table(index="sample", columns="molecule", values="wall_sec", aggfunc="sum")
+        tables["sig"] = sig.rename(columns={"dna": "dna_runtime_sec", "protein": "protein_runtime_sec"}).reset_index()
+    if "compare" in stage:
+        cont = stage["compare"].rename(columns={"wall_sec": "duration_sec"})
+        tables["cont"] = cont[["sample", "wp_id", "molecule", "duration_sec"]].astype({"sample": int})
+    if "fmh_omega" in stage:
+        fmh = stage["fmh_omega"].rename(columns={"wall_sec": "fmh_duration_sec"})
+        tables["fmh"] = fmh[["sample", "wp_id", "fmh_duration_sec"]].astype({"sample": int})
+    return tables
 
 def extract_sample_number(df, sample_col):
     """Extract numeric sample from the sample column."""
@@ -11,6 +39,7 @@ def extract_sample_number(df, sample_col):
 def main():
     parser = argparse.ArgumentParser(description="Merge all timing logs into one dataset using wp_id.")
     parser.add_argument("--base", required=True, help="Base directory containing timing logs.")
+    parser.add_argument("--events", default=None, help="JSONL event stream of sketch.py/compare.py/fmh.py --events; read in place of the CSVs it covers")
     args = parser.parse_args()
 
     base = args.base
@@ -22,9 +51,10 @@ def main():
     out_path = os.path.join(base, "all_timings_merged.csv")
 
     # --- Load CSVs ---
-    sig_df = pd.read_csv(sig_path)
-    cont_df = pd.read_csv(cont_path)
-    fmh_df = pd.read_csv(fmh_path)
+    tables = tables_from_events(args.events) if args.events else {}
+    sig_df = tables["sig"] if "sig" in tables else pd.read_csv(sig_path)
+    cont_df = tables["cont"] if "cont" in tables else pd.read_csv(cont_path)
+    fmh_df = tables["fmh"] if "fmh" in tables else pd.read_csv(fmh_path)
 
     # --- Extract numeric sample and wp_id ---
     sig_df["wp_id"] = sig_df["sample"].apply(lambda x: "_".join(x.split("_")[-2:]))
@@ -2,12 +2,20 @@
 # -*- coding: utf-8 -*-
 
 import argparse
+import queue
 import re
 import shutil
 import subprocess
-import time
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from fasta_io import format_fasta, read_fasta as stream_fasta
+from pairwise_align import format_clustal, global_align
+from timing import EventLog, span
+
 # Try clustalw2 first, then clustalw
 def which_clustalw():
     for exe in ("clustalw2", "clustalw"):
@@ -18,17 +26,8 @@ def which_clustalw():
 
 def read_fasta(path):
     """Yield (header, sequence) for each record in FASTA."""
-    header, seq = None, []
-    with open(path) as f:
-        for line in f:
-            if line.startswith('>'):
-                if header is not None:
-                    yield header, ''.join(seq)
-                header, seq = line.strip(), []
-            else:
-                seq.append(line.strip())
-        if header is not None:
-            yield header, ''.join(seq)
+    for header, seq in stream_fasta(path):
+        yield '>' + header, seq
 
 def sanitize_label(h):
     """
@@ -42,11 +41,7 @@ def sanitize_label(h):
 def write_pair_fasta(out_path: Path, recA, recB):
     """Write a 2-seq FASTA file. rec = (header, seq)."""
     with open(out_path, "w") as out:
-        for h, s in (recA, recB):
-            h2 = h if h.startswith('>') else f">{h}"
-            out.write(h2 + "\n")
-            for i in range(0, len(s), 60):
-                out.write(s[i:i+60] + "\n")
+        out.write(format_fasta((recA, recB), width=60))
 
 def run_clustalw(clustalw_bin: str, infile: Path, outfile: Path, is_dna=True, quiet=True):
     args = [
@@ -73,25 +68,48 @@ def run_clustalw(clustalw_bin: str, infile: Path, outfile: Path, is_dna=True, qu
         try: dnd.unlink()
         except Exception: pass
 
-def enumerate_pairs(records, include_self=True, unique=False):
+def enumerate_pairs(records, include_self=False, unique=True):
     """
     records: list[(header, seq)]
-    - include_self=True  -> i,j over all indices (N*N)
-    - include_self=False -> i != j (ordered) -> N*(N-1)
-    - unique=True        -> unordered unique pairs (i<j); overrides include_self
+    - unique=True        -> unordered unique pairs (i<j); N choose 2 (default)
+    - unique=False       -> i != j (ordered) -> N*(N-1)
+    - include_self=True  -> also i == i; N*N when ordered
     """
     n = len(records)
-    if unique:
-        for i in range(n):
-            for j in range(i+1, n):
-                yield i, j
-        return
     for i in range(n):
-        for j in range(n):
-            if not include_self and i == j:
+        for j in range(i if unique else 0, n):
+            if i == j and not include_self:
                 continue
             yield i, j
 
+# ---------- Alignment reuse ----------
+# (j, i) is (i, j) with its rows swapped and (i, i) is the sequence against itself,
+# so only i<j pairs are sent to ClustalW; the rest are written from them.
+
+def read_clustal(path: Path):
+    """[(name, aligned_seq)] of a CLUSTAL file; rows are matched by position in each block, so repeated names are fine."""
+    rows = []
+    with open(path) as f:
+        lines = f.read().splitlines()
+    k = 0
+    for line in lines[1:]:
+        if not line.strip():
+            k = 0
+            continue
+        if line[0].isspace():  # conservation line
+            continue
+        name, chunk = line.split()[:2]
+        if k == len(rows):
+            rows.append((name, []))
+        rows[k][1].append(chunk)
+        k += 1
+    return [(name, "".join(chunks)) for name, chunks in rows]
+
+def write_clustal(path: Path, rows):
+    """Write aligned rows [(name, aligned_seq)] as a CLUSTAL file."""
+    with open(path, "w") as f:
+        f.write(format_clustal(rows))
+
 def ensure_summary(path: Path):
     """Create summary TSV with header if it doesn't exist."""
     if not path.exists():
@@ -110,34 +128,148 @@ def ensure_summary(path: Path):
                 "note"
             ]) + "\n")
 
-def append_summary(path: Path, row: list):
-    with open(path, "a") as sf:
-        sf.write("\t".join(row) + "\n")
+class SummaryWriter:
+    """
+    Appends summary rows from a single background thread, so workers never
+    contend for the TSV and it is opened once per run instead of once per row.
+    """
+    def __init__(self, path: Path):
+        self.rows = queue.Queue()
+        self.handle = open(path, "a")
+        self.thread = threading.Thread(target=self._drain, daemon=True)
+        self.thread.start()
+
+    def _drain(self):
+        while True:
+            row = self.rows.get()
+            if row is None:
+                break
+            self.handle.write("\t".join(row) + "\n")
+            # flush per row so an interrupted run still records what finished
+            self.handle.flush()
+
+    def put(self, row: list):
+        self.rows.put(row)
+
+    def close(self):
+        self.rows.put(None)
+        self.thread.join()
+        self.handle.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
 
 def fmt_mmss(seconds_float: float) -> str:
     secs = int(round(seconds_float))
     return f"{secs // 60}:{secs % 60}"
 
+def align_pair(clw, fa, fa_dir, i, j, recA, recB, labA, labB, is_dna, summary, mirror=False, done=frozenset(),
+               events=None):
+    """
+    Align one unordered pair (i<j) with ClustalW, or in-process when clw is None (--aligner builtin),
+    and queue its summary row; runs on a worker thread.
+    mirror: also write the (j, i) alignment by swapping rows
+    done: .aln names already present (--resume); those are not redone
+    events: EventLog that also receives an "align" span per alignment written
+    """
+    pair_prefix = f"{fa.stem}__{labA}_vs_{labB}"
+    pair_fa = fa_dir / f"{pair_prefix}.pair.fa"
+    aln_out = fa_dir / f"{pair_prefix}.aln"
+    status = "OK"
+
+    if aln_out.name not in done:
+        if clw:
+            write_pair_fasta(pair_fa, recA, recB)
+
+        note = ""
+
+        try:
+            with span("align", events, fasta=str(fa), aligner="clustalw" if clw else "builtin", path=str(aln_out)) as ev:
+                if clw:
+                    run_clustalw(clw, pair_fa, aln_out, is_dna=is_dna, quiet=True)
+                else:
+                    alnA, alnB = global_align(recA[1], recB[1], protein=not is_dna)
+                    write_clustal(aln_out, [(labA, alnA), (labB, alnB)])
+            elapsed = ev["wall_sec"]
+            print(f"[OK] {fa.name}: {labA} vs {labB} -> {aln_out.name}  ({elapsed:.3f}s, {fmt_mmss(elapsed)})")
+        except Exception as e:
+            elapsed = ev["wall_sec"]
+            status, note = "FAIL", str(e).replace("\n", " ")
+            print(f"[FAIL] {fa.name}: {labA} vs {labB} -> {note}  ({elapsed:.3f}s, {fmt_mmss(elapsed)})")
+
+        # Record row in summary
+        summary.put([
+            str(fa),
+            str(i),
+            str(j),
+            labA,
+            labB,
+            str(pair_fa) if clw else "",
+            str(aln_out),
+            f"{elapsed:.6f}",
+            status,
+            note
+        ])
+
+    if mirror and status == "OK":
+        mirror_out = fa_dir / f"{fa.stem}__{labB}_vs_{labA}.aln"
+        if mirror_out.name not in done:
+            derive_alignment(fa, j, i, labB, labA, mirror_out, summary,
+                             lambda: read_clustal(aln_out)[::-1], f"rows swapped from {aln_out.name}", events)
+
+def derive_alignment(fa, i, j, labA, labB, aln_out, summary, make_rows, note, events=None):
+    """Write an alignment built without ClustalW (swapped or self) and queue its summary row."""
+    status = "OK"
+    try:
+        with span("align", events, fasta=str(fa), aligner="derived", path=str(aln_out)) as ev:
+            write_clustal(aln_out, make_rows())
+    except Exception as e:
+        status, note = "FAIL", str(e).replace("\n", " ")
+    elapsed = ev["wall_sec"]
+    print(f"[{status}] {fa.name}: {labA} vs {labB} -> {aln_out.name}  ({note})")
+    summary.put([str(fa), str(i), str(j), labA, labB, "", str(aln_out), f"{elapsed:.6f}", status, note])
+
 def main():
-    ap = argparse.ArgumentParser(description="Run pairwise ClustalW alignments within each FASTA.")
+    ap = argparse.ArgumentParser(description="Run pairwise ClustalW (or builtin) alignments within each FASTA.")
     ap.add_argument("--input", required=True,
                     help="Path to a FASTA file OR a directory containing FASTA files.")
     ap.add_argument("--out_dir", required=True,
                     help="Directory to write alignments into.")
     ap.add_argument("--protein", action="store_true",
                     help="Treat sequences as protein (default DNA).")
-    ap.add_argument("--no-self", action="store_true",
-                    help="Exclude self-comparisons; gives N*(N-1) alignments.")
-    ap.add_argument("--unique", action="store_true",
-                    help="Use unordered unique pairs (i<j); gives N choose 2 alignments.")
+    ap.add_argument("--ordered", action="store_true",
+                    help="Also write (j, i) for every pair, by swapping the rows of (i, j); gives N*(N-1) alignments.")
+    ap.add_argument("--self", action="store_true",
+                    help="Also write self-alignments (i, i), synthesized without ClustalW.")
+    # older spellings: --unique is the default now, --no-self (ordered pairs without self) is --ordered
+    ap.add_argument("--no-self", action="store_true", help=argparse.SUPPRESS)
+    ap.add_argument("--unique", action="store_true", help=argparse.SUPPRESS)
     ap.add_argument("--exts", nargs="+", default=[".fa", ".fna", ".fasta"],
                     help="File extensions to scan when --input is a directory.")
     ap.add_argument("--summary_name", default="timing_alignments.tsv",
                     help="Filename for the timing summary TSV in out_dir.")
+    ap.add_argument("--aligner", choices=["clustalw", "builtin"], default="clustalw",
+                    help="clustalw (one process per pair) or builtin (in-process, codon-aware Needleman-Wunsch).")
+    ap.add_argument("--jobs", type=int, default=1,
+                    help="Number of alignments to run at once (default 1); the builtin aligner gains little from it.")
+    ap.add_argument("--resume", action="store_true",
+                    help="Skip pairs whose .aln already exists in out_dir.")
+    ap.add_argument("--events", default=None,
+                    help="Also append one JSONL timing event per alignment to this file (see helper_scripts/timing.py).")
     args = ap.parse_args()
+    if args.no_self and args.self:
+        ap.error("--no-self and --self contradict each other")
+    if args.unique and args.ordered:
+        ap.error("--unique and --ordered contradict each other")
+    if args.no_self and not args.unique:
+        # --no-self used to ask for the N*(N-1) ordered pairs; --unique used to override it
+        args.ordered = True
 
-    clw = which_clustalw()
-    if not clw:
+    clw = which_clustalw() if args.aligner == "clustalw" else None
+    if args.aligner == "clustalw" and not clw:
         raise SystemExit("Could not find clustalw2 or clustalw in PATH.")
 
     in_path = Path(args.input)
@@ -158,62 +290,46 @@ def main():
     else:
         fasta_list = [in_path]
 
-    # Process each FASTA
-    for fa in sorted(fasta_list):
-        records = list(read_fasta(fa))
-        if len(records) == 0:
-            print(f"[SKIP] Empty FASTA: {fa}")
-            continue
-        # Make per-file output dir
-        fa_dir = out_base / fa.stem
-        fa_dir.mkdir(parents=True, exist_ok=True)
-
-        # Precompute labels for filenames
-        labels = [sanitize_label(h) for h, _ in records]
-
-        # Enumerate pairs
-        pairs = list(enumerate_pairs(records,
-                                     include_self=not args.no_self,
-                                     unique=args.unique))
+    # Process each FASTA; ClustalW runs as a subprocess, so threads are enough to keep --jobs cores busy
+    with SummaryWriter(summary_path) as summary, EventLog(args.events) as events, \
+            ThreadPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        for fa in sorted(fasta_list):
+            records = list(read_fasta(fa))
+            if len(records) == 0:
+                print(f"[SKIP] Empty FASTA: {fa}")
+                continue
+            # Make per-file output dir
+            fa_dir = out_base / fa.stem
+            fa_dir.mkdir(parents=True, exist_ok=True)
 
-        print(f"[INFO] {fa.name}: {len(records)} sequences → {len(pairs)} alignments")
-        for i, j in pairs:
-            recA = records[i]
-            recB = records[j]
-            labA = labels[i]
-            labB = labels[j]
+            # Precompute labels for filenames
+            labels = [sanitize_label(h) for h, _ in records]
 
-            pair_prefix = f"{fa.stem}__{labA}_vs_{labB}"
-            pair_fa = fa_dir / f"{pair_prefix}.pair.fa"
-            aln_out = fa_dir / f"{pair_prefix}.aln"
+            # Enumerate pairs; ClustalW only sees i<j, (j, i) and (i, i) are derived from it
+            pairs = list(enumerate_pairs(records,
+                                         include_self=args.self,
+                                         unique=not args.ordered))
+            selfs = [i for i, j in pairs if i == j]
+            aligned = [(i, j) for i, j in pairs if i < j]
 
-            write_pair_fasta(pair_fa, recA, recB)
+            done = frozenset()
+            if args.resume:
+                done = frozenset(p.name for p in fa_dir.glob("*.aln") if p.stat().st_size > 0)
+                present = sum(f"{fa.stem}__{labels[i]}_vs_{labels[j]}.aln" in done for i, j in pairs)
+                print(f"[INFO] {fa.name}: {present} of {len(pairs)} alignments already present, skipping them")
 
-            t0 = time.monotonic()
-            status, note = "OK", ""
-
-            try:
-                run_clustalw(clw, pair_fa, aln_out, is_dna=not args.protein, quiet=True)
-                elapsed = time.monotonic() - t0
-                print(f"[OK] {fa.name}: {labA} vs {labB} -> {aln_out.name}  ({elapsed:.3f}s, {fmt_mmss(elapsed)})")
-            except Exception as e:
-                elapsed = time.monotonic() - t0
-                status, note = "FAIL", str(e).replace("\n", " ")
-                print(f"[FAIL] {fa.name}: {labA} vs {labB} -> {note}  ({elapsed:.3f}s, {fmt_mmss(elapsed)})")
-
-            # Record row in summary
-            append_summary(summary_path, [
-                str(fa),
-                str(i),
-                str(j),
-                labA,
-                labB,
-                str(pair_fa),
-                str(aln_out),
-                f"{elapsed:.6f}",
-                status,
-                note
-            ])
+            print(f"[INFO] {fa.name}: {len(records)} sequences → {len(pairs)} alignments "
+                  f"({len(aligned)} by {args.aligner})")
+            for i in selfs:
+                aln_out = fa_dir / f"{fa.stem}__{labels[i]}_vs_{labels[i]}.aln"
+                if aln_out.name not in done:
+                    derive_alignment(fa, i, i, labels[i], labels[i], aln_out, summary,
+                                     lambda i=i: [(labels[i], records[i][1])] * 2, "self-alignment", events)
+            jobs = [pool.submit(align_pair, clw, fa, fa_dir, i, j, records[i], records[j],
+                                labels[i], labels[j], not args.protein, summary, args.ordered, done, events)
+                    for i, j in aligned]
+            for job in jobs:
+                job.result()
 
     print(f"\nDone. Alignments are in: {out_base.resolve()}")
     print(f"Timing summary: {summary_path.resolve()}")
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Wall-time comparison of ClustalW (one process per pair) and the builtin
+in-process aligner on the unordered pairs of one FASTA. Prints, and optionally
+writes, a TSV with one row per aligner.
+
+    python3 benchmark_aligners.py --input sample_10/fasta/genes.fna --out bench.tsv
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from alignment import (enumerate_pairs, global_align, read_fasta, run_clustalw,
+                       which_clustalw, write_pair_fasta)
+
+def time_builtin(records, pairs, is_dna):
+    t0 = time.monotonic()
+    for i, j in pairs:
+        global_align(records[i][1], records[j][1], protein=not is_dna)
+    return time.monotonic() - t0
+
+def time_clustalw(clw, records, pairs, is_dna):
+    """Includes the pair FASTA write and the process spawn, as alignment.py pays them."""
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        t0 = time.monotonic()
+        for n, (i, j) in enumerate(pairs):
+            pair_fa = tmp / f"pair{n}.fa"
+            write_pair_fasta(pair_fa, records[i], records[j])
+            run_clustalw(clw, pair_fa, tmp / f"pair{n}.aln", is_dna=is_dna, quiet=True)
+        return time.monotonic() - t0
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark ClustalW against the builtin pairwise aligner.")
+    ap.add_argument("--input", required=True, help="FASTA whose unordered pairs are aligned")
+    ap.add_argument("--protein", action="store_true", help="Treat sequences as protein (default DNA).")
+    ap.add_argument("--max_pairs", type=int, default=None, help="Only time the first N pairs")
+    ap.add_argument("--out", default=None, help="Optional TSV to write the results to")
+    args = ap.parse_args()
+
+    records = list(read_fasta(args.input))
+    pairs = list(enumerate_pairs(records))[:args.max_pairs]
+    is_dna = not args.protein
+
+    rows = [("builtin", time_builtin(records, pairs, is_dna))]
+    clw = which_clustalw()
+    if clw:
+        rows.append(("clustalw", time_clustalw(clw, records, pairs, is_dna)))
+    else:
+        print("[WARN] clustalw2/clustalw not in PATH; timing the builtin aligner only")
+
+    lines = ["aligner\tpairs\tseconds\tms_per_pair"]
+    lines += [f"{name}\t{len(pairs)}\t{sec:.6f}\t{1000 * sec / max(1, len(pairs)):.3f}" for name, sec in rows]
+    print("\n".join(lines))
+    if args.out:
+        Path(args.out).write_text("\n".join(lines) + "\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Throughput of the fmh_omega.py kernel (pair blocks, threshold mask, rates) on
+random DNA and protein compare matrices of enough labels for --pairs unordered
+pairs. The matrices are written as .npy files and read back memory-mapped, as
+fmh_omega.py reads `sourmash compare -o` output. peak_alloc_mb is the peak of
+the allocations traced during the kernel (NumPy arrays included, mapped pages
+not); the optional write_omega stage is timed untraced, tracing every string
+would dominate it. Prints, and optionally writes, a TSV with one row per stage.
+
+    python3 benchmark_omega.py --pairs 100000000 --workdir /data/tmp --out bench_omega.tsv
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from fmh_omega import BLOCK_PAIRS, MatrixPairs, omega_blocks, omega_rates, write_omega
+
+def random_matrix(path, labels, rng, rows_per_block=256):
+    """MatrixPairs of a random n x n containment matrix written to path (.npy) and mapped back."""
+    n = len(labels)
+    matrix = np.lib.format.open_memmap(path, mode="w+", dtype=np.float64, shape=(n, n))
+    for r in range(0, n, rows_per_block):
+        matrix[r:r + rows_per_block] = rng.random((min(rows_per_block, n - r), n)) ** 3
+    matrix.flush()
+    del matrix
+    return MatrixPairs(labels, np.load(path, mmap_mode="r"))
+
+def time_kernel(dna, protein, ksize, threshold, block_pairs):
+    """(seconds, pairs kept, peak traced MB) of the kernel over every pair."""
+    tracemalloc.start()
+    t0 = time.monotonic()
+    kept = 0
+    for lo, hi, dna_cfrac, aa_cfrac in omega_blocks(dna, protein, threshold, block_pairs):
+        omega_rates(dna_cfrac, aa_cfrac, ksize)
+        kept += len(lo)
+    sec = time.monotonic() - t0
+    peak = tracemalloc.get_traced_memory()[1] / 2**20
+    tracemalloc.stop()
+    return sec, kept, peak
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark the fmh_omega.py kernel on random compare matrices.")
+    ap.add_argument("--pairs", type=int, default=10**8, help="Unordered pairs to cover (default: 1e8)")
+    ap.add_argument("--ksize", type=int, default=7, help="Protein k-mer size (default: 7)")
+    ap.add_argument("--threshold", type=float, default=0.0, help="Containment threshold (default: 0, every pair)")
+    ap.add_argument("--block_pairs", type=int, default=BLOCK_PAIRS, help=f"Candidate pairs per kernel block (default: {BLOCK_PAIRS})")
+    ap.add_argument("--write_labels", type=int, default=0, help="Also time write_omega on the first N labels (default: skip)")
+    ap.add_argument("--workdir", default=None, help="Directory for the matrices (default: system temp)")
+    ap.add_argument("--seed", type=int, default=0, help="Random seed (default: 0)")
+    ap.add_argument("--out", default=None, help="Optional TSV to write the results to")
+    args = ap.parse_args()
+
+    n = int(np.ceil((1 + np.sqrt(1 + 8 * args.pairs)) / 2))
+    rng = np.random.default_rng(args.seed)
+    labels = [f"GCF_{k:09d}.1" for k in rng.permutation(n)]
+    rows = []
+    with tempfile.TemporaryDirectory(dir=args.workdir) as tmp:
+        dna = random_matrix(Path(tmp) / "dna.npy", labels, rng)
+        protein = random_matrix(Path(tmp) / "protein.npy", labels, rng)
+        rows.append(("kernel", n, *time_kernel(dna, protein, args.ksize, args.threshold, args.block_pairs)))
+        if args.write_labels:
+            m = min(args.write_labels, n)
+            small = [MatrixPairs(labels[:m], pairs.matrix[:m, :m]) for pairs in (dna, protein)]
+            t0 = time.monotonic()
+            kept = write_omega(Path(tmp) / "fmh_omega.csv", *small, args.ksize, args.threshold)
+            rows.append(("write_omega", m, time.monotonic() - t0, kept, None))
+        del dna, protein
+
+    lines = ["stage\tlabels\tpairs\tkept\tseconds\tM_pairs_per_s\tpeak_alloc_mb"]
+    lines += [f"{stage}\t{m}\t{m * (m - 1) // 2}\t{kept}\t{sec:.3f}\t{m * (m - 1) / 2 / sec / 1e6:.2f}\t{'NA' if peak is None else f'{peak:.0f}'}"
+              for stage, m, sec, kept, peak in rows]
+    print("\n".join(lines))
+    if args.out:
+        Path(args.out).write_text("\n".join(lines) + "\n")
+
+if __name__ == "__main__":
+    main()
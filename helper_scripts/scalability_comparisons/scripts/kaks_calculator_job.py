@@ -2,31 +2,90 @@
 # -*- coding: utf-8 -*-
 
 import argparse
-import time
+import sys
 import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from ng86 import ng86_file
+from timing import EventLog, span
+
 def fmt_mmss(seconds_float: float) -> str:
     secs = int(round(seconds_float))
     return f"{secs // 60}:{secs % 60}"
 
-def run_kaks_timed(kaks_bin: str, axt_in: Path, kaks_out: Path, method: str, log_path: Path) -> float:
+def run_kaks_timed(kaks_bin: str, axt_in: Path, kaks_out: Path, method: str, log_path: Path, engine: str = "kaks_calculator",
+                   timeout: float = None, events: EventLog = None, **fields) -> float:
+    """Run one method on one AXT and return its wall time; events also gets a "kaks" span tagged with fields."""
     kaks_out.parent.mkdir(parents=True, exist_ok=True)
     log_path.parent.mkdir(parents=True, exist_ok=True)
+    fields.update(method=method, input=str(axt_in), path=str(kaks_out))
 
-    cmd = [kaks_bin, "-i", str(axt_in), "-o", str(kaks_out), "-m", method]
+    if engine == "native" and method == "NG":
+        # NG86 in-process: no KaKs_Calculator launch, same .kaks columns
+        with span("kaks", events, engine="native", **fields) as ev:
+            n = ng86_file(axt_in, kaks_out)
+        with open(log_path, "w") as lf:
+            lf.write(f"native NG86: {n} pairs from {axt_in} -> {kaks_out}\n")
+        return ev["wall_sec"]
 
-    t0 = time.monotonic()
-    res = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
-    dt = time.monotonic() - t0
+    cmd = [kaks_bin, "-i", str(axt_in), "-o", str(kaks_out), "-m", method]
 
-    with open(log_path, "w") as lf:
-        lf.write(f"$ {' '.join(cmd)}\n\nSTDOUT:\n{res.stdout or ''}\nSTDERR:\n{res.stderr or ''}")
+    try:
+        with span("kaks", events, engine="kaks_calculator", **fields) as ev:
+            res = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, timeout=timeout)
+            with open(log_path, "w") as lf:
+                lf.write(f"$ {' '.join(cmd)}\n\nSTDOUT:\n{res.stdout or ''}\nSTDERR:\n{res.stderr or ''}")
+            # raised inside the span so the event is marked as an error too
+            if res.returncode != 0:
+                raise RuntimeError(f"KaKs_Calculator failed (exit {res.returncode}). See log: {log_path}")
+    except subprocess.TimeoutExpired:
+        with open(log_path, "w") as lf:
+            lf.write(f"$ {' '.join(cmd)}\n\nkilled after {timeout}s\n")
+        raise RuntimeError(f"KaKs_Calculator timed out after {timeout}s. See log: {log_path}")
+
+    return ev["wall_sec"]
+
+def build_tasks(args, base: Path, samples, methods):
+    """
+    The full task list, built before anything runs: one task per (sample, AXT, method).
+    --skip_single drops the combined AXT of each sample, --axt_glob adds every AXT it matches.
+    Returns (tasks, rows for the combined summary of samples whose combined AXT is missing).
+    """
+    tasks, skipped = [], []
+    for s in samples:
+        sample_dir = base / f"sample_{s}"
 
-    if res.returncode != 0:
-        raise RuntimeError(f"KaKs_Calculator failed (exit {res.returncode}). See log: {log_path}")
+        # --------- Single combined AXT (optional) ----------
+        if not args.skip_single:
+            in_path = sample_dir / args.input_name
+            if not in_path.exists():
+                note = f"missing input: {in_path}"
+                print(f"[SKIP] {note}")
+                skipped += [[s, m, str(in_path), "", "", "SKIP", note] for m in methods]
+            else:
+                for m in methods:
+                    # Write into sample_<N>/<kaks_subdir>/, using only the basename of the templates
+                    out_name = Path(args.out_template.format(method=m)).name
+                    log_name = Path(args.log_template.format(method=m)).name
+                    tasks.append({"kind": "combined", "sample": s, "method": m, "axt_in": in_path,
+                                  "kaks_out": sample_dir / args.kaks_subdir / out_name,
+                                  "log_path": sample_dir / args.kaks_subdir / log_name})
 
-    return dt
+        # --------- Per-AXT (each individual AXT) ----------
+        if args.axt_glob:
+            matches = [p for p in sorted(sample_dir.glob(args.axt_glob)) if p.is_file() and p.suffix.lower() == ".axt"]
+            if not matches:
+                print(f"[SKIP] No AXT matched in sample_{s} with pattern '{args.axt_glob}'")
+            for axt_in in matches:
+                # outputs/logs go into <axt_in.parent>/<kaks_subdir>/
+                out_dir = axt_in.parent / args.kaks_subdir
+                for m in methods:
+                    tasks.append({"kind": "per-file", "sample": s, "method": m, "axt_in": axt_in,
+                                  "kaks_out": out_dir / f"{axt_in.stem}_{m}.axt.kaks",
+                                  "log_path": out_dir / f"{axt_in.stem}_{m}.kaks.log"})
+    return tasks, skipped
 
 def main():
     ap = argparse.ArgumentParser(description="Time KaKs_Calculator across sample sizes and methods; optionally for every individual AXT.")
@@ -34,6 +93,8 @@ def main():
     ap.add_argument("--samples", default="5,10,100,1000", help="Comma-separated sample sizes (numbers only)")
     ap.add_argument("--methods", default="NG,GY", help="Comma-separated KaKs methods (e.g. NG,GY,MS,MA)")
     ap.add_argument("--kaks_bin", default="KaKs_Calculator", help="KaKs_Calculator binary path or name")
+    ap.add_argument("--engine", choices=["kaks_calculator", "native"], default="kaks_calculator",
+                    help="native computes NG in-process (helper_scripts/ng86.py); other methods always use KaKs_Calculator")
 
     # Single combined AXT (existing behavior)
     ap.add_argument("--input_name", default="axt/sequences.axt", help="Input AXT path relative to each sample dir")
@@ -49,6 +110,11 @@ def main():
     # NEW: put outputs/logs into a 'kaks' subdir
     ap.add_argument("--kaks_subdir", default="kaks", help="Subfolder (relative to sample or AXT dir) to store .kaks + logs")
 
+    # Scheduling
+    ap.add_argument("--jobs", type=int, default=1, help="Tasks (sample x AXT x method) run at once")
+    ap.add_argument("--timeout", type=float, default=None, help="Seconds before a KaKs_Calculator run is killed and marked FAIL")
+    ap.add_argument("--events", default=None, help="Also append one JSONL timing event per run to this file (see helper_scripts/timing.py)")
+
     args = ap.parse_args()
 
     base = Path(args.base_dir)
@@ -57,82 +123,58 @@ def main():
     samples = [s.strip() for s in args.samples.split(",") if s.strip()]
     methods = [m.strip() for m in args.methods.split(",") if m.strip()]
 
-    # Summaries
-    grid_summary = base / args.summary_name
-    with open(grid_summary, "w") as sf:
-        sf.write("\t".join(["sample", "method", "input_file", "output_file", "seconds", "status", "note"]) + "\n")
+    tasks, skipped = build_tasks(args, base, samples, methods)
 
+    # Summaries: written only from this thread, opened once for the whole run
+    grid_summary = base / args.summary_name
     per_file_summary = base / args.summary_name_files
-    with open(per_file_summary, "w") as sf:
-        sf.write("\t".join(["sample", "method", "axt_file", "kaks_file", "seconds", "status", "note"]) + "\n")
 
     total_ok = 0
     total_time = 0.0
     total_file_ok = 0
     total_file_time = 0.0
 
-    for s in samples:
-        sample_dir = base / f"sample_{s}"
-
-        # --------- Single combined AXT run (optional) ----------
-        if not args.skip_single:
-            in_path = sample_dir / args.input_name
-            if not in_path.exists():
-                note = f"missing input: {in_path}"
-                print(f"[SKIP] {note}")
-                with open(grid_summary, "a") as sf:
-                    for m in methods:
-                        sf.write("\t".join([s, m, str(in_path), "", "", "SKIP", note]) + "\n")
-            else:
-                for m in methods:
-                    # Write into sample_<N>/<kaks_subdir>/, using only the basename of the templates
-                    out_name = Path(args.out_template.format(method=m)).name
-                    log_name = Path(args.log_template.format(method=m)).name
-                    out_path = sample_dir / args.kaks_subdir / out_name
-                    log_path = sample_dir / args.kaks_subdir / log_name
-
-                    try:
-                        secs = run_kaks_timed(args.kaks_bin, in_path, out_path, m, log_path)
+    with open(grid_summary, "w") as grid_sf, open(per_file_summary, "w") as file_sf, EventLog(args.events) as events:
+        grid_sf.write("\t".join(["sample", "method", "input_file", "output_file", "seconds", "status", "note"]) + "\n")
+        file_sf.write("\t".join(["sample", "method", "axt_file", "kaks_file", "seconds", "status", "note"]) + "\n")
+        for row in skipped:
+            grid_sf.write("\t".join(row) + "\n")
+        grid_sf.flush()
+
+        with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+            futures = {pool.submit(run_kaks_timed, args.kaks_bin, t["axt_in"], t["kaks_out"], t["method"],
+                                   t["log_path"], args.engine, args.timeout, events,
+                                   sample=t["sample"], kind=t["kind"]): i for i, t in enumerate(tasks)}
+            # progress is printed as runs finish; summary rows wait for their predecessors so the
+            # TSVs list runs in task order whatever the finishing order
+            rows, written = [None] * len(tasks), 0
+            for fut in as_completed(futures):
+                i = futures[fut]
+                t = tasks[i]
+                s, m, combined = t["sample"], t["method"], t["kind"] == "combined"
+                label = "combined" if combined else "per-file"
+                try:
+                    secs = fut.result()
+                    row = [s, m, str(t["axt_in"]), str(t["kaks_out"]), f"{secs:.6f}", "OK", ""]
+                    if combined:
                         total_ok += 1
                         total_time += secs
-                        print(f"[OK] sample_{s} {m} (combined): {secs:.3f}s -> {out_path}")
+                    else:
+                        total_file_ok += 1
+                        total_file_time += secs
+                    print(f"[OK] sample_{s} {m} ({label}): {secs:.3f}s -> {t['kaks_out']}")
+                    if combined:
                         print(f"Mission accomplished. (Time elapsed: {fmt_mmss(secs)})")
-                        with open(grid_summary, "a") as sf:
-                            sf.write("\t".join([s, m, str(in_path), str(out_path), f"{secs:.6f}", "OK", ""]) + "\n")
-                    except Exception as e:
-                        note = str(e).replace("\n", " ")
-                        print(f"[FAIL] sample_{s} {m} (combined): {note}")
-                        with open(grid_summary, "a") as sf:
-                            sf.write("\t".join([s, m, str(in_path), str(out_path), "", "FAIL", note]) + "\n")
-
-        # --------- Per-AXT runs (each individual AXT) ----------
-        if args.axt_glob:
-            matches = list(sample_dir.glob(args.axt_glob))
-            if not matches:
-                print(f"[SKIP] No AXT matched in sample_{s} with pattern '{args.axt_glob}'")
-            else:
-                for axt_in in sorted(matches):
-                    if not axt_in.is_file() or axt_in.suffix.lower() != ".axt":
-                        continue
-                    # outputs/logs go into <axt_in.parent>/<kaks_subdir>/
-                    out_dir = axt_in.parent / args.kaks_subdir
-                    for m in methods:
-                        kaks_name = f"{axt_in.stem}_{m}.axt.kaks"
-                        log_name  = f"{axt_in.stem}_{m}.kaks.log"
-                        kaks_out = out_dir / kaks_name
-                        log_path = out_dir / log_name
-                        try:
-                            secs = run_kaks_timed(args.kaks_bin, axt_in, kaks_out, m, log_path)
-                            total_file_ok += 1
-                            total_file_time += secs
-                            print(f"[OK] sample_{s} {m} (per-file): {secs:.3f}s -> {kaks_out}")
-                            with open(per_file_summary, "a") as sf:
-                                sf.write("\t".join([s, m, str(axt_in), str(kaks_out), f"{secs:.6f}", "OK", ""]) + "\n")
-                        except Exception as e:
-                            note = str(e).replace("\n", " ")
-                            print(f"[FAIL] sample_{s} {m} (per-file) {axt_in.name}: {note}")
-                            with open(per_file_summary, "a") as sf:
-                                sf.write("\t".join([s, m, str(axt_in), str(kaks_out), "", "FAIL", note]) + "\n")
+                except Exception as e:
+                    note = str(e).replace("\n", " ")
+                    row = [s, m, str(t["axt_in"]), str(t["kaks_out"]), "", "FAIL", note]
+                    print(f"[FAIL] sample_{s} {m} ({label}) {t['axt_in'].name}: {note}")
+                rows[i] = row
+                while written < len(tasks) and rows[written] is not None:
+                    sf = grid_sf if tasks[written]["kind"] == "combined" else file_sf
+                    sf.write("\t".join(rows[written]) + "\n")
+                    sf.flush()
+                    written += 1
 
     # Totals
     avg = (total_time / total_ok) if total_ok else 0.0
@@ -1,37 +1,30 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-import re, random, argparse
+import re, random, argparse, sys
 from pathlib import Path
 
-CORE_ID_RE = re.compile(r'(cds_WP_\d+\.\d)')
-
-def read_fasta(path):
-    header, seq = None, []
-    with open(path) as f:
-        for line in f:
-            if line.startswith('>'):
-                if header is not None:
-                    yield header, ''.join(seq)
-                header, seq = line.strip(), []
-            else:
-                seq.append(line.strip())
-        if header is not None:
-            yield header, ''.join(seq)
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from fasta_io import fetch_records, format_fasta, load_fasta_index
 
-def wrap_seq(s, width=60):
-    return '\n'.join(s[i:i+width] for i in range(0, len(s), width))
+CORE_ID_RE = re.compile(r'(cds_WP_\d+\.\d)')
 
 def core_id_from_header(h):
     m = CORE_ID_RE.search(h); return m.group(1) if m else None
 
 def index_by_core_id(fa):
+    """core_id -> (header, offset, byte_length, seq_length) from the on-disk index (<fa>.fxi, built on first use)."""
     idx = {}
-    for h, s in read_fasta(fa):
-        cid = core_id_from_header(h)
+    for entry in load_fasta_index(fa):
+        cid = core_id_from_header(entry[0])
         if cid:
-            idx[cid] = (h, s)
+            idx[cid] = entry
     return idx
 
+def fetch_by_core_id(fa, idx, core_ids):
+    """Seek-read only the records of core_ids; returns core_id -> ('>header', seq)."""
+    recs = fetch_records(fa, [idx[cid] for cid in core_ids])
+    return {cid: ('>' + h, s) for cid, (h, s) in zip(core_ids, recs)}
+
 def main():
     ap = argparse.ArgumentParser(description="Sample common cds_WP IDs across 3 strains and write 3-seq FASTAs.")
     ap.add_argument("--strain1", required=True)
@@ -49,7 +42,7 @@ def main():
     idx2 = index_by_core_id(args.strain2)
     idx3 = index_by_core_id(args.strain3)
 
-    eligible_in_1 = {cid for cid,(h,s) in idx1.items() if len(s) > args.min_len}
+    eligible_in_1 = {cid for cid,(h,off,nb,seq_len) in idx1.items() if seq_len > args.min_len}
     common = eligible_in_1 & idx2.keys() & idx3.keys()
     if not common:
         raise SystemExit(f"No common CDS (>{args.min_len}) across three strains.")
@@ -62,15 +55,16 @@ def main():
     random.seed(args.seed)
     picked = random.sample(ids, args.sample_n)
 
+    sources = [(src, fetch_by_core_id(src, idx, picked))
+               for src, idx in [(args.strain1, idx1),(args.strain2, idx2),(args.strain3, idx3)]]
+
     manifest = ["core_id\toutfile\tstrain_file\theader"]
     for cid in picked:
         out_fa = out_dir / f"{cid}.fasta"
         with open(out_fa, "w") as out:
-            for src, idx in [(args.strain1, idx1),(args.strain2, idx2),(args.strain3, idx3)]:
-                h, s = idx[cid]
-                if not h.startswith(">"): h = f">{h}"
-                out.write(f"{h}\n{wrap_seq(s)}\n")
-                manifest.append(f"{cid}\t{out_fa.name}\t{Path(src).name}\t{h[1:]}")
+            out.write(format_fasta([idx[cid] for _, idx in sources], width=60))
+        for src, idx in sources:
+            manifest.append(f"{cid}\t{out_fa.name}\t{Path(src).name}\t{idx[cid][0][1:]}")
 
     (out_dir / "manifest.tsv").write_text("\n".join(manifest) + "\n")
     (out_dir / "_SAMPLED.OK").write_text("\n")    # marker for Snakemake
@@ -1,10 +1,13 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import argparse, csv, os
+import argparse, csv, os, sys
 from pathlib import Path
 from typing import Optional, Dict, List
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from timing import read_events
+
 def read_tsv_sum_seconds(path: Path, seconds_col: str) -> float:
     """Sum a float column from a headered TSV; returns 0.0 if file missing."""
     if not path.exists():
@@ -69,6 +72,19 @@ def sum_kaks_from_global_tsv(global_tsv: Path, sample: str, rep: Optional[str])
                 pass
     return total
 
+def sum_event_seconds(events: List[dict], stage: str, sample: str, rep: Optional[str]) -> Optional[float]:
+    """Sum wall_sec of the successful spans of one stage written under sample_<N>[/rep_<r>]; None if there are none."""
+    total, found = 0.0, False
+    for ev in events:
+        if ev.get("stage") != stage or ev.get("status") != "ok":
+            continue
+        path = ev.get("path", "")
+        if f"/sample_{sample}/" not in path or (rep and f"/rep_{rep}/" not in path):
+            continue
+        total += ev["wall_sec"]
+        found = True
+    return total if found else None
+
 def main():
     ap = argparse.ArgumentParser(description="Summarize timing across alignment, AXT conversion, and KaKs.")
     ap.add_argument("--base_dir", required=True, help="Root directory (contains sample_<N>/ …)")
@@ -79,7 +95,11 @@ def main():
                     help="Use Snakemake benchmark files for KaKs if present (recommended)")
     ap.add_argument("--global_kaks_tsv", default=None,
                     help="Optional path to timing_kaks_per_axt.tsv (fallback if no benchmarks)")
+    ap.add_argument("--events", nargs="+", default=[],
+                    help="JSONL event streams (alignment.py/axt_convert.py/kaks_calculator_job.py --events); "
+                         "a stage found there is summed from its spans instead of its TSV")
     args = ap.parse_args()
+    events = read_events(args.events) if args.events else []
 
     base = Path(args.base_dir)
     samples = [s.strip() for s in args.samples.split(",") if s.strip()]
@@ -108,22 +128,26 @@ def main():
                 axt_tsv   = base / f"sample_{s}" / "axt" / "timing_summary.tsv"
                 kaks_root = base / f"sample_{s}" / "kaks"
 
+            rep = str(r) if args.replicates > 1 else None
+
             # 1) alignment time
-            align_seconds = read_tsv_sum_seconds(align_tsv, "seconds")
+            align_seconds = sum_event_seconds(events, "align", s, rep)
+            if align_seconds is None:
+                align_seconds = read_tsv_sum_seconds(align_tsv, "seconds")
 
             # 2) axt conversion time
-            axt_seconds = read_tsv_sum_seconds(axt_tsv, "convert_seconds")
-
-            # 3) KaKs time
-            kaks_seconds = 0.0
-            used_bench = False
-            if args.prefer_benchmarks:
-                kaks_seconds = sum_kaks_from_benchmarks(kaks_root)
-                used_bench = kaks_seconds > 0.0
-            if not used_bench:
+            axt_seconds = sum_event_seconds(events, "axt", s, rep)
+            if axt_seconds is None:
+                axt_seconds = read_tsv_sum_seconds(axt_tsv, "convert_seconds")
+
+            # 3) KaKs time: events, else Snakemake benchmarks, else the global per-AXT TSV
+            kaks_seconds = sum_event_seconds(events, "kaks", s, rep)
+            if kaks_seconds is None and args.prefer_benchmarks:
+                kaks_seconds = sum_kaks_from_benchmarks(kaks_root) or None
+            if kaks_seconds is None:
+                kaks_seconds = 0.0
                 # fallback: global per-axt timing file
                 if args.global_kaks_tsv:
-                    rep = str(r) if args.replicates > 1 else None
                     kaks_seconds = sum_kaks_from_global_tsv(Path(args.global_kaks_tsv), str(s), rep)
 
             total = align_seconds + axt_seconds + kaks_seconds
@@ -3,9 +3,13 @@ import argparse
 from pathlib import Path
 from Bio import SeqIO
 import subprocess
-import time
 import csv
 import itertools
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[3]))
+from pairwise_align import format_clustal, global_align
+from timing import EventLog, span
 
 def write_pair_fasta(seq1, seq2, out_file):
     """Write a temporary FASTA file for a sequence pair, sequences on one line."""
@@ -13,39 +17,57 @@ def write_pair_fasta(seq1, seq2, out_file):
         f.write(f">{seq1.id}\n{str(seq1.seq)}\n")
         f.write(f">{seq2.id}\n{str(seq2.seq)}\n")
 
-def run_pairwise_clustal(fasta_file, outdir):
+def run_pairwise_clustal(fasta_file, outdir, aligner="clustalw", events=None):
     records = list(SeqIO.parse(fasta_file, "fasta"))
     outdir = Path(outdir)
     outdir.mkdir(parents=True, exist_ok=True)
     
     timing_file = outdir / "timing_alignments.tsv"
-    with open(timing_file, "w", newline="") as tf:
+    with open(timing_file, "w", newline="") as tf, EventLog(events) as log:
         writer = csv.writer(tf, delimiter="\t")
-        writer.writerow(["seq1", "seq2", "time_sec", "aln_file"])
+        writer.writerow(["seq1", "seq2", "time_sec", "aln_file", "status", "note"])
         
         # Iterate over all sequence pairs
         for rec1, rec2 in itertools.combinations(records, 2):
             aln_name = f"{rec1.id}_{rec2.id}.aln"
             aln_path = outdir / aln_name
             
+            if aligner == "builtin":
+                # In-process alignment: no temporary FASTA, no process spawn
+                status, note = "OK", ""
+                try:
+                    with span("align", log, fasta=str(fasta_file), aligner="builtin", path=str(aln_path)) as ev:
+                        aln1, aln2 = global_align(str(rec1.seq), str(rec2.seq))
+                        text = format_clustal([(rec1.id, aln1), (rec2.id, aln2)])
+                        with open(aln_path, "w") as f:
+                            f.write(text)
+                except Exception as e:
+                    status, note = "FAIL", str(e).replace("\n", " ")
+                    print(f"Builtin alignment failed for {rec1.id} vs {rec2.id}: {note}")
+                elapsed = ev["wall_sec"]
+                writer.writerow([rec1.id, rec2.id, f"{elapsed:.4f}", str(aln_path), status, note])
+                continue
+
             # Temporary pairwise FASTA file
             pair_fasta = outdir / f"{rec1.id}_{rec2.id}.fasta"
             write_pair_fasta(rec1, rec2, pair_fasta)
             
-            start = time.time()
             try:
                 # Run ClustalW on this pair
-                subprocess.run(
-                    ["clustalw2", "-INFILE=" + str(pair_fasta), "-OUTFILE=" + str(aln_path), "-QUIET"],
-                    check=True
-                )
-            except subprocess.CalledProcessError:
+                with span("align", log, fasta=str(fasta_file), aligner="clustalw", path=str(aln_path)) as ev:
+                    subprocess.run(
+                        ["clustalw2", "-INFILE=" + str(pair_fasta), "-OUTFILE=" + str(aln_path), "-QUIET"],
+                        check=True
+                    )
+            except subprocess.CalledProcessError as e:
                 print(f"ClustalW failed for {rec1.id} vs {rec2.id}")
+                # the pair FASTA is kept for rerunning the failed pair by hand
+                writer.writerow([rec1.id, rec2.id, f"{ev['wall_sec']:.4f}", str(aln_path), "FAIL", str(e)])
                 continue
-            elapsed = time.time() - start
+            elapsed = ev["wall_sec"]
             
             # Record timing
-            writer.writerow([rec1.id, rec2.id, f"{elapsed:.4f}", str(aln_path)])
+            writer.writerow([rec1.id, rec2.id, f"{elapsed:.4f}", str(aln_path), "OK", ""])
             
             # Clean up temporary pairwise FASTA
             pair_fasta.unlink()
@@ -56,6 +78,10 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Run pairwise ClustalW alignments for sampled FASTA")
     parser.add_argument("--input", required=True, help="Sampled FASTA file")
     parser.add_argument("--out_dir", required=True, help="Output directory for alignments and timing")
+    parser.add_argument("--aligner", choices=["clustalw", "builtin"], default="clustalw",
+                        help="clustalw2 per pair, or the in-process codon-aware Needleman-Wunsch aligner")
+    parser.add_argument("--events", default=None,
+                        help="Also append one JSONL timing event per alignment to this file (see helper_scripts/timing.py)")
     args = parser.parse_args()
     
-    run_pairwise_clustal(args.input, args.out_dir)
+    run_pairwise_clustal(args.input, args.out_dir, args.aligner, args.events)
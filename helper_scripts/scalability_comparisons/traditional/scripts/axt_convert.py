@@ -4,20 +4,27 @@
 """
 Recursively convert pairwise alignments (CLUSTAL .aln or 2-seq FASTA) to AXT,
 ensuring the final aligned length is divisible by 3 by appending '-' to BOTH
-sequences as needed. Mirrors input directory structure in --out_dir.
-Records per-file conversion time to timing_summary.tsv.
+sequences as needed. Records per-file conversion time to timing_axt.tsv.
 
-NEW: before exiting, concatenates all successfully generated AXT files into
-<out_dir>/all_pairs_combined.axt (in sorted, deterministic order).
+Each converted pair is appended straight to <out_dir>/sequences.axt in sorted,
+deterministic order (the order of the per-pair .axt paths), with byte offsets in
+sequences.axt.idx so a single pair can be pulled out with --extract A_vs_B.
+Per-pair .axt files (mirroring the input tree) are opt-in with --per_pair, and
+--shard_size N additionally splits the stream into sequences.partNNNN.axt.
 """
 
 import argparse
 import re
 import sys
-import time
 from pathlib import Path
 from typing import List, Tuple, Dict
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[3]))
+from fasta_io import read_fasta as stream_fasta
+from timing import EventLog, span
+
+INDEX_SUFFIX = ".idx"
+
 # ---------- Small utils ----------
 
 def sanitize_label(h: str) -> str:
@@ -42,21 +49,7 @@ def pad_both_to_multiple_of_three(seqA: str, seqB: str) -> Tuple[str, str]:
 # ---------- FASTA (2-seq) ----------
 
 def read_fasta(path: Path) -> List[Tuple[str, str]]:
-    recs: List[Tuple[str, str]] = []
-    h, chunks = None, []
-    with open(path) as f:
-        for line in f:
-            if not line.strip():
-                continue
-            if line.startswith(">"):
-                if h is not None:
-                    recs.append((h, "".join(chunks)))
-                h, chunks = line.strip(), []
-            else:
-                chunks.append(line.strip())
-        if h is not None:
-            recs.append((h, "".join(chunks)))
-    return recs
+    return [(">" + h, s) for h, s in stream_fasta(path)]
 
 # ---------- CLUSTAL (pairwise) ----------
 
@@ -120,24 +113,81 @@ def load_alignment(path: Path, forced: str = "auto") -> List[Tuple[str, str]]:
     else:
         raise ValueError(f"Unknown format: {forced}")
 
-def write_axt(axt_path: Path, nameA: str, nameB: str, seqA: str, seqB: str) -> None:
-    axt_path.parent.mkdir(parents=True, exist_ok=True)
-    with open(axt_path, "w") as out:
-        out.write(f"{nameA}_vs_{nameB}\n{seqA}\n{seqB}\n\n")
+def axt_block(nameA: str, nameB: str, seqA: str, seqB: str) -> str:
+    return f"{nameA}_vs_{nameB}\n{seqA}\n{seqB}\n\n"
+
+class AxtStream:
+    """
+    Appends AXT blocks to the combined file, and to shards of shard_size pairs when
+    shard_size > 0, as they are converted. Every block's byte offset is recorded in
+    <combined>.idx (pair, offset, nbytes, shard) so one pair can be read back with
+    extract_pair() without per-pair files.
+    """
+    def __init__(self, combined_path: Path, shard_size: int = 0):
+        self.combined_path = combined_path
+        self.shard_size = shard_size
+        self.out = open(combined_path, "w")
+        self.index = open(f"{combined_path}{INDEX_SUFFIX}", "w")
+        self.index.write("pair\toffset\tnbytes\tshard\n")
+        self.offset, self.n = 0, 0
+        self.shard, self.shard_path = None, None
+
+    def add(self, block: str) -> None:
+        if self.shard_size and self.n % self.shard_size == 0:
+            if self.shard:
+                self.shard.close()
+            k = self.n // self.shard_size
+            self.shard_path = self.combined_path.with_name(f"{self.combined_path.stem}.part{k:04d}.axt")
+            self.shard = open(self.shard_path, "w")
+        nbytes = len(block.encode())
+        self.out.write(block)
+        if self.shard:
+            self.shard.write(block)
+        self.index.write(f"{block.split(chr(10), 1)[0]}\t{self.offset}\t{nbytes}\t{self.shard_path.name if self.shard else ''}\n")
+        self.offset += nbytes
+        self.n += 1
+
+    def close(self) -> None:
+        for handle in (self.out, self.index, self.shard):
+            if handle:
+                handle.close()
+
+def extract_pair(combined_path: Path, pair: str) -> str:
+    """Return the AXT block of one pair ('A_vs_B') from a combined AXT via its .idx."""
+    with open(f"{combined_path}{INDEX_SUFFIX}") as idx:
+        next(idx)
+        for line in idx:
+            name, offset, nbytes, _ = line.rstrip("\n").split("\t")
+            if name == pair:
+                with open(combined_path, "rb") as f:
+                    f.seek(int(offset))
+                    return f.read(int(nbytes)).decode()
+    raise KeyError(f"{pair} not in {combined_path}{INDEX_SUFFIX}")
 
 def main():
     ap = argparse.ArgumentParser(
         description="Recursively convert pairwise alignments (.aln CLUSTAL or 2-seq FASTA) to AXT, "
-                    "padding to codon length (multiple of 3). Records conversion time and concatenates all AXT."
+                    "padding to codon length (multiple of 3). Records conversion time and streams every pair into one combined AXT."
     )
-    ap.add_argument("--input", required=True, help="Alignment file OR directory (recursively scanned).")
-    ap.add_argument("--out_dir", required=True, help="Where to write .axt, timing_summary.tsv, and all_pairs_combined.axt")
+    ap.add_argument("--input", help="Alignment file OR directory (recursively scanned).")
+    ap.add_argument("--out_dir", required=True, help="Where to write sequences.axt (+ .idx), timing_axt.tsv and optional per-pair/shard AXT")
     ap.add_argument("--format", choices=["auto","clustal","fasta"], default="auto", help="Force input format (default: auto)")
     ap.add_argument("--exts", nargs="+", default=[".aln",".fa",".fna",".fasta"], help="Extensions to scan recursively if --input is a directory")
+    ap.add_argument("--per_pair", action="store_true", help="Also write one .axt per alignment (mirroring the input tree)")
+    ap.add_argument("--shard_size", type=int, default=0, help="Also split the combined AXT into sequences.partNNNN.axt of this many pairs")
+    ap.add_argument("--extract", default=None, help="Print one pair (e.g. A_vs_B) from <out_dir>/sequences.axt and exit")
+    ap.add_argument("--events", default=None, help="Also append one JSONL timing event per converted file to this file (see helper_scripts/timing.py)")
     args = ap.parse_args()
 
-    in_path = Path(args.input)
+    in_path = Path(args.input) if args.input else None
     out_dir = Path(args.out_dir)
+    combined_path = out_dir / "sequences.axt"
+
+    if args.extract:
+        sys.stdout.write(extract_pair(combined_path, args.extract))
+        return
+    if in_path is None:
+        ap.error("--input is required unless --extract is given")
     out_dir.mkdir(parents=True, exist_ok=True)
 
     # Build list of inputs (recurse if directory)
@@ -150,53 +200,66 @@ def main():
     else:
         inputs = [in_path]
 
+    # The combined AXT has always been ordered by the per-pair .axt path, so plan those paths
+    # first and stream in that order; an input mapping to the same .axt as a later one is superseded
+    planned: Dict[Path, Tuple[Path, Path]] = {}
+    superseded: List[Tuple[Path, Path]] = []
+    for aln in inputs:
+        if in_path.is_dir():
+            axt_path = (out_dir / aln.relative_to(in_path)).with_suffix(".axt")
+        else:
+            axt_path = (out_dir / aln.name).with_suffix(".axt")
+        key = axt_path.resolve()
+        if key in planned:
+            superseded.append((planned[key][0], aln))
+        planned[key] = (aln, axt_path)
+
     summary = out_dir / "timing_axt.tsv"
-    with open(summary, "w") as sf:
-        sf.write("input_file\taxt_file\tconvert_seconds\tstatus\tnote\n")
+    sf = open(summary, "w")
+    sf.write("input_file\taxt_file\tconvert_seconds\tstatus\tnote\n")
+    for old, new in superseded:
+        sf.write(f"{old}\t\t\tSKIP\tsame .axt as {new}\n")
 
     total, n_ok = 0.0, 0
-    generated_axts: List[Path] = []
+    made_dirs = set()
+    stream = AxtStream(combined_path, args.shard_size)
+    events = EventLog(args.events)
 
-    for aln in inputs:
+    for key in sorted(planned):
+        aln, axt_path = planned[key]
         status, note = "OK", ""
-        t0 = time.monotonic()
+        dest = axt_path if args.per_pair else combined_path
         try:
-            recs = load_alignment(aln, forced=args.format)
-            (nameA, sA), (nameB, sB) = recs[0], recs[1]
-            sA2, sB2 = pad_both_to_multiple_of_three(sA, sB)
-
-            if in_path.is_dir():
-                rel = aln.relative_to(in_path)
-                axt_path = (out_dir / rel).with_suffix(".axt")
-            else:
-                axt_path = (out_dir / aln.name).with_suffix(".axt")
+            with span("axt", events, input=str(aln), path=str(dest)) as ev:
+                recs = load_alignment(aln, forced=args.format)
+                (nameA, sA), (nameB, sB) = recs[0], recs[1]
+                sA2, sB2 = pad_both_to_multiple_of_three(sA, sB)
+                block = axt_block(nameA, nameB, sA2, sB2)
 
-            write_axt(axt_path, nameA, nameB, sA2, sB2)
-            generated_axts.append(axt_path)
+                stream.add(block)
+                if args.per_pair:
+                    if axt_path.parent not in made_dirs:
+                        axt_path.parent.mkdir(parents=True, exist_ok=True)
+                        made_dirs.add(axt_path.parent)
+                    with open(axt_path, "w") as out:
+                        out.write(block)
 
-            dt = time.monotonic() - t0
+            dt = ev["wall_sec"]
             total += dt; n_ok += 1
-            print(f"[OK] {aln} -> {axt_path} ({dt:.3f}s)")
-            with open(summary, "a") as sf:
-                sf.write(f"{aln}\t{axt_path}\t{dt:.6f}\t{status}\t{note}\n")
+            print(f"[OK] {aln} -> {dest} ({dt:.3f}s)")
+            sf.write(f"{aln}\t{dest}\t{dt:.6f}\t{status}\t{note}\n")
         except Exception as e:
-            dt = time.monotonic() - t0
             status, note = "FAIL", str(e).replace("\n"," ")
             print(f"[FAIL] {aln}: {note}")
-            with open(summary, "a") as sf:
-                sf.write(f"{aln}\t\t\t{status}\t{note}\n")
+            sf.write(f"{aln}\t\t\t{status}\t{note}\n")
+    stream.close()
+    sf.close()
+    events.close()
 
-    # ---- Concatenate all generated AXT files (sorted) ----
-    combined_path = out_dir / "sequences.axt"
-    if generated_axts:
-        generated_axts = sorted(set(p.resolve() for p in generated_axts))
-        with open(combined_path, "w") as out:
-            for p in generated_axts:
-                with open(p, "r") as inp:
-                    out.write(inp.read())
-        print(f"[OK] Concatenated {len(generated_axts)} AXT files -> {combined_path}")
+    if stream.n:
+        print(f"[OK] Streamed {stream.n} pairs -> {combined_path} (index: {combined_path}{INDEX_SUFFIX})")
     else:
-        print("[WARN] No AXT files generated; skipping concatenation.")
+        print("[WARN] No AXT pairs generated; sequences.axt is empty.")
 
     print("\n==== Conversion Timing ====")
     avg = (total / n_ok) if n_ok else 0.0
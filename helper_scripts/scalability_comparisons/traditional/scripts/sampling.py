@@ -4,8 +4,12 @@
 import re
 import random
 import argparse
+import sys
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[3]))
+from fasta_io import fetch_records, format_fasta, load_fasta_index
+
 # -----------------------
 # CONFIG (edit as needed)
 # -----------------------
@@ -30,24 +34,6 @@ base_out = Path("/data/jzr5814/dnds_scalability_comparison")
 
 CORE_ID_RE = re.compile(r'(cds_WP_\d+\.\d)')
 
-def read_fasta(path):
-    """Yield (header, seq) from FASTA file."""
-    header, seq_chunks = None, []
-    with open(path) as f:
-        for line in f:
-            if line.startswith('>'):
-                if header is not None:
-                    yield header, ''.join(seq_chunks)
-                header = line.strip()
-                seq_chunks = []
-            else:
-                seq_chunks.append(line.strip())
-        if header is not None:
-            yield header, ''.join(seq_chunks)
-
-def wrap_seq(s, width=60):
-    return '\n'.join(s[i:i+width] for i in range(0, len(s), width))
-
 def core_id_from_header(header):
     """Extract cds_WP_... core id from a FASTA header; return None if absent."""
     m = CORE_ID_RE.search(header)
@@ -55,16 +41,22 @@ def core_id_from_header(header):
 
 def index_by_core_id(fasta_path):
     """
-    Build dict core_id -> (header, seq) for a .cds.fna file.
+    Build dict core_id -> (header, offset, byte_length, seq_length) for a .cds.fna file
+    from its on-disk index (<fasta>.fxi, built once and reused while the file is unchanged).
     If multiple entries share a core_id, last one wins.
     """
     idx = {}
-    for h, s in read_fasta(fasta_path):
-        cid = core_id_from_header(h)
+    for entry in load_fasta_index(fasta_path):
+        cid = core_id_from_header(entry[0])
         if cid:
-            idx[cid] = (h, s)
+            idx[cid] = entry
     return idx
 
+def fetch_by_core_id(fasta_path, idx, core_ids):
+    """Seek-read only the records of core_ids; returns core_id -> ('>header', seq)."""
+    recs = fetch_records(fasta_path, [idx[cid] for cid in core_ids])
+    return {cid: ('>' + h, s) for cid, (h, s) in zip(core_ids, recs)}
+
 # -----------------------
 # Main workflow
 # -----------------------
@@ -80,7 +72,7 @@ def main():
     idx3 = index_by_core_id(strain3)
 
     # Apply length filter to strain1 only
-    eligible_in_1 = {cid for cid, (h, s) in idx1.items() if len(s) > min_len}
+    eligible_in_1 = {cid for cid, (h, offset, nbytes, seq_len) in idx1.items() if seq_len > min_len}
 
     # Keep only core IDs present in ALL THREE strains
     common = eligible_in_1 & idx2.keys() & idx3.keys()
@@ -101,16 +93,18 @@ def main():
 
     picked = random.sample(ids, sample_n)
 
+    # Read only the picked records from each strain
+    sources = [(src_path, fetch_by_core_id(src_path, idx, picked))
+               for src_path, idx in [(strain1, idx1), (strain2, idx2), (strain3, idx3)]]
+
     # Write one FASTA per picked core id, containing the three sequences
     manifest_lines = ["core_id\toutfile\tstrain_file\theader"]
     for cid in picked:
         out_fa = out_dir / f"{cid}.fasta"
         with open(out_fa, "w") as out:
-            for src_path, idx in [(strain1, idx1), (strain2, idx2), (strain3, idx3)]:
-                header, seq = idx[cid]
-                h = header if header.startswith('>') else f">{header}"
-                out.write(f"{h}\n{wrap_seq(seq)}\n")
-                manifest_lines.append(f"{cid}\t{out_fa.name}\t{Path(src_path).name}\t{header}")
+            out.write(format_fasta([idx[cid] for _, idx in sources], width=60))
+        for src_path, idx in sources:
+            manifest_lines.append(f"{cid}\t{out_fa.name}\t{Path(src_path).name}\t{idx[cid][0]}")
 
         print(f"Wrote {out_fa}")
 
@@ -1,48 +1,93 @@
 import pandas as pd
 import argparse
-from fmh_omega.helperfuncs import get_coding_sequence_from_nucleotide_sequence, positive_selection_based_on_mutation_rate_p, negative_selection_based_on_mutation_rate_p, read_fasta_gz
-import random
-from Bio.Seq import Seq
+from simulate import encode_codon_array, mutate_replicates, read_fasta_gz
+from translation import translate_batch
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
 import gzip
+import shutil
+
+SELECTIONS = ('positive', 'negative')
+
+def output_name(selection, molecule, mutation_rate_p, i):
+    """File names expected by the downstream sourmash steps."""
+    if molecule == 'nt':
+        return f'{selection}_selection_queries_{mutation_rate_p}_{i}.fna'
+    return f'{selection}_selection_translated_queries_{mutation_rate_p}_{i}.faa'
+
+def shard_path(shard_dir, selection, molecule, mutation_rate_p, i, chunk):
+    return shard_dir / f'{output_name(selection, molecule, mutation_rate_p, i)}.part{chunk:05d}.gz'
+
+def unit_rng(entropy, gene_index, i):
+    """Generator for one (iteration, gene) unit.
+    Equivalent to SeedSequence(entropy).spawn(n_genes)[gene_index].spawn(iterations)[i], so every gene owns
+    its stream and the output does not depend on how the work is split between workers."""
+    return np.random.default_rng(np.random.SeedSequence(entropy, spawn_key=(gene_index, i)))
+
+def mutate_shard(task):
+    """Worker: mutates one chunk of genes for one iteration and writes a gzip shard per output file."""
+    shard_dir, entropy, mutation_rate_p, i, chunk, genes = task
+    records = {(selection, molecule): [] for selection in SELECTIONS for molecule in ('nt', 'aa')}
+    for gene_index, name, ref_sequence in genes:
+        #ref sequence is mutated with mutation rate p, positive and negative selection together
+        mutated = mutate_replicates(encode_codon_array(ref_sequence), float(mutation_rate_p), 1, SELECTIONS, unit_rng(entropy, gene_index, i))
+        for selection, query in zip(SELECTIONS, mutated[:, 0]):
+            records[(selection, 'nt')].append((name, query.reshape(-1)[:len(ref_sequence)].tobytes()))
+    for selection in SELECTIONS:
+        queries = records[(selection, 'nt')]
+        #Translated mutated sequences, the whole chunk in one table lookup
+        translated_queries = translate_batch([query for _, query in queries])
+        records[(selection, 'nt')] = [f'>{selection}_{mutation_rate_p}_{name}\n{query.decode()}\n' for name, query in queries]
+        records[(selection, 'aa')] = [f'>{selection}_{mutation_rate_p}_{name}\n{translated}\n' for (name, _), translated in zip(queries, translated_queries)]
+    for (selection, molecule), lines in records.items():
+        with gzip.open(shard_path(shard_dir, selection, molecule, mutation_rate_p, i, chunk), 'wt', compresslevel=1) as shard:
+            shard.write(''.join(lines))
+    return i, chunk
+
+def merge_shards(WD, shard_dir, mutation_rate_p, i, n_chunks):
+    """Concatenates the shards of one iteration, in gene order, into the final uncompressed files."""
+    for selection in SELECTIONS:
+        for molecule in ('nt', 'aa'):
+            with open(WD / output_name(selection, molecule, mutation_rate_p, i), 'wb') as out:
+                for chunk in range(n_chunks):
+                    part = shard_path(shard_dir, selection, molecule, mutation_rate_p, i, chunk)
+                    with gzip.open(part, 'rb') as shard:
+                        shutil.copyfileobj(shard, out, length=1 << 20)
+                    part.unlink()
 
 def main(args):
     WD = Path(args.wd).expanduser().resolve()
-    fasta_file = 'GB_GCA_021307345.1_protein.fna.gz
+    fasta_file = args.fasta
     mutation_rate_p = args.prate
 
     #get sequences from fasta file
     sequence_records = read_fasta_gz(fasta_file)
+    genes = [(gene_index, name, seq) for gene_index, (name, seq) in enumerate(sequence_records.items())]
+    chunks = [genes[start:start + args.genes_per_task] for start in range(0, len(genes), args.genes_per_task)]
 
     # Create 100 random mutated sequences
-    ITERATIONS = 100
+    ITERATIONS = args.iterations
 
-    for i in range(ITERATIONS):
-        #output files
-        POSITIVE_SELECTION_QUERIES_NT = open(f'{WD}/positive_selection_queries_{mutation_rate_p}_{i}.fna','w')
-        POSITIVE_SELECTION_QUERIES_PROTEIN = open(f'{WD}/positive_selection_translated_queries_{mutation_rate_p}_{i}.faa','w')
-        NEGATIVE_SELECTION_QUERIES_NT = open(f'{WD}/negative_selection_queries_{mutation_rate_p}_{i}.fna','w')
-        NEGATIVE_SELECTION_QUERIES_PROTEIN = open(f'{WD}/negative_selection_translated_queries_{mutation_rate_p}_{i}.faa','w')
-        #loop through sequences of reference genome
-        for name,ref_sequence in sequence_records.items():
-            #ref sequence is mutated with mutation rate p
-            query_positive_nt_seq = positive_selection_based_on_mutation_rate_p(ref_sequence,float(mutation_rate_p))
-            POSITIVE_SELECTION_QUERIES_NT.write(f'>positive_{mutation_rate_p}_{name}\n')
-            POSITIVE_SELECTION_QUERIES_NT.write(f'{query_positive_nt_seq}\n')
+    entropy = np.random.SeedSequence(args.seed).entropy
+    print(f'Seed entropy: {entropy} (pass --seed {entropy} to reproduce)')
 
-            #Translated mutated sequences 
-            translated_positive_queries = Seq(query_positive_nt_seq).translate()
-            POSITIVE_SELECTION_QUERIES_PROTEIN.write(f'>positive_{mutation_rate_p}_{name}\n')
-            POSITIVE_SELECTION_QUERIES_PROTEIN.write(f'{translated_positive_queries}\n')
+    shard_dir = WD / f'shards_{mutation_rate_p}'
+    shard_dir.mkdir(parents=True, exist_ok=True)
 
-            #ref sequence is mutated with mutation rate p
-            query_negative_nt_seq = negative_selection_based_on_mutation_rate_p(ref_sequence,float(mutation_rate_p))
-            NEGATIVE_SELECTION_QUERIES_NT.write(f'>negative_{mutation_rate_p}_{name}\n')
-            NEGATIVE_SELECTION_QUERIES_NT.write(f'{query_negative_nt_seq}\n')
+    tasks = [(shard_dir, entropy, mutation_rate_p, i, chunk, genes_in_chunk)
+             for i in range(ITERATIONS) for chunk, genes_in_chunk in enumerate(chunks)]
+    if args.workers > 1:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            for _ in pool.map(mutate_shard, tasks, chunksize=max(1, len(chunks) // args.workers)):
+                pass
+    else:
+        for task in tasks:
+            mutate_shard(task)
 
-            #Translated mutated sequences 
-            translated_negative_queries = Seq(query_negative_nt_seq).translate()
-            NEGATIVE_SELECTION_QUERIES_PROTEIN.write(f'>negative_{mutation_rate_p}_{name}\n')
-            NEGATIVE_SELECTION_QUERIES_PROTEIN.write(f'{translated_negative_queries}\n')
+    for i in range(ITERATIONS):
+        merge_shards(WD, shard_dir, mutation_rate_p, i, len(chunks))
+    shard_dir.rmdir()
 
 def parse_args():
     parser = argparse.ArgumentParser(
@@ -60,9 +105,39 @@ def parse_args():
         default=0.01,
         help="Mutation rate p in [0,1]."
     )
+    parser.add_argument(
+        "--fasta",
+        type=str,
+        default="GB_GCA_021307345.1_protein.fna.gz",
+        help="Gzipped FASTA of the reference genome's protein-coding genes."
+    )
+    parser.add_argument(
+        "--iterations",
+        type=int,
+        default=100,
+        help="Number of mutated genomes per selection (default: 100)."
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of worker processes. Output is identical for any worker count."
+    )
+    parser.add_argument(
+        "--genes_per_task",
+        type=int,
+        default=500,
+        help="Genes per (iteration, gene chunk) task and gzip shard (default: 500)."
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=None,
+        help="Root seed entropy; every gene gets its own stream spawned from it."
+    )
     args = parser.parse_args()
     return args
 
 if __name__ == "__main__":
     args = parse_args()
-    main(args)
\ No newline at end of file
+    main(args)
@@ -1,78 +1,110 @@
 import pandas as pd
 import argparse
-from simulate import get_coding_sequence_from_nucleotide_sequence, positive_selection_based_on_mutation_rate_p, negative_selection_based_on_mutation_rate_p
+from simulate import get_coding_sequence_from_nucleotide_sequence, positive_selection_based_on_mutation_rate_p, negative_selection_based_on_mutation_rate_p, encode_codon_array, mutate_replicates, translate_sequence
+from translation import translate_batch
 import random
-from Bio.Seq import Seq
+import numpy as np
 from pathlib import Path
 
 
-def main(args):
-    
-    WD = Path(args.wd).expanduser().resolve()
-    str_len = args.len #sequence length
-    mutation_rate_p = args.prate
+def write_records(handle, records):
+    """Writes (name, sequence) records to an open FASTA handle in a single call."""
+    handle.write(''.join(f'>{name}\n{sequence}\n' for name, sequence in records))
+
+def simulate_batched(WD, str_len, mutation_rate_p, REF_coding_sequence, ref_seq_translated, iterations, rng):
+    """Replicate-batched mode: the codon-encoded reference is mutated once into an
+    (iterations x n_codons) matrix per selection and every record is streamed out afterwards."""
+    mutated = mutate_replicates(encode_codon_array(REF_coding_sequence), float(mutation_rate_p), iterations, ('positive', 'negative'), rng)
+    seq_len = len(REF_coding_sequence)
+
+    for selection, matrix in zip(('positive', 'negative'), mutated):
+        queries = [row[:seq_len].tobytes().decode() for row in matrix.reshape(iterations, -1)]
+        names = [f'{selection}_{mutation_rate_p}_{i}' for i in range(iterations)]
 
-    #output files
-    RANDOM_REF = open(f'{WD}/ref_{str_len}.fna','w')
-    RANDOM_REF_PROT = open(f'{WD}/ref_translated_{str_len}.faa','w')
+        with open(f'{WD}/{selection}_selection_queries_{str_len}_{mutation_rate_p}.fna','w') as nt_out:
+            write_records(nt_out, [('ref_gene', REF_coding_sequence)] + list(zip(names, queries)))
 
+        with open(f'{WD}/{selection}_selection_translated_queries_{str_len}_{mutation_rate_p}.faa','w') as protein_out:
+            write_records(protein_out, [('ref_gene', ref_seq_translated)] + list(zip(names, translate_batch(queries))))
+
+def simulate_per_iteration(WD, str_len, mutation_rate_p, REF_coding_sequence, ref_seq_translated, iterations, vectorized, rng=None):
     POSITIVE_SELECTION_QUERIES_NT = open(f'{WD}/positive_selection_queries_{str_len}_{mutation_rate_p}.fna','w')
     POSITIVE_SELECTION_QUERIES_PROTEIN = open(f'{WD}/positive_selection_translated_queries_{str_len}_{mutation_rate_p}.faa','w')
 
     NEGATIVE_SELECTION_QUERIES_NT = open(f'{WD}/negative_selection_queries_{str_len}_{mutation_rate_p}.fna','w')
     NEGATIVE_SELECTION_QUERIES_PROTEIN = open(f'{WD}/negative_selection_translated_queries_{str_len}_{mutation_rate_p}.faa','w')
 
-    # Create 100 random mutated sequences
-    ITERATIONS = 100
-
-    #Create a random X nt long sequence for simulation
-    REF = ''.join(random.choices(['A', 'C', 'G', 'T'], k=str_len))
-
-    #Get coding sequence and filter stop codons
-    REF_coding_sequence = ''.join(get_coding_sequence_from_nucleotide_sequence(REF))
-
-    #Save nt ref sequence to the following files
-    RANDOM_REF.write(f'>ref_gene\n')
-    RANDOM_REF.write(f'{REF_coding_sequence}\n')
-
     POSITIVE_SELECTION_QUERIES_NT.write(f'>ref_gene\n')
     POSITIVE_SELECTION_QUERIES_NT.write(f'{REF_coding_sequence}\n')
 
     NEGATIVE_SELECTION_QUERIES_NT.write(f'>ref_gene\n')
     NEGATIVE_SELECTION_QUERIES_NT.write(f'{REF_coding_sequence}\n')
 
-    #save translated ref sequence to the following files
-    ref_seq_translated = Seq(REF_coding_sequence).translate()
-    RANDOM_REF_PROT.write(f'>ref_gene\n')
-    RANDOM_REF_PROT.write(str(ref_seq_translated)+"\n")
-
     POSITIVE_SELECTION_QUERIES_PROTEIN.write(f'>ref_gene\n')
     POSITIVE_SELECTION_QUERIES_PROTEIN.write(str(ref_seq_translated)+"\n")
 
     NEGATIVE_SELECTION_QUERIES_PROTEIN.write(f'>ref_gene\n')
     NEGATIVE_SELECTION_QUERIES_PROTEIN.write(str(ref_seq_translated)+"\n")
 
-    for i in range(ITERATIONS):
+    for i in range(iterations):
         #ref sequence is mutated with mutation rate p
-        query_positive_nt_seq = positive_selection_based_on_mutation_rate_p(REF_coding_sequence,float(mutation_rate_p))
+        query_positive_nt_seq = positive_selection_based_on_mutation_rate_p(REF_coding_sequence,float(mutation_rate_p),vectorized=vectorized,rng=rng)
         POSITIVE_SELECTION_QUERIES_NT.write(f'>positive_{mutation_rate_p}_{i}\n')
         POSITIVE_SELECTION_QUERIES_NT.write(f'{query_positive_nt_seq}\n')
 
-        #Translated mutated sequences 
-        translated_positive_queries = Seq(query_positive_nt_seq).translate()
+        #Translated mutated sequences
+        translated_positive_queries = translate_sequence(query_positive_nt_seq)
         POSITIVE_SELECTION_QUERIES_PROTEIN.write(f'>positive_{mutation_rate_p}_{i}\n')
         POSITIVE_SELECTION_QUERIES_PROTEIN.write(f'{translated_positive_queries}\n')
 
         #ref sequence is mutated with mutation rate p
-        query_negative_nt_seq = negative_selection_based_on_mutation_rate_p(REF_coding_sequence,float(mutation_rate_p))
+        query_negative_nt_seq = negative_selection_based_on_mutation_rate_p(REF_coding_sequence,float(mutation_rate_p),vectorized=vectorized,rng=rng)
         NEGATIVE_SELECTION_QUERIES_NT.write(f'>negative_{mutation_rate_p}_{i}\n')
         NEGATIVE_SELECTION_QUERIES_NT.write(f'{query_negative_nt_seq}\n')
 
-        #Translated mutated sequences 
-        translated_negative_queries = Seq(query_negative_nt_seq).translate()
+        #Translated mutated sequences
+        translated_negative_queries = translate_sequence(query_negative_nt_seq)
         NEGATIVE_SELECTION_QUERIES_PROTEIN.write(f'>negative_{mutation_rate_p}_{i}\n')
         NEGATIVE_SELECTION_QUERIES_PROTEIN.write(f'{translated_negative_queries}\n')
 
+    for handle in (POSITIVE_SELECTION_QUERIES_NT, POSITIVE_SELECTION_QUERIES_PROTEIN, NEGATIVE_SELECTION_QUERIES_NT, NEGATIVE_SELECTION_QUERIES_PROTEIN):
+        handle.close()
+
+def main(args):
+
+    WD = Path(args.wd).expanduser().resolve()
+
+    # Number of mutated queries per selection
+    ITERATIONS = args.replicates
+
+    #--seed makes a run reproducible: the reference and the NumPy engine draw from rng, the reference loop from random
+    rng = np.random.default_rng(args.seed)
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    #every --len gets one reference, shared by all --prate values
+    for str_len in args.len:
+        #Create a random X nt long sequence for simulation
+        REF = rng.choice(np.frombuffer(b'ACGT', dtype=np.uint8), size=str_len).tobytes().decode()
+
+        #Get coding sequence and filter stop codons
+        REF_coding_sequence = ''.join(get_coding_sequence_from_nucleotide_sequence(REF))
+        ref_seq_translated = translate_sequence(REF_coding_sequence)
+
+        #Save nt ref sequence and translated ref sequence to the following files
+        with open(f'{WD}/ref_{str_len}.fna','w') as RANDOM_REF:
+            RANDOM_REF.write(f'>ref_gene\n')
+            RANDOM_REF.write(f'{REF_coding_sequence}\n')
+        with open(f'{WD}/ref_translated_{str_len}.faa','w') as RANDOM_REF_PROT:
+            RANDOM_REF_PROT.write(f'>ref_gene\n')
+            RANDOM_REF_PROT.write(ref_seq_translated+"\n")
+
+        for mutation_rate_p in args.prate:
+            if args.batch:
+                simulate_batched(WD, str_len, mutation_rate_p, REF_coding_sequence, ref_seq_translated, ITERATIONS, rng)
+            else:
+                simulate_per_iteration(WD, str_len, mutation_rate_p, REF_coding_sequence, ref_seq_translated, ITERATIONS, args.vectorized, rng)
+
 
 
 def parse_args():
@@ -88,18 +120,42 @@ def parse_args():
     parser.add_argument(
         "--len",
         type=int,
-        default=10002,
-        help="Sequence length (positive integer)."
+        nargs="+",
+        default=[10002],
+        help="Sequence length (positive integer). Several lengths may be given to sweep a grid."
     )
     parser.add_argument(
         "--prate",
         type=float,
-        default=0.01,
-        help="Mutation rate p in [0,1]."
+        nargs="+",
+        default=[0.01],
+        help="Mutation rate p in [0,1]. Several rates may be given to sweep a grid."
+    )
+    parser.add_argument(
+        "--vectorized",
+        action="store_true",
+        help="Mutate with the NumPy batch engine instead of the per-character reference implementation."
+    )
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="Replicate-batched mode: mutate all replicates for positive and negative selection in one pass, then stream the records out."
+    )
+    parser.add_argument(
+        "--replicates",
+        type=int,
+        default=100,
+        help="Number of mutated queries per selection (default: 100)."
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=None,
+        help="Seed for the reference sequence and every mutation draw, for reproducible runs (default: unseeded)."
     )
     args = parser.parse_args()
     return args
 
 if __name__ == "__main__":
     args = parse_args()
-    main(args)
\ No newline at end of file
+    main(args)
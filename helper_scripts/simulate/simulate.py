@@ -1,51 +1,78 @@
 import pickle
+import csv
 import pandas as pd
-from Bio import SeqIO
-from Bio.Seq import Seq
 import os
-import gzip
+import sys
 import random
+import numpy as np
+import itertools
+from translation import translate, translate_batch
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from fasta_io import read_fasta, record_id, write_fasta
+from containment_index import containment_table, load_signatures, read_compare_labels
 
-def extract_containment_matrix(mat_csv):
-    #read in df
-    df = pd.read_csv(mat_csv,sep=',')
-    #record gene header into list
-    gene_name_header_list = df.T.index.to_list()
-    subset_number = int(len(gene_name_header_list)/2) #containment matrix produced by sourmash is not perfect square
-    subset = df.iloc[0:subset_number, 0:subset_number]
-    #make the gene header list into a column to set as index
-    subset['A'] = gene_name_header_list[:subset_number]
-    subset = subset.set_index('A').stack().reset_index().rename(columns={'level_1':'B',0:'containment'})
-    return(subset)
+def _matrix_rows(mat_path):
+    """Yields the header list, then one row of values at a time.
+    A .npy matrix written by sourmash compare -o is memory-mapped and its labels are read from <mat>.npy.labels.txt;
+    anything else is read as the compare --csv output, line by line."""
+    if str(mat_path).endswith('.npy'):
+        matrix = np.load(mat_path, mmap_mode='r')
+        yield read_compare_labels(mat_path)
+        yield from matrix
+    else:
+        with open(mat_path, newline='') as handle:
+            reader = csv.reader(handle)
+            yield next(reader)
+            for row in reader:
+                yield row
 
-def extract_axi_matrix(mat_csv,axi):
-    #read in df
-    df = pd.read_csv(mat_csv,sep=',')
-    #record gene header into list
-    gene_name_header_list = df.T.index.to_list()
-    subset_number = int(len(gene_name_header_list)/2) #containment matrix produced by sourmash is not perfect square
-    subset = df.iloc[0:subset_number, 0:subset_number]
-    #make the gene header list into a column to set as index
-    subset['A'] = gene_name_header_list[:subset_number]
-    subset = subset.set_index('A').stack().reset_index().rename(columns={'level_1':'B',0:f'{axi}'})
-    return(subset)
+def read_containment_matrix(mat_path, threshold=None, chunksize=None, value_name='containment'):
+    """Streams a sourmash compare matrix (CSV or .npy) into a long-form (A, B, value_name) table without
+    building the dense N x N DataFrame. Only the top-left block is kept, as the matrix produced by sourmash is
+    not a perfect square. Entries below threshold are dropped while reading (None keeps every entry).
+    chunksize: if given, returns an iterator of tables covering chunksize matrix rows each"""
+    chunks = _containment_chunks(mat_path, threshold, chunksize, value_name)
+    if chunksize is not None:
+        return(chunks)
+    tables = list(chunks)
+    if not tables:
+        return(pd.DataFrame({'A': pd.Series(dtype=object), 'B': pd.Series(dtype=object), value_name: pd.Series(dtype=float)}))
+    return(pd.concat(tables, ignore_index=True))
+
+def _containment_chunks(mat_path, threshold, chunksize, value_name):
+    rows = _matrix_rows(mat_path)
+    names = np.asarray(next(rows), dtype=object)
+    subset_number = int(len(names)/2) #containment matrix produced by sourmash is not perfect square
+    rows_per_chunk = chunksize or subset_number
+    a_idx, b_idx, values = [], [], []
+    for i, row in enumerate(itertools.islice(rows, subset_number)):
+        row_values = np.asarray(row[:subset_number], dtype=np.float64)
+        #stack() dropped missing entries, so NaN never passes
+        keep = ~np.isnan(row_values) if threshold is None else row_values >= threshold
+        cols = np.flatnonzero(keep)
+        a_idx.append(np.full(len(cols), i))
+        b_idx.append(cols)
+        values.append(row_values[cols])
+        if (i + 1) % rows_per_chunk == 0 or i + 1 == subset_number:
+            a, b = np.concatenate(a_idx), np.concatenate(b_idx)
+            yield pd.DataFrame({'A': names[a], 'B': names[b], value_name: np.concatenate(values)})
+            a_idx, b_idx, values = [], [], []
+
+def extract_containment_matrix(mat_csv, threshold=None):
+    return(read_containment_matrix(mat_csv, threshold))
+
+def extract_axi_matrix(mat_csv,axi,threshold=None):
+    return(read_containment_matrix(mat_csv, threshold, value_name=f'{axi}'))
 
 def extract_filename_without_extension(file_path):
     #return file_path.split('/')[-1].split('.')[0]
     return file_path.split('/')[-1].split('.')[0]
 
-def containments(mat_df,ksize,multiple):
+def containments(mat_df,ksize,multiple,threshold=None):
     """This function converts matrix into df removes pairwise information"""
     """When running sourmash compare, a matrix via a csv file is produced"""
-    #read in df
-    df = pd.read_csv(mat_df,sep=',')
-    #record gene header into list
-    gene_name_header_list = df.T.index.to_list()
-    subset_number = int(len(gene_name_header_list)/2) #containment matrix produced by sourmash is not perfect square
-    subset = df.iloc[0:subset_number, 0:subset_number]
-    #make the gene header list into a column to set as index
-    subset['A'] = gene_name_header_list[:subset_number]
-    subset = subset.set_index('A').stack().reset_index().rename(columns={'level_1':'B',0:'containment'})
+    #stream the matrix into (A, B, containment) rows
+    subset = read_containment_matrix(mat_df, threshold)
     if multiple=='yes':
         subset['A']=subset['A'].apply(extract_filename_without_extension)
         print('change A')
@@ -57,6 +84,18 @@ def containments(mat_df,ksize,multiple):
     subset['ksize']=ksize
     return(subset)
 
+def signature_containments(sig_paths,ksize,multiple,molecule,threshold=None):
+    """Same table as containments(), computed from the signatures instead of a sourmash compare matrix"""
+    """Only pairs sharing a hash are visited (helper_scripts/containment_index.py), so with a threshold memory no longer grows with N x N"""
+    #DNA signatures are sketched at 3k
+    names, sketches = load_signatures(sig_paths, ksize*3 if molecule=='dna' else ksize, molecule)
+    subset = containment_table(names, sketches, threshold)
+    if multiple=='yes':
+        subset['A']=subset['A'].apply(extract_filename_without_extension)
+        subset['B']=subset['B'].apply(extract_filename_without_extension)
+    subset['ksize']=ksize
+    return(subset)
+
 def divisible_by_3(sequence):
     #makes sure a sequence is divisible by 3 for translation
     if len(sequence) % 3 != 0:
@@ -67,18 +106,22 @@ def divisible_by_3(sequence):
     else:
         return(sequence)
 
-def translate_CDS(cds_fasta, out_name):
+def translate_sequence(sequence):
+    #drop-in for str(Seq(sequence).translate()), backed by the codon lookup table in translation.py
+    return(translate(sequence))
+
+def translate_CDS(cds_fasta, out_name, batch_size=10000):
     """User has input fasta file with CDS sequences of a genome"""
-    """This function translates each CDS found in the FASTA file"""
-    sequences = SeqIO.parse(open(cds_fasta),'fasta')
+    """This function translates each CDS found in the FASTA file, batch_size records per table lookup"""
+    sequences = read_fasta(cds_fasta)
     with open(f'{out_name}','w') as out_file:
-        for cds in sequences:
-            name, nt_seq = cds.id, str(cds.seq)
-            cds_seq = divisible_by_3(nt_seq)
-            aa_seq = str(Seq(cds_seq).translate())
-            out_file.write(''.join(['>',name,'\n']))
-            out_file.write(''.join([aa_seq,'\n']))
-        out_file.close()
+        while True:
+            batch = [(record_id(header), nt_seq) for header, nt_seq in itertools.islice(sequences, batch_size)]
+            if not batch:
+                break
+            #partial codons are padded with N, as divisible_by_3 does
+            aa_seqs = translate_batch([nt_seq for _, nt_seq in batch], pad_partial_codons=True)
+            write_fasta(out_file, zip([name for name, _ in batch], aa_seqs))
 
 def return_protein_klist_parameters(kmer_list):
     sm_klist = ',k='.join(kmer_list.split(','))
@@ -176,35 +219,101 @@ def negative_selection_outcome(codon,p_mutation_rate):
                 mutated_codon+=nt_position
     return(mutated_codon)
 
-def positive_selection_based_on_mutation_rate_p(sequence,p_mutation_rate):
+def positive_selection_based_on_mutation_rate_p(sequence,p_mutation_rate,vectorized=False,rng=None):
     """This function takes in a sequence to be mutated based on the mutation rate p, which is another argument of the function. 
     The function loops through each position of the sequence,
     decides whether the nucleotide at that position is mutated, 
-    and adds on to the newly mutated sequence, which will then be return in the end."""
+    and adds on to the newly mutated sequence, which will then be return in the end.
+    vectorized=True uses the NumPy batch engine (rng is an optional numpy Generator); the loop below is kept as the reference implementation."""
+    if vectorized:
+        return(selection_based_on_mutation_rate_p_vectorized(sequence, p_mutation_rate, 'positive', rng).decode())
     mutated_sequence = ''
     coding_sequence = get_coding_sequence(sequence)
     for codon in coding_sequence:
         mutated_sequence+=positive_selection_outcome(codon.upper(), p_mutation_rate)
     return(mutated_sequence.upper())
 
-def negative_selection_based_on_mutation_rate_p(sequence,p_mutation_rate):
+def negative_selection_based_on_mutation_rate_p(sequence,p_mutation_rate,vectorized=False,rng=None):
     """This function takes in a sequence to be mutated based on the mutation rate p, which is another argument of the function. 
     The function loops through each position of the sequence,
     decides whether the nucleotide at that position is mutated, 
-    and adds on to the newly mutated sequence, which will then be return in the end."""
+    and adds on to the newly mutated sequence, which will then be return in the end.
+    vectorized=True uses the NumPy batch engine (rng is an optional numpy Generator); the loop below is kept as the reference implementation."""
+    if vectorized:
+        return(selection_based_on_mutation_rate_p_vectorized(sequence, p_mutation_rate, 'negative', rng).decode())
     mutated_sequence = ''
     coding_sequence = get_coding_sequence(sequence)
     for codon in coding_sequence:
         mutated_sequence+=negative_selection_outcome(codon.upper(), p_mutation_rate)
     return(mutated_sequence.upper())
 
-# read in a fasta.gz format file
+#The following functions are a NumPy batch engine for the selection functions above.
+#A sequence is held as an uppercase ASCII uint8 array of shape (n_codons, 3); a trailing partial codon is padded with CODON_PAD.
+CODON_PAD = 0
+NUCLEOTIDES = b'AGCT'
+
+#nucleotide byte -> index into NUCLEOTIDES, 4 for anything else (N, gaps, padding)
+_NUCLEOTIDE_INDEX = np.full(256, 4, dtype=np.uint8)
+for _i, _nt in enumerate(NUCLEOTIDES):
+    _NUCLEOTIDE_INDEX[_nt] = _i
+    _NUCLEOTIDE_INDEX[ord(chr(_nt).lower())] = _i
+
+#row i holds the three substitutions for NUCLEOTIDES[i], in the order mutate_with_nucleotides returns them
+_SUBSTITUTIONS = np.array([[nt for nt in NUCLEOTIDES if nt != ref] for ref in NUCLEOTIDES], dtype=np.uint8)
+
+#codon positions that may mutate when a codon is not drawn into the "all positions" class
+SELECTION_POSITIONS = {'positive': np.array([True, True, False]),
+                       'negative': np.array([False, False, True])}
+
+def encode_codon_array(sequence):
+    """Returns the sequence (str or bytes) as an uppercase uint8 array of shape (n_codons, 3).
+    A trailing partial codon is padded with CODON_PAD, matching how get_coding_sequence keeps it."""
+    if isinstance(sequence, str):
+        sequence = sequence.encode('ascii')
+    sequence = sequence.upper()
+    n_codons = -(-len(sequence) // 3)
+    codons = np.full(n_codons * 3, CODON_PAD, dtype=np.uint8)
+    codons[:len(sequence)] = np.frombuffer(sequence, dtype=np.uint8)
+    return(codons.reshape(n_codons, 3))
+
+def decode_codon_array(codons):
+    """Returns the bytes of a (n_codons, 3) codon array with the padding removed."""
+    flat = codons.reshape(-1)
+    return(flat[flat != CODON_PAD].tobytes())
+
+def mutate_codon_array(codons, p_mutation_rate, selection, rng=None):
+    """Applies positive or negative selection to a codon array of shape (..., n_codons, 3) in bulk.
+    Per codon, a 1 in 3 draw decides whether every position may mutate, otherwise only the positions in SELECTION_POSITIONS[selection] may.
+    Each eligible position then mutates with probability p_mutation_rate to one of the other three nucleotides.
+    Leading dimensions are independent replicates. Positions that are not A, C, G or T are left unchanged.
+    selection may also be a boolean position mask broadcastable to codons.shape (see mutate_replicates)."""
+    rng = np.random.default_rng() if rng is None else rng
+    codon_shape = codons.shape[:-1]
+    all_positions = rng.integers(0, 3, size=codon_shape) == rng.integers(0, 3, size=codon_shape)
+    positions = SELECTION_POSITIONS[selection] if isinstance(selection, str) else selection
+    eligible = all_positions[..., None] | positions
+    nt_index = _NUCLEOTIDE_INDEX[codons]
+    mutate = eligible & (rng.random(codons.shape) <= p_mutation_rate) & (nt_index < 4)
+    mutated = codons.copy()
+    mutated[mutate] = _SUBSTITUTIONS[nt_index[mutate], rng.integers(0, 3, size=int(mutate.sum()))]
+    return(mutated)
+
+def mutate_replicates(codons, p_mutation_rate, n_replicates, selections=('positive', 'negative'), rng=None):
+    """Mutates one codon-encoded reference n_replicates times for every selection in a single pass.
+    Returns a uint8 array of shape (len(selections), n_replicates, n_codons, 3)."""
+    positions = np.stack([SELECTION_POSITIONS[selection] for selection in selections])[:, None, None, :]
+    replicates = np.broadcast_to(codons, (len(selections), n_replicates) + codons.shape)
+    return(mutate_codon_array(replicates, float(p_mutation_rate), positions, rng))
+
+def selection_based_on_mutation_rate_p_vectorized(sequence, p_mutation_rate, selection, rng=None):
+    """Vectorized counterpart of positive_/negative_selection_based_on_mutation_rate_p.
+    selection: 'positive' or 'negative'
+    Returns the mutated sequence as uppercase bytes."""
+    return(decode_codon_array(mutate_codon_array(encode_codon_array(sequence), float(p_mutation_rate), selection, rng)))
+
+# read in a fasta(.gz) file; plain, gzip and bgzip input are all streamed
 def read_fasta_gz(file_path):
-    sequences = {}
-    with gzip.open(file_path, "rt") as handle:
-        for record in SeqIO.parse(handle, "fasta"):
-            sequences[str(record.name)] = str(record.seq)
-    return(sequences)
+    return({record_id(header): sequence for header, sequence in read_fasta(file_path)})
 
 def get_coding_sequence(sequence):
     coding_seq = [sequence[i:i+3] for i in range(0, len(sequence), 3)]
@@ -0,0 +1,46 @@
+"""simulate.read_containment_matrix on real `sourmash compare` output, .npy and --csv alike."""
+
+import shutil
+import subprocess
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from simulate import read_containment_matrix
+
+pytestmark = pytest.mark.skipif(shutil.which("sourmash") is None, reason="needs the sourmash command")
+
+SEQUENCES = {
+    "a": "ACGTACGTTTGACCATTGACGGATCCAGTAC",
+    "b": "ACGTACGTTTGACGGATTGACGGATCCTTTT",
+    "c": "TTTTGGGGCCCCAAAATTTTGGGGCCCCAAA",
+}
+
+@pytest.fixture(scope="module")
+def compare_output(tmp_path_factory):
+    """A `sourmash compare --containment sigs sigs` run written with both -o and --csv, as the pipelines run it."""
+    tmp = tmp_path_factory.mktemp("compare")
+    fasta = tmp / "seqs.fna"
+    fasta.write_text("".join(f">{name}\n{seq}\n" for name, seq in SEQUENCES.items()))
+    sig = tmp / "seqs.sig"
+    run = dict(check=True, capture_output=True)
+    subprocess.run(["sourmash", "sketch", "dna", "-p", "k=5,scaled=1", "--singleton", str(fasta), "-o", str(sig)], **run)
+    subprocess.run(["sourmash", "compare", "--containment", str(sig), str(sig),
+                    "-o", str(tmp / "cmp.npy"), "--csv", str(tmp / "cmp.csv")], **run)
+    return tmp
+
+def test_npy_labels_are_read_from_sourmash_output(compare_output):
+    assert (compare_output / "cmp.npy.labels.txt").exists()
+    table = read_containment_matrix(compare_output / "cmp.npy")
+    assert list(table["A"].unique()) == list(SEQUENCES)
+    assert len(table) == len(SEQUENCES) ** 2
+
+@pytest.mark.parametrize("threshold", [None, 0.5])
+def test_npy_matches_csv(compare_output, threshold):
+    from_npy = read_containment_matrix(compare_output / "cmp.npy", threshold)
+    from_csv = read_containment_matrix(compare_output / "cmp.csv", threshold)
+    pd.testing.assert_frame_equal(from_npy, from_csv)
+    matrix = np.load(compare_output / "cmp.npy")[:3, :3]
+    expected = matrix.ravel() if threshold is None else matrix[matrix >= threshold]
+    np.testing.assert_array_equal(from_npy["containment"].to_numpy(), expected)
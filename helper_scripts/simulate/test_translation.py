@@ -0,0 +1,81 @@
+"""translation.py and the simulate.py wrappers against Biopython on random sequences."""
+
+import random
+
+import pytest
+from Bio.Data.CodonTable import TranslationError
+from Bio.Seq import Seq
+
+import simulate
+from translation import translate, translate_batch
+
+# every letter Biopython accepts in a codon (IUPAC, U, X, gap), in both cases, plus letters it rejects
+LETTERS = "ACGTURYSWKMBDHVNX-"
+ALPHABET = LETTERS + LETTERS.lower() + "EJZ.*"
+
+def biopython(sequence):
+    try:
+        return str(Seq(sequence).translate())
+    except TranslationError:
+        return TranslationError
+
+def ours(sequence):
+    try:
+        return translate(sequence)
+    except TranslationError:
+        return TranslationError
+
+def random_sequence(rng, letters, length):
+    return "".join(rng.choices(letters, k=length))
+
+@pytest.mark.filterwarnings("ignore::Bio.BiopythonWarning")
+def test_every_codon_matches_biopython():
+    for codon in (a + b + c for a in ALPHABET for b in ALPHABET for c in ALPHABET):
+        assert ours(codon) == biopython(codon), codon
+
+@pytest.mark.filterwarnings("ignore::Bio.BiopythonWarning")
+def test_random_sequences_match_biopython():
+    rng = random.Random(4)
+    for _ in range(3000):
+        # mostly ACGT with a sprinkling of ambiguity codes, X, gaps, lowercase and partial codons
+        letters = "ACGT" * 20 + ALPHABET
+        sequence = random_sequence(rng, letters, rng.randrange(0, 60))
+        assert ours(sequence) == biopython(sequence), sequence
+
+def test_batch_matches_single_translations():
+    rng = random.Random(5)
+    sequences = [random_sequence(rng, "ACGTNX", rng.randrange(0, 300)) for _ in range(200)]
+    sequences = [s for s in sequences if ours(s) is not TranslationError]
+    assert translate_batch(sequences) == [translate(s) for s in sequences]
+    assert translate_batch([s.encode() for s in sequences]) == [translate(s) for s in sequences]
+
+def test_translate_sequence_is_drop_in():
+    rng = random.Random(6)
+    for _ in range(500):
+        sequence = random_sequence(rng, "ACGT", 3 * rng.randrange(0, 100))
+        assert simulate.translate_sequence(sequence) == str(Seq(sequence).translate())
+
+def random_cds(rng, n_codons):
+    stops = {"TAA", "TAG", "TGA"}
+    sense = [a + b + c for a in "ACGT" for b in "ACGT" for c in "ACGT" if a + b + c not in stops]
+    return "ATG" + "".join(rng.choices(sense, k=n_codons)) + rng.choice(sorted(stops))
+
+def test_translate_cds_matches_biopython(tmp_path):
+    rng = random.Random(7)
+    cds = [random_cds(rng, rng.randrange(0, 200)) for _ in range(50)]
+    # partial codons and ambiguity codes go through divisible_by_3 and Seq.translate, as before batching
+    other = [random_sequence(rng, "ACGTRYN", rng.randrange(1, 200)) for _ in range(50)]
+    records = [(f"cds_{i}", s) for i, s in enumerate(cds)] + [(f"other_{i}", s) for i, s in enumerate(other)]
+    fasta = tmp_path / "cds.fna"
+    fasta.write_text("".join(f">{name} description\n{seq}\n" for name, seq in records))
+
+    simulate.translate_CDS(fasta, tmp_path / "cds.faa", batch_size=7)
+
+    lines = (tmp_path / "cds.faa").read_text().splitlines()
+    assert lines[0::2] == [f">{name}" for name, _ in records]
+    proteins = dict(zip((name for name, _ in records), lines[1::2]))
+    for name, seq in records:
+        assert proteins[name] == str(Seq(simulate.divisible_by_3(seq)).translate())
+    for i, seq in enumerate(cds):
+        # a complete CDS: the table translation is the validated cds=True one plus its stop
+        assert proteins[f"cds_{i}"] == str(Seq(seq).translate(cds=True)) + "*"
@@ -0,0 +1,67 @@
+"""Table-driven codon translation.
+
+Sequences are viewed as uint8 arrays, every nucleotide is mapped to a small code and each codon
+becomes one index into a flat lookup table. The 64 unambiguous codons plus every IUPAC ambiguity,
+the unknown base X and the gap codon '---' are resolved once, through Biopython, so the output is
+identical to str(Seq(sequence).translate()) with the standard table. Codons Biopython rejects
+raise TranslationError here too (see test_translation.py).
+"""
+
+import functools
+import itertools
+import numpy as np
+from Bio.Seq import Seq
+from Bio.Data.CodonTable import TranslationError
+
+#IUPAC nucleotides plus U, X and the gap character; anything else is invalid
+CODON_LETTERS = 'ACGTURYSWKMBDHVNX-'
+_N_CODES = len(CODON_LETTERS) + 1
+_INVALID = len(CODON_LETTERS)
+
+_NUCLEOTIDE_CODE = np.full(256, _INVALID, dtype=np.int16)
+for _code, _letter in enumerate(CODON_LETTERS):
+    _NUCLEOTIDE_CODE[ord(_letter)] = _code
+    _NUCLEOTIDE_CODE[ord(_letter.lower())] = _code
+
+@functools.lru_cache(maxsize=None)
+def codon_table():
+    """Returns the flat lookup table: codon index -> amino acid byte, 0 where Biopython raises."""
+    table = np.zeros(_N_CODES ** 3, dtype=np.uint8)
+    for (i, a), (j, b), (k, c) in itertools.product(enumerate(CODON_LETTERS), repeat=3):
+        try:
+            table[(i * _N_CODES + j) * _N_CODES + k] = ord(str(Seq(a + b + c).translate()))
+        except TranslationError:
+            pass
+    return table
+
+def _as_bytes(sequence):
+    return sequence.encode('ascii') if isinstance(sequence, str) else bytes(sequence)
+
+def translate_batch(sequences, pad_partial_codons=False):
+    """Translates many nucleotide sequences with a single table lookup.
+    sequences: iterable of str or bytes
+    pad_partial_codons: pad a trailing partial codon with N (as divisible_by_3 does) instead of dropping it
+    Returns a list of protein strings in input order."""
+    encoded = [_as_bytes(sequence) for sequence in sequences]
+    if pad_partial_codons:
+        encoded = [sequence + b'N' * (-len(sequence) % 3) for sequence in encoded]
+    else:
+        encoded = [sequence[:len(sequence) - len(sequence) % 3] for sequence in encoded]
+    if not encoded:
+        return []
+
+    codes = _NUCLEOTIDE_CODE[np.frombuffer(b''.join(encoded), dtype=np.uint8)].reshape(-1, 3)
+    index = (codes[:, 0] * _N_CODES + codes[:, 1]) * _N_CODES + codes[:, 2]
+    protein = codon_table()[index]
+    if not protein.all():
+        bad = int(np.flatnonzero(protein == 0)[0])
+        codon = b''.join(encoded)[bad * 3:bad * 3 + 3].decode('ascii', 'replace')
+        raise TranslationError(f"Codon '{codon}' is invalid")
+
+    protein = protein.tobytes().decode('ascii')
+    ends = np.cumsum([len(sequence) // 3 for sequence in encoded])
+    return [protein[start:end] for start, end in zip(np.concatenate(([0], ends[:-1])), ends)]
+
+def translate(sequence, pad_partial_codons=False):
+    """Translates one nucleotide sequence; see translate_batch."""
+    return translate_batch([sequence], pad_partial_codons)[0]
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Content-addressed FracMinHash signature cache.
+
+Signatures are keyed on (input file sha256, molecule, k, scaled) and stored as
+
+    <cache>/<molecule>/scaled<scaled>/k<k>/<sha256>.sig.gz
+
+so every run of a parameter sweep that reads the same genomes shares them, no
+matter where the inputs live or which working directory a run uses. A missing
+input is sketched for ALL requested k-sizes in a single read of the file.
+k is always the protein k-mer size; DNA signatures use 3k, as FMH dN/dS does.
+
+Cached signatures can be staged into a run's <wd>/signatures/ as
+<name>.<molecule>.sig.gzip (the layout return_signature_list() reads). Staged
+files are copies, not links: whether the external script_fmh_omega.py reuses
+signatures it finds there or re-sketches over them cannot be checked from this
+tree, and a tool writing through a link would overwrite the shared cache entry.
+A cache entry carries the name and path of whichever dataset row sketched it
+first, so every staged copy is renamed to its own row's name and path.
+
+    python3 sketch_cache.py --dataset dataset.csv --ksizes 7,9,11 --scaled 500 \
+        --cache /data/signature_cache --stage /data/run/signatures --ksize 7 --cores 32
+"""
+
+import argparse
+import csv
+import hashlib
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+HASH_INDEX = "file_hashes.tsv"
+
+def file_sha256(path, block_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def cached_sha256(cache, paths):
+    """
+    sha256 of every path, reusing <cache>/file_hashes.tsv for files whose size and
+    mtime are unchanged, so re-running the sweep does not re-read the inputs.
+    """
+    index_path = Path(cache) / HASH_INDEX
+    known = {}
+    if index_path.exists():
+        with open(index_path) as f:
+            for line in f:
+                path, size, mtime_ns, digest = line.rstrip("\n").split("\t")
+                known[path] = (int(size), int(mtime_ns), digest)
+    digests, changed = {}, False
+    for path in paths:
+        st = os.stat(path)
+        hit = known.get(path)
+        if hit and hit[:2] == (st.st_size, st.st_mtime_ns):
+            digests[path] = hit[2]
+        else:
+            digests[path] = file_sha256(path)
+            known[path] = (st.st_size, st.st_mtime_ns, digests[path])
+            changed = True
+    if changed:
+        index_path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile("w", dir=index_path.parent, delete=False) as tmp:
+            tmp.writelines(f"{p}\t{s}\t{m}\t{d}\n" for p, (s, m, d) in known.items())
+        os.replace(tmp.name, index_path)
+    return digests
+
+def cache_path(cache, digest, molecule, k, scaled):
+    return Path(cache) / molecule / f"scaled{scaled}" / f"k{k}" / f"{digest}.sig.gz"
+
+def sketch_all_ksizes(task):
+    """Worker: one pass over a FASTA producing a signature per k; each is written to its cache slot."""
+    import screed
+    from sourmash import sourmash_args
+    from sourmash.command_sketch import _signatures_for_sketch_factory, add_seq, set_sig_name
+
+    name, fasta, digest, molecule, ksizes, scaled, cache = task
+    dna_factor = 3 if molecule == "dna" else 1
+    # one param string per k: sourmash keeps only one k from a "k=..,k=.." string
+    params = [f"k={k * dna_factor},scaled={scaled}" for k in ksizes]
+    sigs = _signatures_for_sketch_factory(params, molecule)()
+    with screed.open(fasta) as records:
+        for record in records:
+            add_seq(sigs, record.sequence, molecule == "protein", False)
+    set_sig_name(sigs, fasta, name=name)
+
+    for sig in sigs:
+        k = sig.minhash.ksize // dna_factor if molecule == "dna" else sig.minhash.ksize
+        out = cache_path(cache, digest, molecule, k, scaled)
+        out.parent.mkdir(parents=True, exist_ok=True)
+        # write under a temporary name first so concurrent runs never see a partial file
+        tmp = out.with_name(f".{out.name}.{os.getpid()}.sig.gz")
+        with sourmash_args.SaveSignaturesToLocation(str(tmp)) as save_sig:
+            save_sig.add(sig)
+        os.replace(tmp, out)
+    return name, molecule
+
+def read_dataset(dataset_csv):
+    """[(name, genome_filename, protein_filename)] from a dataset.csv."""
+    with open(dataset_csv, newline="") as f:
+        return [(row["name"], row["genome_filename"], row["protein_filename"]) for row in csv.DictReader(f)]
+
+def populate(dataset_csv, ksizes, scaled, cache, cores=1):
+    """Sketch whatever is missing from the cache; returns {(name, molecule): (sha256, input path)}."""
+    rows = read_dataset(dataset_csv)
+    inputs = {(name, "dna"): dna for name, dna, _ in rows}
+    inputs.update({(name, "protein"): protein for name, _, protein in rows})
+    digests = cached_sha256(cache, sorted(set(inputs.values())))
+
+    tasks = []
+    for (name, molecule), fasta in inputs.items():
+        digest = digests[fasta]
+        missing = [k for k in ksizes if not cache_path(cache, digest, molecule, k, scaled).exists()]
+        if missing:
+            tasks.append((name, fasta, digest, molecule, missing, scaled, cache))
+
+    print(f"[cache] {len(inputs) - len(tasks)} of {len(inputs)} inputs cached for k={ksizes}, scaled={scaled}; sketching {len(tasks)}")
+    if tasks:
+        with ProcessPoolExecutor(max_workers=cores) as pool:
+            for _ in pool.map(sketch_all_ksizes, tasks, chunksize=max(1, len(tasks) // (4 * cores))):
+                pass
+    return {key: (digests[fasta], fasta) for key, fasta in inputs.items()}
+
+def stage(keys, k, scaled, cache, sig_dir):
+    """
+    Copy the cached k signatures into sig_dir as <name>.<molecule>.sig.gzip, named after their own
+    dataset row (copies keep the cache read-only to the run).
+    """
+    import sourmash
+    from sourmash import sourmash_args
+
+    sig_dir = Path(sig_dir)
+    sig_dir.mkdir(parents=True, exist_ok=True)
+    for (name, molecule), (digest, fasta) in keys.items():
+        staged = sig_dir / f"{name}.{molecule}.sig.gzip"
+        if staged.is_symlink() or staged.exists():
+            staged.unlink()
+        cached = cache_path(cache, digest, molecule, k, scaled)
+        sig, = sourmash.load_file_as_signatures(str(cached))
+        if (sig.name, sig.filename) == (name, fasta):
+            shutil.copyfile(cached, staged)
+            continue
+        with sig.update() as renamed:
+            renamed.name, renamed.filename = name, fasta
+            sig = renamed
+        # sourmash picks the format from the suffix and does not know .sig.gzip
+        tmp = staged.with_name(f".{name}.{molecule}.{os.getpid()}.sig.gz")
+        with sourmash_args.SaveSignaturesToLocation(str(tmp)) as save_sig:
+            save_sig.add(sig)
+        os.replace(tmp, staged)
+    print(f"[cache] staged {len(keys)} signatures for k={k} in {sig_dir}")
+
+def main():
+    ap = argparse.ArgumentParser(description="Populate and stage a content-addressed signature cache for the FMH dN/dS sweep.")
+    ap.add_argument("--dataset", required=True, help="dataset.csv with name,genome_filename,protein_filename")
+    ap.add_argument("--ksizes", required=True, help="Comma-separated protein k-sizes to sketch in one pass, e.g. 7,9,11")
+    ap.add_argument("--scaled", type=int, required=True)
+    ap.add_argument("--cache", required=True, help="Cache directory shared by all runs")
+    ap.add_argument("--cores", type=int, default=1)
+    ap.add_argument("--stage", default=None, help="Signature directory of a run to copy the --ksize signatures into")
+    ap.add_argument("--ksize", type=int, default=None, help="k-size to stage (required with --stage)")
+    args = ap.parse_args()
+
+    ksizes = [int(k) for k in args.ksizes.split(",")]
+    keys = populate(args.dataset, ksizes, args.scaled, args.cache, args.cores)
+    if args.stage:
+        if args.ksize not in ksizes:
+            raise SystemExit(f"--ksize {args.ksize} is not among --ksizes {ksizes}")
+        stage(keys, args.ksize, args.scaled, args.cache, args.stage)
+
+if __name__ == "__main__":
+    main()
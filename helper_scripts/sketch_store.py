@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Flat sketch store: every hash of a sketch collection in one uint64 array plus an
+offsets table, so worker processes share one copy of the hash data.
+
+    <store>/hashes.npy    uint64; sketch i is hashes[offsets[i]:offsets[i + 1]], sorted
+    <store>/offsets.npy   int64, len(labels) + 1 entries
+    <store>/labels.txt    one label per line
+    <store>/meta.json     ksize and molecule the sketches were selected with
+    <store>/<name>.npy    any further array kept with the sketches (e.g. a postings index)
+
+Opened with np.load(mmap_mode="r"), the arrays sit in the page cache once however
+many processes map them, and store[i] is a slice of the mapping (no copy).
+Pickling a store (e.g. handing it to a ProcessPoolExecutor) sends only its path,
+or the names of its shared-memory blocks, never the hashes.
+
+    store = build_store("/data/store_k21", sig_paths, ksize=21, molecule="dna")
+    store = SketchStore.open("/data/store_k21")        # in any process
+    hashes = store[i]
+    shared = store.to_shared_memory()                  # for stores with no file behind them
+    ...
+    shared.close()                                     # the creating process also frees the blocks
+
+or, from the shell,
+
+    python3 sketch_store.py --sigs sigs/*.sig.gzip --ksize 21 --molecule dna --out /data/store_k21
+"""
+
+import argparse
+import json
+import os
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+class SketchStore:
+    """
+    A sketch collection as one flat hash array; use open(), from_sketches() or to_shared_memory().
+    arrays holds "hashes" and "offsets" plus any array added with add_arrays() (e.g. an index
+    over the hashes), all of which are mapped, shared and pickled the same way.
+    """
+
+    def __init__(self, labels: List[str], arrays: Dict[str, np.ndarray], meta: Optional[Dict] = None,
+                 path: Optional[str] = None, blocks: Optional[Dict[str, shared_memory.SharedMemory]] = None,
+                 owner: bool = False):
+        self.labels = labels
+        self.arrays = arrays
+        self.meta = meta or {}
+        self.path = path
+        self._blocks = blocks or {}
+        self._owner = owner
+
+    @property
+    def hashes(self) -> np.ndarray:
+        return self.arrays["hashes"]
+
+    @property
+    def offsets(self) -> np.ndarray:
+        return self.arrays["offsets"]
+
+    @classmethod
+    def open(cls, path) -> "SketchStore":
+        """Memory-map a store written by write_store()."""
+        path = str(path)
+        arrays = {entry.name[:-4]: np.load(entry.path, mmap_mode="r")
+                  for entry in os.scandir(path) if entry.name.endswith(".npy")}
+        with open(os.path.join(path, "labels.txt")) as f:
+            labels = [line.rstrip("\n") for line in f]
+        meta = {}
+        if os.path.exists(os.path.join(path, "meta.json")):
+            with open(os.path.join(path, "meta.json")) as f:
+                meta = json.load(f)
+        return cls(labels, arrays, meta, path=path)
+
+    @classmethod
+    def from_sketches(cls, labels: Sequence[str], sketches: Sequence[np.ndarray], **meta) -> "SketchStore":
+        """An in-memory store of sorted uint64 sketches."""
+        sizes = np.array([len(s) for s in sketches], dtype=np.int64)
+        offsets = np.concatenate(([0], np.cumsum(sizes))).astype(np.int64)
+        hashes = np.concatenate(sketches).astype(np.uint64, copy=False) if len(sketches) else np.zeros(0, dtype=np.uint64)
+        return cls(list(labels), {"hashes": hashes, "offsets": offsets}, meta)
+
+    def add_arrays(self, **arrays: np.ndarray):
+        """Add arrays to the store; a store on disk writes them next to the hashes and maps them back."""
+        for name, array in arrays.items():
+            if self.path is not None:
+                np.save(os.path.join(self.path, f"{name}.npy"), array)
+                array = np.load(os.path.join(self.path, f"{name}.npy"), mmap_mode="r")
+            self.arrays[name] = array
+
+    def to_shared_memory(self) -> "SketchStore":
+        """
+        A copy of this store in multiprocessing.shared_memory blocks. This process owns them:
+        close() on the returned store frees them, so keep it open until the workers are done.
+        """
+        arrays, blocks = {}, {}
+        for name, src in self.arrays.items():
+            blocks[name] = shared_memory.SharedMemory(create=True, size=max(1, src.nbytes))
+            arrays[name] = np.ndarray(src.shape, dtype=src.dtype, buffer=blocks[name].buf)
+            arrays[name][...] = src
+        return SketchStore(self.labels, arrays, self.meta, blocks=blocks, owner=True)
+
+    @classmethod
+    def _attach(cls, labels, meta, specs):
+        arrays, blocks = {}, {}
+        for name, (block_name, shape, dtype) in specs.items():
+            # worker processes share the creator's resource tracker, so attaching adds no second
+            # owner: the blocks are freed once, by close() in the creating process
+            blocks[name] = shared_memory.SharedMemory(name=block_name)
+            arrays[name] = np.ndarray(shape, dtype=dtype, buffer=blocks[name].buf)
+        return cls(labels, arrays, meta, blocks=blocks)
+
+    def __reduce__(self):
+        if self.path is not None:
+            return (SketchStore.open, (self.path,))
+        if self._blocks:
+            specs = {name: (self._blocks[name].name, array.shape, array.dtype.str) for name, array in self.arrays.items()}
+            return (SketchStore._attach, (self.labels, self.meta, specs))
+        return (SketchStore, (self.labels, {name: np.asarray(a) for name, a in self.arrays.items()}, self.meta))
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def __getitem__(self, i: int) -> np.ndarray:
+        return self.hashes[self.offsets[i]:self.offsets[i + 1]]
+
+    def sizes(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    def sketches(self) -> List[np.ndarray]:
+        """Every sketch as a view into the flat array."""
+        return [self[i] for i in range(len(self))]
+
+    def close(self):
+        """Release the shared-memory blocks (and free them, in the process that created them)."""
+        # views must go before their buffers can be released
+        self.arrays = {}
+        for block in self._blocks.values():
+            block.close()
+            if self._owner:
+                block.unlink()
+        self._blocks = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def write_store(path, labels: Sequence[str], sketches: Sequence[np.ndarray], **meta) -> SketchStore:
+    """Write sorted uint64 sketches as a store directory and return it memory-mapped."""
+    store = SketchStore.from_sketches(labels, sketches, **meta)
+    os.makedirs(path, exist_ok=True)
+    # arrays derived from an earlier content of the directory no longer apply
+    for entry in os.scandir(path):
+        if entry.name.endswith(".npy"):
+            os.unlink(entry.path)
+    for name, array in store.arrays.items():
+        np.save(os.path.join(path, f"{name}.npy"), array)
+    with open(os.path.join(path, "labels.txt"), "w") as f:
+        f.writelines(f"{label}\n" for label in store.labels)
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        json.dump(store.meta, f)
+    return SketchStore.open(path)
+
+def build_store(path, sig_paths: Sequence[str], ksize: Optional[int] = None, molecule: Optional[str] = None) -> SketchStore:
+    """Store of the sketches of the given .sig files (see containment_index.load_signatures for the selection)."""
+    from containment_index import load_signatures
+
+    labels, sketches = load_signatures(sig_paths, ksize, molecule)
+    return write_store(path, labels, sketches, ksize=ksize, molecule=molecule)
+
+def main():
+    ap = argparse.ArgumentParser(description="Pack signatures into a flat, memory-mappable sketch store.")
+    ap.add_argument("--sigs", nargs="+", required=True, help="Signature files (.sig, .sig.gz, .sig.gzip)")
+    ap.add_argument("--ksize", type=int, default=None, help="k-mer size of the sketches to keep, in bases (DNA) or residues (protein)")
+    ap.add_argument("--molecule", default=None, help="dna or protein (default: any)")
+    ap.add_argument("--out", required=True, help="Store directory")
+    args = ap.parse_args()
+
+    store = build_store(args.out, args.sigs, args.ksize, args.molecule)
+    print(f"{len(store)} sketches, {len(store.hashes)} hashes -> {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""fmh_omega.py: the blocked kernel against a plain string sort of every pair, from matrices and sketch stores."""
+
+import shutil
+import subprocess
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import fmh_omega
+from fmh_omega import (OMEGA_COLUMNS, SITE_RATIO, MatrixPairs, StorePairs, above_threshold, omega_frames,
+                       omega_table, read_compare_matrix)
+from sketch_store import SketchStore
+
+# quotes change the repr order against the name order; repeated labels tie on "A,B"
+LABELS = [f"GCF_{k:03d}.1" for k in range(40)] + ["a b", "a", "a'", 'q"\'', "Z", "é", "b'", 'a"', "x", "x", "a", "x"]
+
+def reference(labels, dna_cfrac, aa_cfrac, ksize, threshold):
+    """Every pair i < j as a row, sorted by the "A,B" string (stable), as script_fmh_omega.py orders them."""
+    i, j = np.triu_indices(len(labels), k=1)
+    dna, aa = dna_cfrac[i, j], aa_cfrac[i, j]
+    keep = above_threshold(dna, aa, threshold)
+    i, j, dna, aa = i[keep], j[keep], dna[keep], aa[keep]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        aai, ani = aa ** (1.0 / ksize), dna ** (1.0 / (3 * ksize))
+        ratio = (1.0 - aai) / (aai - ani ** 3)
+    names = np.asarray(labels, dtype=object)
+    df = pd.DataFrame({
+        "A,B": [str(tuple(sorted(pair))) for pair in zip(names[i], names[j])],
+        "A": names[i], "B": names[j], "DNA_max_Cfrac": dna, "AA_max_Cfrac": aa, "ksize": ksize,
+        "PdN": 1.0 - aai, "PdS": aai - ani ** 3, "PdN/PdS": ratio, "dN/dS": ratio * SITE_RATIO,
+        "ANI_approx": ani, "AAI_approx": aai,
+    }, columns=OMEGA_COLUMNS)
+    return df.sort_values("A,B", kind="stable").reset_index(drop=True)
+
+def symmetric(rng, n):
+    m = rng.random((n, n)) ** 3
+    return np.maximum(m, m.T)
+
+@pytest.mark.parametrize("threshold", [0.0, 0.05, 0.5])
+@pytest.mark.parametrize("block_pairs", [1, 60, 1 << 22])
+def test_matrix_matches_string_sort(threshold, block_pairs, monkeypatch):
+    monkeypatch.setattr(fmh_omega, "BLOCK_PAIRS", block_pairs)
+    rng = np.random.default_rng(0)
+    labels = [LABELS[k] for k in rng.permutation(len(LABELS))]
+    dna, aa = symmetric(rng, len(labels)), symmetric(rng, len(labels))
+    dna[3, 5] = dna[5, 3] = np.nan
+    expected = reference(labels, dna, aa, 5, threshold)
+    pd.testing.assert_frame_equal(omega_table(labels, dna, aa, 5, threshold), expected)
+
+def test_frames_are_chunks_of_the_table():
+    rng = np.random.default_rng(1)
+    n = len(LABELS)
+    dna, aa = MatrixPairs(LABELS, symmetric(rng, n)), MatrixPairs(LABELS, symmetric(rng, n))
+    frames = list(omega_frames(dna, aa, 7, 0.1, chunksize=37))
+    assert max(len(frame) for frame in frames) <= 37
+    pd.testing.assert_frame_equal(pd.concat(frames, ignore_index=True), omega_table(LABELS, dna.matrix, aa.matrix, 7, 0.1))
+
+def random_sketches(rng, n):
+    """Sketches drawn from a small hash pool so that many pairs share hashes and some share none."""
+    pool = np.unique(rng.integers(0, 2**63, 400, dtype=np.uint64))
+    return [np.unique(rng.choice(pool, rng.integers(0, 60))) for _ in range(n)]
+
+def store_cfrac(sketches):
+    """Max containment matrix |A & B| / min(|A|, |B|) of the sketches, 0 where they share nothing."""
+    n = len(sketches)
+    cfrac = np.zeros((n, n))
+    for a in range(n):
+        for b in range(n):
+            shared = len(np.intersect1d(sketches[a], sketches[b]))
+            if shared:
+                cfrac[a, b] = shared / min(len(sketches[a]), len(sketches[b]))
+    return cfrac
+
+@pytest.mark.parametrize("threshold", [0.0, 0.1, 0.3])
+def test_store_matches_matrix(threshold):
+    rng = np.random.default_rng(2)
+    n = len(LABELS)
+    dna, aa = random_sketches(rng, n), random_sketches(rng, n)
+    expected = reference(LABELS, store_cfrac(dna), store_cfrac(aa), 7, threshold)
+    sources = [StorePairs(SketchStore.from_sketches(LABELS, sketches), threshold or None) for sketches in (dna, aa)]
+    got = pd.concat(list(omega_frames(*sources, 7, threshold)), ignore_index=True)
+    pd.testing.assert_frame_equal(got, expected)
+
+def test_store_protein_in_another_order():
+    rng = np.random.default_rng(3)
+    labels = [f"g{k}" for k in range(30)]
+    dna, aa = random_sketches(rng, 30), random_sketches(rng, 30)
+    expected = reference(labels, store_cfrac(dna), store_cfrac(aa), 7, 0.0)
+    shuffled = rng.permutation(30)
+    sources = (StorePairs(SketchStore.from_sketches(labels, dna)),
+               StorePairs(SketchStore.from_sketches([labels[k] for k in shuffled], [aa[k] for k in shuffled])))
+    got = pd.concat(list(omega_frames(*sources, 7)), ignore_index=True)
+    pd.testing.assert_frame_equal(got, expected)
+
+def test_empty():
+    table = omega_table(["a"], np.ones((1, 1)), np.ones((1, 1)), 5)
+    assert list(table.columns) == OMEGA_COLUMNS and len(table) == 0
+
+@pytest.mark.skipif(shutil.which("sourmash") is None, reason="needs the sourmash command")
+def test_reads_sourmash_compare_output(tmp_path):
+    """`sourmash compare -o x.npy` writes its labels to x.npy.labels.txt; the .npy and --csv outputs read alike."""
+    fasta = tmp_path / "seqs.fna"
+    fasta.write_text(">a\nACGTACGTTTGACCATTGACGG\n>b\nACGTACGTTTGACGGATTGACG\n>c\nTTTTGGGGCCCCAAAATTTTGG\n")
+    run = dict(check=True, capture_output=True)
+    for moltype in ("dna", "translate"):
+        sig = tmp_path / f"{moltype}.sig"
+        subprocess.run(["sourmash", "sketch", moltype, "-p", "k=3,scaled=1", "--singleton", str(fasta), "-o", str(sig)], **run)
+        subprocess.run(["sourmash", "compare", "--containment", str(sig), str(sig),
+                        "-o", str(tmp_path / f"{moltype}.npy"), "--csv", str(tmp_path / f"{moltype}.csv")], **run)
+    labels, matrix = read_compare_matrix(tmp_path / "dna.npy")
+    csv_labels, csv_matrix = read_compare_matrix(tmp_path / "dna.csv")
+    assert labels == csv_labels == ["a", "b", "c"]
+    np.testing.assert_array_equal(matrix, csv_matrix)
+    pd.testing.assert_frame_equal(fmh_omega.fmh_omega(tmp_path / "dna.npy", tmp_path / "translate.npy", 3),
+                                  fmh_omega.fmh_omega(tmp_path / "dna.csv", tmp_path / "translate.csv", 3))
@@ -0,0 +1,63 @@
+"""fmh_sketch.py against sourmash's own sketching, record by record."""
+
+import random
+import warnings
+
+import pytest
+
+import fmh_sketch
+from fmh_sketch import check_against_sourmash, sketch_sequence
+
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore")
+    from sourmash.command_sketch import _signatures_for_sketch_factory, add_seq
+
+# upper and lower case, with N and the other IUPAC codes that sourmash skips k-mers over
+DNA_LETTERS = "ACGTacgtNnRYKMSWBDHVrykmswbdhv"
+DNA_WEIGHTS = [10] * 8 + [1] * 22
+PROTEIN_LETTERS = "ACDEFGHIKLMNPQRSTVWYXBZ*acdefghiklmnpqrstvwyxbz"
+
+def sourmash_hashes(sequence, moltype, ksize, scaled):
+    sigs = _signatures_for_sketch_factory([f"k={ksize},scaled={scaled}"], moltype)()
+    add_seq(sigs, sequence, moltype == "protein", False)
+    return set(next(iter(sigs)).minhash.hashes)
+
+@pytest.mark.parametrize("ksize", [3, 7, 21, 31])
+@pytest.mark.parametrize("scaled", [1, 3])
+def test_dna_matches_sourmash(ksize, scaled):
+    rng = random.Random(ksize * 10 + scaled)
+    for _ in range(200):
+        sequence = "".join(rng.choices(DNA_LETTERS, DNA_WEIGHTS, k=rng.randint(0, 120)))
+        ours = sketch_sequence(sequence.encode(), "dna", ksize, scaled)
+        assert set(ours.tolist()) == sourmash_hashes(sequence, "dna", ksize, scaled), sequence
+
+@pytest.mark.parametrize("ksize", [3, 7, 10])
+@pytest.mark.parametrize("scaled", [1, 3])
+def test_protein_matches_sourmash(ksize, scaled):
+    rng = random.Random(ksize * 10 + scaled)
+    for _ in range(200):
+        sequence = "".join(rng.choices(PROTEIN_LETTERS, k=rng.randint(0, 80)))
+        ours = sketch_sequence(sequence.encode(), "protein", ksize, scaled)
+        assert set(ours.tolist()) == sourmash_hashes(sequence, "protein", ksize, scaled), sequence
+
+def test_lowercase_is_uppercase():
+    assert sketch_sequence(b"acgtnacgtaa", "dna", 3, 1).tolist() == sketch_sequence(b"ACGTNACGTAA", "dna", 3, 1).tolist()
+    assert sketch_sequence(b"mkvlaw", "protein", 3, 1).tolist() == sketch_sequence(b"MKVLAW", "protein", 3, 1).tolist()
+
+def write_fasta(path, records):
+    path.write_text("".join(f">r{i}\n{sequence}\n" for i, sequence in enumerate(records)))
+    return path
+
+def test_check_against_sourmash(tmp_path):
+    rng = random.Random(0)
+    dna = ["".join(rng.choices(DNA_LETTERS, DNA_WEIGHTS, k=rng.randint(0, 300))) for _ in range(20)]
+    protein = ["".join(rng.choices(PROTEIN_LETTERS, k=rng.randint(0, 100))) for _ in range(20)]
+    assert check_against_sourmash(write_fasta(tmp_path / "cds.fna", dna), "dna", 7, 1) == []
+    assert check_against_sourmash(write_fasta(tmp_path / "cds.faa", protein), "protein", 5, 1) == []
+
+def test_check_against_sourmash_record_count(tmp_path, monkeypatch):
+    fasta = write_fasta(tmp_path / "cds.fna", ["ACGTACGTAC", "GGGTTTAAAC"])
+    sketch_fasta = fmh_sketch.sketch_fasta
+    monkeypatch.setattr(fmh_sketch, "sketch_fasta", lambda *args: sketch_fasta(*args)[:1])
+    with pytest.raises(ValueError, match="read 1 records, sourmash read 2"):
+        check_against_sourmash(fasta, "dna", 3, 1)
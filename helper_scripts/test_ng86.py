@@ -0,0 +1,85 @@
+"""ng86.py: pinned codon tables, and Ka/Ks against Biopython where both count the same pathways."""
+
+import itertools
+import random
+import warnings
+
+import numpy as np
+import pytest
+
+from ng86 import BASES, INVALID, codon_indices, codon_tables, ng86_batch
+
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore")
+    from Bio.codonalign.codonseq import CodonSeq, _count_diff_NG86, _count_site_NG86, cal_dn_ds
+from Bio.Data.CodonTable import standard_dna_table
+
+CODONS = ["".join(c) for c in itertools.product(BASES, repeat=3)]
+INDEX = {c: i for i, c in enumerate(CODONS)}
+STOPS = set(standard_dna_table.stop_codons)
+SENSE = [c for c in CODONS if c not in STOPS]
+
+def through_stop(c1, c2):
+    """Whether some mutational pathway from c1 to c2 passes through a stop codon."""
+    diff = [p for p in range(3) if c1[p] != c2[p]]
+    for order in itertools.permutations(diff):
+        codon = c1
+        for p in order[:-1]:
+            codon = codon[:p] + c2[p] + codon[p + 1:]
+            if codon in STOPS:
+                return True
+    return False
+
+def test_pinned_table_values():
+    sense, s_sites, sd, nd = codon_tables()
+    assert sense.sum() == 61 and not sense[INVALID]
+    assert s_sites[INDEX["ATG"]] == 0
+    assert s_sites[INDEX["TTA"]] == pytest.approx(2 / 3)
+    assert s_sites[INDEX["CTG"]] == pytest.approx(4 / 3)
+    assert s_sites[INDEX["TAA"]] == 0
+    # TTA -> TCG: no pathway meets a stop, one synonymous and one non-synonymous step either way
+    assert (sd[INDEX["TTA"], INDEX["TCG"]], nd[INDEX["TTA"], INDEX["TCG"]]) == (1, 1)
+    # CGA -> TGG: the pathway through TGA is skipped (KaKs_Calculator convention), Biopython averages it in
+    assert (sd[INDEX["CGA"], INDEX["TGG"]], nd[INDEX["CGA"], INDEX["TGG"]]) == (1, 1)
+    assert (sd[INDEX["AAA"], INDEX["TTT"]], nd[INDEX["AAA"], INDEX["TTT"]]) == pytest.approx((0.25, 2.75))
+    # whole-table totals, so any change to the tables shows up here
+    assert s_sites.sum() == pytest.approx(134 / 3)
+    assert sd.sum() == pytest.approx(6350 / 3)
+    assert nd.sum() == pytest.approx(18730 / 3)
+
+def test_tables_match_biopython_without_stop_pathways():
+    _, s_sites, sd, nd = codon_tables()
+    for c in SENSE:
+        assert s_sites[INDEX[c]] == pytest.approx(_count_site_NG86([c], standard_dna_table)[0])
+    for c1, c2 in itertools.permutations(SENSE, 2):
+        if not through_stop(c1, c2):
+            expected = _count_diff_NG86(c1, c2, standard_dna_table)
+            assert (sd[INDEX[c1], INDEX[c2]], nd[INDEX[c1], INDEX[c2]]) == pytest.approx(expected), (c1, c2)
+
+def test_ka_ks_match_biopython_on_stop_free_pathways():
+    rng = random.Random(14)
+    reachable = {c1: [c2 for c2 in SENSE if c2 != c1 and not through_stop(c1, c2)] for c1 in SENSE}
+    pairs = []
+    for k in range(200):
+        first = [rng.choice(SENSE) for _ in range(100)]
+        second = [rng.choice(reachable[c]) if rng.random() < 0.2 else c for c in first]
+        pairs.append((f"pair{k}", "".join(first), "".join(second)))
+    compared = 0
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        for row, (_, seq_a, seq_b) in zip(ng86_batch(pairs), pairs):
+            dn, ds = cal_dn_ds(CodonSeq(seq_a), CodonSeq(seq_b), method="NG86")
+            # Biopython reports 0 without substitutions and -1 past p = 3/4 where the .kaks output has NA
+            for ours, theirs in ((row["Ka"], dn), (row["Ks"], ds)):
+                if theirs > 0:
+                    assert ours == pytest.approx(theirs, rel=1e-9)
+                    compared += 1
+                else:
+                    assert np.isnan(ours)
+    assert compared > 300
+
+def test_gaps_ambiguity_and_stops_are_not_compared():
+    idx = codon_indices("ATG---NNNTAAATGAC")
+    assert list(idx) == [INDEX["ATG"], INVALID, INVALID, INVALID, INDEX["ATG"]]
+    row, = ng86_batch([("p", "ATG---TTATAA", "ATGAAATCGTAA")])
+    assert row["Length"] == 6
@@ -0,0 +1,21 @@
+"""sketch_cache.py: rows sharing one cached sketch are each staged under their own name and path."""
+
+import sourmash
+
+from sketch_cache import populate, stage
+
+def test_identical_inputs_staged_under_their_own_names(tmp_path):
+    records = {"g.fna": ">r1\nACGTACGTTTGACCATTGACGGATCC\n", "g.faa": ">r1\nMKVLAWQ\n"}
+    for copy in ("a", "b"):
+        for suffix, text in records.items():
+            (tmp_path / f"{copy}{suffix}").write_text(text)
+    dataset = tmp_path / "dataset.csv"
+    dataset.write_text("name,genome_filename,protein_filename\n"
+                       + "".join(f"{name},{tmp_path}/{name}g.fna,{tmp_path}/{name}g.faa\n" for name in "ab"))
+    keys = populate(dataset, [3], 1, tmp_path / "cache")
+    assert len({digest for digest, _ in keys.values()}) == 2
+    stage(keys, 3, 1, tmp_path / "cache", tmp_path / "signatures")
+    for name in "ab":
+        for molecule, suffix in (("dna", "g.fna"), ("protein", "g.faa")):
+            sig, = sourmash.load_file_as_signatures(str(tmp_path / "signatures" / f"{name}.{molecule}.sig.gzip"))
+            assert (sig.name, sig.filename) == (name, f"{tmp_path}/{name}{suffix}")
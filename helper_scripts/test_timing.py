@@ -0,0 +1,13 @@
+"""timing.read_stage_profiles on logs mixing pipeline stages with events it has no row for."""
+
+from timing import EventLog, read_stage_profiles, stage_profile
+
+def test_events_without_ksize_or_threshold_are_skipped(tmp_path):
+    path = str(tmp_path / "profile.jsonl")
+    with EventLog(path) as log:
+        for fields in ({"ksize": "7", "threshold": "0.05"}, {"ksize": "7", "threshold": "0.05"},
+                       {"threshold": "0.05"}, {"ksize": "9"}, {"ksize": "", "threshold": "0.1"}, {"sample": "x"}):
+            with stage_profile("omega", log, **fields):
+                pass
+    table = read_stage_profiles([path])
+    assert table[["Step", "ksize", "t_threshold"]].values.tolist() == [["dN/dS Estimation", 7, 0.05]]
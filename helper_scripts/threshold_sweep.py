@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Derive the omega tables of higher containment thresholds from one run at the lowest.
+
+A run at threshold t keeps exactly the pairs whose DNA and protein max containment
+are both >= t, and nothing else in a row depends on t. So for one k-size the
+all-vs-all comparison and omega only need computing at the smallest threshold of a
+sweep (0.02 for GTDB); every larger threshold is a row filter of that table:
+
+    python3 threshold_sweep.py --input /data/..._0.02threshold_k7/fmh_omega_7.csv \
+        --base_threshold 0.02 --thresholds 0.05,0.1,0.2 \
+        --output '/data/gtdb_protein_rep_pairwise_500scale_{threshold}threshold_k7/fmh_omega_7.csv'
+
+The table is read once, in chunks, for all thresholds. Kept rows are copied byte for
+byte from the input, so a derived table matches what a direct run would have written.
+"""
+
+import argparse
+import itertools
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from fmh_omega import above_threshold
+
+CFRAC_COLUMNS = ("DNA_max_Cfrac", "AA_max_Cfrac")
+
+def sweep(input_csv, outputs, chunksize=1_000_000):
+    """
+    Write every {output path: threshold} of outputs from input_csv in one pass.
+    Returns {output path: rows written}.
+    """
+    counts = dict.fromkeys(outputs, 0)
+    tmps = {}
+    try:
+        for out in outputs:
+            os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+            tmps[out] = tempfile.NamedTemporaryFile("w", dir=os.path.dirname(os.path.abspath(out)), delete=False, newline="")
+        with open(input_csv, newline="") as src:
+            header = src.readline()
+            for tmp in tmps.values():
+                tmp.write(header)
+            chunks = pd.read_csv(input_csv, usecols=list(CFRAC_COLUMNS), chunksize=chunksize,
+                                 float_precision="round_trip", skip_blank_lines=False)
+            for chunk in chunks:
+                lines = list(itertools.islice(src, len(chunk)))
+                if len(lines) != len(chunk):
+                    raise ValueError(f"{input_csv}: rows span several lines, cannot copy them verbatim")
+                dna, aa = (chunk[c].to_numpy(dtype=np.float64) for c in CFRAC_COLUMNS)
+                for out, threshold in outputs.items():
+                    keep = np.flatnonzero(above_threshold(dna, aa, threshold))
+                    tmps[out].writelines(lines[i] for i in keep)
+                    counts[out] += len(keep)
+        for out, tmp in tmps.items():
+            tmp.close()
+            os.replace(tmp.name, out)
+    finally:
+        for tmp in tmps.values():
+            if not tmp.closed:
+                tmp.close()
+            if os.path.exists(tmp.name):
+                os.unlink(tmp.name)
+    return counts
+
+def main():
+    ap = argparse.ArgumentParser(description="Filter an omega table computed at the lowest threshold into the tables of higher thresholds.")
+    ap.add_argument("--input", required=True, help="fmh_omega_<k>.csv of the lowest-threshold run")
+    ap.add_argument("--base_threshold", required=True, type=float, help="Threshold the input was computed at")
+    ap.add_argument("--thresholds", required=True, help="Comma-separated thresholds to derive (each >= --base_threshold)")
+    ap.add_argument("--output", required=True, help="Output path; {threshold} is replaced by each threshold as written in --thresholds")
+    ap.add_argument("--chunksize", type=int, default=1_000_000, help="Rows per chunk (default: 1000000)")
+    args = ap.parse_args()
+
+    thresholds = [t.strip() for t in args.thresholds.split(",") if t.strip()]
+    if len(thresholds) > 1 and "{threshold}" not in args.output:
+        ap.error("--output needs a {threshold} placeholder when deriving several thresholds")
+    outputs = {}
+    for t in thresholds:
+        if float(t) < args.base_threshold:
+            ap.error(f"threshold {t} is below the input's {args.base_threshold}: pairs under {args.base_threshold} were never computed")
+        outputs[args.output.format(threshold=t)] = float(t)
+
+    if not os.path.exists(args.input):
+        raise SystemExit(f"Missing {args.input}: run the threshold {args.base_threshold} configuration first")
+    for out, n in sweep(args.input, outputs, args.chunksize).items():
+        print(f"threshold {outputs[out]}: {n} pairs -> {out}")
+
+if __name__ == "__main__":
+    main()
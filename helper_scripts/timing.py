@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Timing spans shared by the scalability pipelines, so every stage (sketch,
+compare, fmh_omega, align, axt, kaks) is measured the same way and lands in one
+JSONL event stream that merge_timings.py / time_summary.py read directly.
+Whole stages are wrapped once more as "profile" events, which also record the
+growth of their output directory; the resource figures read those.
+
+    from timing import EventLog, span
+    events = EventLog(args.events)            # None: measure but write nothing
+    with span("align", events, sample="5", path=str(aln_out)) as ev:
+        run_clustalw(...)
+    print(ev["wall_sec"])
+
+Each event is one JSON line: stage, the caller's fields, then
+    start        epoch seconds at entry
+    wall_sec     perf_counter time inside the span
+    user_sec     user CPU of this process and its waited-for children
+    sys_sec      system CPU, same scope
+    peak_rss_kb  high-water RSS of this process / its largest child so far
+    io_read_bytes, io_write_bytes      bytes through read/write calls (rchar/wchar)
+    disk_read_bytes, disk_write_bytes  bytes that reached storage (read_bytes/write_bytes)
+    status       "ok", or "error" with the exception text in "error"
+and, for span(..., out_dir=d), out_dir, out_dir_bytes (its size at exit) and
+out_dir_added_bytes (growth during the span, including anything else writing
+there meanwhile). The I/O counters come from
+/proc/self/io, which includes waited-for children; they are absent off Linux.
+
+    with stage_profile("align", events, out_dir=out_base):
+        ...every pair...
+
+or, from a shell driver, python3 timing.py --step omega --events LOG --out_dir DIR -- cmd ...
+
+getrusage is per process, so with several spans open at once (--jobs > 1 on
+threads) their CPU figures overlap; wall time is always per span. Processes of a
+pool measure their own spans and hand the event back for the parent to write.
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterable, Iterator, List, Optional
+
+IO_FIELDS = {"rchar": "io_read_bytes", "wchar": "io_write_bytes",
+             "read_bytes": "disk_read_bytes", "write_bytes": "disk_write_bytes"}
+MEASURES = ("start", "wall_sec", "user_sec", "sys_sec", "peak_rss_kb", "status", "error", "pid",
+            "out_dir_bytes", "out_dir_added_bytes") + tuple(IO_FIELDS.values())
+
+# ru_maxrss is bytes on macOS, KiB on Linux
+_RSS_TO_KB = 1 / 1024 if sys.platform == "darwin" else 1
+
+def _usage():
+    me, kids = resource.getrusage(resource.RUSAGE_SELF), resource.getrusage(resource.RUSAGE_CHILDREN)
+    return (me.ru_utime + kids.ru_utime, me.ru_stime + kids.ru_stime,
+            max(me.ru_maxrss, kids.ru_maxrss) * _RSS_TO_KB)
+
+def _io_counters() -> dict:
+    """This process's /proc/self/io counters (children included once waited for); {} where unavailable."""
+    try:
+        with open("/proc/self/io") as f:
+            counters = dict(line.split(":") for line in f if ":" in line)
+    except OSError:
+        return {}
+    return {name: int(counters[key]) for key, name in IO_FIELDS.items() if key in counters}
+
+def dir_size(path) -> int:
+    """Bytes of the regular files under path; symlinks are not followed, so staged links cost nothing."""
+    total = 0
+    stack = [str(path)]
+    while stack:
+        try:
+            entries = os.scandir(stack.pop())
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        total += entry.stat(follow_symlinks=False).st_size
+                except OSError:
+                    pass
+    return total
+
+def _plain(value):
+    """JSON fallback: NumPy scalars (task-table fields) as their Python value, anything else as text."""
+    return value.item() if hasattr(value, "item") else str(value)
+
+class EventLog:
+    """
+    Appends events to a JSONL file, one write per line so concurrent writers
+    (threads, or separate jobs sharing the file) never interleave within a line.
+    """
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self.fd = None
+        self.lock = threading.Lock()
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self.fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+
+    def write(self, event: dict):
+        if self.fd is None:
+            return
+        line = (json.dumps(event, default=_plain) + "\n").encode()
+        with self.lock:
+            os.write(self.fd, line)
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+@contextmanager
+def span(stage: str, log: Optional[EventLog] = None, out_dir=None, **fields) -> Iterator[dict]:
+    """
+    Measure the body; yields the event dict, which is filled in (and written to log) on exit.
+    out_dir: also record the size of this directory at exit and how much it grew
+    """
+    event = {"stage": stage, **fields}
+    if out_dir is not None:
+        event["out_dir"] = str(out_dir)
+        size0 = dir_size(out_dir)
+    io0 = _io_counters()
+    user0, sys0, _ = _usage()
+    event["start"] = time.time()
+    t0 = time.perf_counter()
+    try:
+        yield event
+        event["status"] = "ok"
+    except BaseException as e:
+        event["status"], event["error"] = "error", str(e).replace("\n", " ")
+        raise
+    finally:
+        event["wall_sec"] = time.perf_counter() - t0
+        user1, sys1, rss = _usage()
+        event.update(user_sec=user1 - user0, sys_sec=sys1 - sys0, peak_rss_kb=int(rss), pid=os.getpid())
+        io1 = _io_counters()
+        event.update({name: io1[name] - io0[name] for name in io1 if name in io0})
+        if out_dir is not None:
+            event["out_dir_bytes"] = dir_size(out_dir)
+            event["out_dir_added_bytes"] = event["out_dir_bytes"] - size0
+        if log is not None:
+            log.write(event)
+
+def stage_profile(step: str, log: Optional[EventLog] = None, out_dir=None, **fields):
+    """span() around a whole pipeline stage (sketch, compare, omega, align, axt, kaks), logged as stage "profile"."""
+    return span("profile", log, out_dir=out_dir, step=step, **fields)
+
+def read_events(paths: Iterable[str], stage: Optional[str] = None, latest: bool = True) -> List[dict]:
+    """
+    Events of one or more JSONL files (missing files are skipped), optionally of one stage.
+    latest: when a span was recorded more than once (a rerun appending to the same
+    log), keep only its last event; spans are the same when all non-measure fields match.
+    """
+    if isinstance(paths, (str, os.PathLike)):
+        paths = [paths]
+    events = []
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        with open(path) as f:
+            events += [json.loads(line) for line in f if line.strip()]
+    if stage is not None:
+        events = [e for e in events if e.get("stage") == stage]
+    if latest:
+        last = {}
+        for e in events:
+            last[json.dumps({k: v for k, v in e.items() if k not in MEASURES}, sort_keys=True, default=str)] = e
+        events = list(last.values())
+    return events
+
+# figure label of each profiled stage; "compare" events are split by their molecule field
+PROFILE_STEPS = {"sketch": "Sketching", "omega": "dN/dS Estimation"}
+COMPARE_STEPS = {"dna": "Pairwise Comparison (DNA)", "protein": "Pairwise Comparison (Protein)"}
+# where reproduce_gtdb_fmh_dnds_estimations/config_generation.sh points profile_log
+GTDB_PROFILE_LOG = "/data/gtdb_stage_profile.jsonl"
+
+def read_stage_profiles(paths: Iterable[str]):
+    """
+    The "profile" events of the stage logs as the resource figures' table: one row per
+    (Step, ksize, t_threshold) with summed wall time and output-directory growth.
+    """
+    import pandas as pd
+
+    rows = []
+    for ev in read_events(paths, stage="profile"):
+        if ev.get("status") != "ok":
+            continue
+        step = PROFILE_STEPS.get(ev["step"])
+        if ev["step"] == "compare":
+            step = COMPARE_STEPS.get(ev.get("molecule"))
+        # events logged without a k-size or threshold (e.g. by an ad-hoc --step) have no place in the table
+        if step is None or any(ev.get(key) in (None, "") for key in ("ksize", "threshold")):
+            continue
+        rows.append({
+            "Step": step,
+            "Disk Usage (MB)": ev.get("out_dir_added_bytes", 0) / 2**20,
+            "Time (s)": ev["wall_sec"],
+            "ksize": int(ev["ksize"]),
+            "t_threshold": float(ev["threshold"])
+        })
+    df = pd.DataFrame(rows, columns=["Step", "Disk Usage (MB)", "Time (s)", "ksize", "t_threshold"])
+    return df.groupby(["Step", "ksize", "t_threshold"], as_index=False).sum()
+
+def main():
+    ap = argparse.ArgumentParser(description="Run a command as one pipeline stage and append its profile event to a JSONL log.")
+    ap.add_argument("--step", required=True, help="Stage name (sketch, compare, omega, align, axt, kaks)")
+    ap.add_argument("--events", required=True, help="JSONL log to append to")
+    ap.add_argument("--out_dir", default=None, help="Directory whose size/growth is recorded")
+    ap.add_argument("--field", action="append", default=[], metavar="KEY=VALUE", help="Extra field for the event (repeatable)")
+    ap.add_argument("command", nargs=argparse.REMAINDER, help="-- command and its arguments")
+    args = ap.parse_args()
+    command = args.command[1:] if args.command[:1] == ["--"] else args.command
+    if not command:
+        ap.error("no command given")
+    fields = dict(f.split("=", 1) for f in args.field)
+    with EventLog(args.events) as log:
+        try:
+            with stage_profile(args.step, log, out_dir=args.out_dir, **fields):
+                subprocess.run(command, check=True)
+        except subprocess.CalledProcessError as e:
+            sys.exit(e.returncode)
+
+if __name__ == "__main__":
+    main()
@@ -11,10 +11,18 @@ cds_input_list="dataset.csv"
 translate_cds="no"
 mode="bwpair"
 cores=100
+# signatures shared by every run of the sweep; all of ${ks[*]} are sketched in one pass. Empty skips the
+# stage until script_fmh_omega.py is confirmed to reuse staged signatures (e.g. /data/gtdb_signature_cache)
+sig_cache=""
+# per-stage resource profiles of the whole sweep (read by figure_scripts/disk_usage_figure.py)
+profile_log="/data/gtdb_stage_profile.jsonl"
 
 # Variable combinations
 ks=(7 9 11)
 thresholds=(0.1 0.2 0.02 0.05)
+ksizes=$(IFS=,; echo "${ks[*]}")
+# only the lowest threshold is computed per k; the others filter its omega table
+base_threshold=$(printf '%s\n' "${thresholds[@]}" | sort -g | head -n 1)
 
 for k in "${ks[@]}"; do
     for threshold in "${thresholds[@]}"; do
@@ -24,11 +32,16 @@ for k in "${ks[@]}"; do
         out="${sample}_out"
 
         config_file="${config_dir}/${sample}.conf"
+        derived_from=""
+        if [[ "${threshold}" != "${base_threshold}" ]]; then
+            derived_from="/data/gtdb_protein_rep_pairwise_${scaled}scale_${base_threshold}threshold_k${k}"
+        fi
 
         cat > "${config_file}" <<EOF
 # Automatically generated configuration file
 
 k=${k}
+ksizes=${ksizes}
 scaled=${scaled}
 threshold=${threshold}
 
@@ -39,6 +52,10 @@ cds_input_list=${cds_input_list}
 translate_cds=${translate_cds}
 mode=${mode}
 cores=${cores}
+sig_cache=${sig_cache}
+profile_log=${profile_log}
+base_threshold=${base_threshold}
+derived_from=${derived_from}
 
 out=${out}
 EOF
@@ -3,6 +3,45 @@ set -euo pipefail
 
 source "$1"
 
+# Each stage runs under timing.py, which appends a "profile" event (wall/CPU, peak RSS,
+# /proc/self/io bytes, output-dir growth) to ${profile_log}; the resource figures read it.
+# script_fmh_omega.py does its containment comparisons internally, so they are part of "omega".
+profile_log="${profile_log:-${wd}/stage_profile.jsonl}"
+profile() {
+    local step=$1 out_dir=$2
+    shift 2
+    python3 "$(dirname "$0")/../helper_scripts/timing.py" --step "$step" --events "$profile_log" --out_dir "$out_dir" \
+        --field sample="$sample" --field ksize="$k" --field threshold="$threshold" -- "$@"
+}
+
+# A higher threshold of the same k keeps a subset of the lowest threshold's pairs with identical rows,
+# so it is derived by filtering that run's table (run the ${base_threshold} config first) instead of recomputed
+if [[ -n "${derived_from:-}" ]]; then
+    profile omega "$wd" \
+    python3 "$(dirname "$0")/../helper_scripts/threshold_sweep.py" \
+        --input "${derived_from}/fmh_omega_${k}.csv" \
+        --base_threshold "$base_threshold" \
+        --thresholds "$threshold" \
+        --output "${wd}/fmh_omega_${k}.csv"
+    exit 0
+fi
+
+# Reuse signatures across the k/threshold sweep: sketch every k once per input file, then copy this run's k
+# into ${wd}/signatures. The saving depends on script_fmh_omega.py reusing signatures it finds there under
+# <name>.<molecule>.sig.gzip, which is not verified yet, so the stage only runs when a config sets sig_cache.
+if [[ -n "${sig_cache:-}" ]]; then
+    profile sketch "$sig_cache" \
+    python3 "$(dirname "$0")/../helper_scripts/sketch_cache.py" \
+        --dataset "${wd}/dataset.csv" \
+        --ksizes "$ksizes" \
+        --scaled "$scaled" \
+        --cache "$sig_cache" \
+        --cores "$cores" \
+        --stage "${wd}/signatures" \
+        --ksize "$k"
+fi
+
+profile omega "$wd" \
 python3 /data/jzr5814/repositories/dnds-using-fmh/src/script_fmh_omega.py \
     --fasta_input_list "${wd}/dataset.csv" \
     --scaled_input "$scaled" \